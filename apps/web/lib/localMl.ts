@@ -48,7 +48,8 @@ async function scoreWriting(
   text: string,
   timeoutMs: number,
 ): Promise<LocalScore> {
-  const url = `${ML_SERVICE_URL}/score/writing`;
+  // timings=1: the response carries the per-stage trace as `timings_ms`
+  const url = `${ML_SERVICE_URL}/score/writing?timings=1`;
   const controller = new AbortController();
   const timer = setTimeout(() => controller.abort(), timeoutMs);
 
@@ -93,7 +94,7 @@ async function scoreSpeaking(
     return { ok: false, err: `Audio file not found: ${audioPath}` };
   }
 
-  const url = `${ML_SERVICE_URL}/score/speaking`;
+  const url = `${ML_SERVICE_URL}/score/speaking?timings=1`;
   const controller = new AbortController();
   const timer = setTimeout(() => controller.abort(), timeoutMs);
 
@@ -7,7 +7,7 @@ import { scoreSpeakingWithLlm } from "@/lib/scoring/llmSpeakingRubric";
 import { runLocalSpeakingScore } from "@/lib/scoring/localAdapters";
 import { fuseSpeakingScores } from "@/lib/scoring/speakingFusion";
 import type { ScoreDebugTrace, SpeakingScoreTrace, SpeakingSubscores01 } from "@/lib/scoring/types";
-import { startTimer, toHalfBandFrom01, wordCount } from "@/lib/scoring/utils";
+import { mergeMlTimings, startTimer, toHalfBandFrom01, wordCount } from "@/lib/scoring/utils";
 
 export type SpeakingPipelineInput = {
   taskId: string;
@@ -57,6 +57,7 @@ export async function runSpeakingPipeline(
   });
   timings.local_ms = localTimer.elapsedMs();
   if (!local.ok) flags.local_error = local.err ?? true;
+  else mergeMlTimings(timings, local.raw?.timings_ms);
   if (!input.audioPath) flags.local_audio_missing = true;
 
   let llmConfidence = 1;
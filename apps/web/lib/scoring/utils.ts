@@ -29,6 +29,18 @@ export function startTimer() {
   };
 }
 
+/**
+ * Copy the ML service's per-stage trace (`timings_ms`, e.g. decode / features /
+ * bootstrap / encode / predict) into a pipeline timings record as `ml_<stage>_ms`.
+ */
+export function mergeMlTimings(target: Record<string, number>, mlTimings: unknown): void {
+  if (!mlTimings || typeof mlTimings !== "object") return;
+  for (const [stage, ms] of Object.entries(mlTimings as Record<string, unknown>)) {
+    const n = safeNumber(ms);
+    if (n != null) target[`ml_${stage}_ms`] = n;
+  }
+}
+
 export function toHalfBandFrom01(score01: number): number {
   const band = 4 + 5 * clamp01(score01);
   return Math.round(band * 2) / 2;
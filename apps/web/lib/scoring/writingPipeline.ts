@@ -5,7 +5,7 @@ import type { DiagnosisResult } from "@/lib/scoring/diagnosis";
 import { runLocalWritingScore } from "@/lib/scoring/localAdapters";
 import { scoreWritingWithLlm } from "@/lib/scoring/llmWritingRubric";
 import type { ScoreDebugTrace, WritingScoreTrace, WritingSubscores01 } from "@/lib/scoring/types";
-import { startTimer, toHalfBandFrom01, wordCount } from "@/lib/scoring/utils";
+import { mergeMlTimings, startTimer, toHalfBandFrom01, wordCount } from "@/lib/scoring/utils";
 import { fuseWritingScores } from "@/lib/scoring/writingFusion";
 
 export type WritingPipelineInput = {
@@ -39,6 +39,7 @@ export async function runWritingPipeline(
   const localResult = await localFn(input.essay);
   timings.local_ms = localTimer.elapsedMs();
   if (!localResult.ok) flags.local_error = localResult.err ?? true;
+  else mergeMlTimings(timings, localResult.raw?.timings_ms);
 
   const llmTimer = startTimer();
   const llmResult = await llmFn({
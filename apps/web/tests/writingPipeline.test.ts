@@ -220,3 +220,21 @@ test("pipeline: when diagnosisFn throws, diagnosisResult is undefined", async ()
   );
   assert.equal(result.diagnosisResult, undefined);
 });
+
+test("pipeline: ML service stage timings are copied into trace.timings as ml_<stage>_ms", async () => {
+  const localFn = async () => ({
+    ok: true as const,
+    err: null,
+    overall_01: 0.5,
+    content_01: 0.5,
+    tr_01: 0.5,
+    lr_01: 0.5,
+    raw: { timings_ms: { encode: 12.5, predict: 0.8, total: 14, bogus: "x" } },
+  });
+  const result = await runWritingPipeline(STUB_INPUT, { localFn, llmFn: STUB_LLM_FN });
+  assert.equal(result.trace.timings.ml_encode_ms, 12.5);
+  assert.equal(result.trace.timings.ml_predict_ms, 0.8);
+  assert.equal(result.trace.timings.ml_total_ms, 14);
+  assert.ok(!("ml_bogus_ms" in result.trace.timings));
+  assert.ok(typeof result.trace.timings.local_ms === "number");
+});
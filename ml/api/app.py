@@ -1,17 +1,22 @@
 """FastAPI microservice wrapping IELTS ML scoring (XGBoost + librosa)."""
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import os
 import sys
 import tempfile
-from dataclasses import dataclass, field
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 
 # ---------------------------------------------------------------------------
@@ -23,9 +28,34 @@ _SRC_DIR = _ML_ROOT / "src"
 if str(_SRC_DIR) not in sys.path:
     sys.path.insert(0, str(_SRC_DIR))
 
+from audio_ingest import (  # noqa: E402
+    HEADER_BYTES,
+    RAW_FORMATS,
+    IngestedAudio,
+    UploadLimitMiddleware,
+    raw_info,
+    sniff_header,
+)
+from audio_source import AudioInfo, probe  # noqa: E402
+from band_lut import BandLUT, load_lut  # noqa: E402
+from job_queue import Job, JobQueue  # noqa: E402
+from api.job_worker import WorkerGroup, start_workers, stop_workers  # noqa: E402
+from mem_budget import (  # noqa: E402
+    MIB,
+    BudgetBusy,
+    MemoryBudget,
+    MemoryLog,
+    RequestTooLarge,
+    RssWatcher,
+    estimate_speaking_bytes,
+    max_duration_s,
+)
+from request_profile import ProfileMiddleware, ProfileStore, follow_thread, token_ok  # noqa: E402
+from score_sketch import QuantileSketch, worker_snapshot_path  # noqa: E402
+from stage_timer import StageTimer, server_timing, stage, timing_scope  # noqa: E402
 from sentence_transformers import SentenceTransformer  # noqa: E402
-from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS  # noqa: E402
-from speech_features import extract_features  # noqa: E402
+from speaking_pool import SpeakingPool, extract_part  # noqa: E402
+from text_features import MODEL_FEATURES, text_features  # noqa: E402
 from xgboost import XGBRegressor  # noqa: E402
 
 # ---------------------------------------------------------------------------
@@ -38,7 +68,40 @@ logger = logging.getLogger("ml-api")
 # Constants
 # ---------------------------------------------------------------------------
 ART_DIR = _ML_ROOT / "artifacts" / "writing_baseline"
+CAL_DIR = _ML_ROOT / "artifacts" / "calibration"
+SKETCH_DIR = CAL_DIR / "sketch"
+# Seconds between per-worker sketch snapshots; 0 keeps the sketch in memory only.
+SKETCH_SNAPSHOT_S = float(os.environ.get("SKETCH_SNAPSHOT_S", "60"))
 EMB_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Opt-in per-request profiling: unset token -> middleware is not installed at all.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", str(_ML_ROOT / "artifacts" / "profiles")))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "2"))
+# Speaking memory admission (per worker process; 0 disables a limit). Estimates come from the
+# audio header before decoding, see src/mem_budget.py.
+SPEAKING_MEM_BUDGET_MB = float(os.environ.get("SPEAKING_MEM_BUDGET_MB", "2048"))
+SPEAKING_REQUEST_MEM_MB = float(os.environ.get("SPEAKING_REQUEST_MEM_MB", "1024"))
+SPEAKING_QUEUE_TIMEOUT_S = float(os.environ.get("SPEAKING_QUEUE_TIMEOUT_S", "10"))
+# Early admission: duration from the container header, size from Content-Length / the copied bytes.
+SPEAKING_MAX_DURATION_S = float(os.environ.get("SPEAKING_MAX_DURATION_S", "300"))
+SPEAKING_MAX_UPLOAD_MB = float(os.environ.get("SPEAKING_MAX_UPLOAD_MB", "100"))
+# /score/speaking/batch: parts per request and feature-extraction processes (0 -> min(4, CPUs)).
+SPEAKING_BATCH_MAX_PARTS = int(os.environ.get("SPEAKING_BATCH_MAX_PARTS", "6"))
+SPEAKING_POOL_WORKERS = int(os.environ.get("SPEAKING_POOL_WORKERS", "0"))
+# Async scoring jobs: SQLite queue under JOB_DIR, drained by JOB_WORKERS processes started with
+# each API process (0 -> run `python -m api.job_worker` separately against the same JOB_DIR).
+JOB_DIR = Path(os.environ.get("JOB_DIR", str(_ML_ROOT / "artifacts" / "jobs")))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RESULT_TTL_S = float(os.environ.get("JOB_RESULT_TTL_S", "86400"))
+JOB_LEASE_S = float(os.environ.get("JOB_LEASE_S", "60"))
+JOB_MAX_WAIT_S = float(os.environ.get("JOB_MAX_WAIT_S", "60"))
+# A job runs alone in its worker process but still must fit in memory: JOB_MEM_MB caps the header
+# estimate (checked at submit and again in the worker); the duration cap defaults to what fits in it.
+JOB_MEM_MB = float(os.environ.get("JOB_MEM_MB", str(SPEAKING_REQUEST_MEM_MB)))
+JOB_MAX_DURATION_S = float(os.environ.get("JOB_MAX_DURATION_S", "0")) or max_duration_s(int(JOB_MEM_MB * MIB))
+UPLOAD_CHUNK_BYTES = 1 << 20
 ALLOWED_ORIGINS = os.environ.get(
     "CORS_ORIGINS",
     "http://localhost:3000,https://*.vercel.app",
@@ -54,12 +117,34 @@ class _ModelStore:
     """Immutable-ish holder for lazily loaded models."""
 
     xgb: Optional[XGBRegressor] = None
+    xgb_sha1: Optional[str] = None
     embedder: Optional[SentenceTransformer] = None
+    band_lut: Optional[BandLUT] = None
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+    sketch_path: Optional[Path] = None
+    sketch_saved_n: int = 0
     xgb_loaded: bool = False
     embedder_loaded: bool = False
+    band_lut_checked: bool = False
 
 
 _store = _ModelStore()
+_mem_budget = MemoryBudget(
+    total_bytes=int(SPEAKING_MEM_BUDGET_MB * MIB),
+    per_request_bytes=int(SPEAKING_REQUEST_MEM_MB * MIB),
+    queue_timeout_s=SPEAKING_QUEUE_TIMEOUT_S,
+)
+_rss_watcher = RssWatcher()
+_mem_log = MemoryLog()
+_speaking_pool = SpeakingPool(SPEAKING_POOL_WORKERS)
+_job_queue: Optional[JobQueue] = None
+
+
+def _get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(JOB_DIR, max_attempts=JOB_MAX_ATTEMPTS, result_ttl_s=JOB_RESULT_TTL_S)
+    return _job_queue
 
 
 def _get_embedder() -> SentenceTransformer:
@@ -80,52 +165,107 @@ def _get_writing_model() -> Optional[XGBRegressor]:
     logger.info("Loading XGBoost model from %s", model_path)
     m = XGBRegressor()
     m.load_model(str(model_path))
+    _store.xgb_sha1 = hashlib.sha1(model_path.read_bytes()).hexdigest()
     _store.xgb = m
     _store.xgb_loaded = True
     return m
 
 
+def _get_band_lut() -> Optional[BandLUT]:
+    """Calibrated band lookup table written by `make calibrate`; None -> linear mapping."""
+    if _store.band_lut_checked:
+        return _store.band_lut
+    _store.band_lut_checked = True
+    try:
+        _store.band_lut = load_lut(CAL_DIR)
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring band calibration LUT: %s", exc)
+    if _store.band_lut is None:
+        logger.info("No band calibration LUT in %s; using linear band mapping", CAL_DIR)
+    else:
+        logger.info("Loaded %s band LUT (%d bins)", _store.band_lut.mode, _store.band_lut.bins)
+    return _store.band_lut
+
+
+def _model_version() -> Optional[str]:
+    """Identifies the scores this process returns: XGBoost artifact plus band LUT, if any."""
+    if _store.xgb_sha1 is None:
+        return None
+    version = f"xgb-{_store.xgb_sha1[:12]}"
+    lut = _get_band_lut()
+    if lut is not None:
+        version += f"+lut-{lut.meta.get('sha1', '')[:8]}"
+    return version
+
+
+def _snapshot_sketch() -> None:
+    """Persist this worker's overall_01 sketch (merged by calibrate_band.py --from-sketch)."""
+    n = _store.sketch.n
+    if n == _store.sketch_saved_n:
+        return
+    if _store.sketch_path is None:
+        _store.sketch_path = worker_snapshot_path(SKETCH_DIR)
+    _store.sketch.save(_store.sketch_path)
+    _store.sketch_saved_n = n
+
+
+async def _sketch_snapshot_loop() -> None:
+    while True:
+        await asyncio.sleep(SKETCH_SNAPSHOT_S)
+        try:
+            await asyncio.to_thread(_snapshot_sketch)
+        except Exception as exc:
+            logger.warning("Score sketch snapshot failed: %s", exc)
+
+
+_background_tasks: set[asyncio.Task] = set()
+_job_workers: Optional[WorkerGroup] = None
+
+
 # ---------------------------------------------------------------------------
 # Scoring helpers (mirrored from score_cli.py, kept pure/functional)
 # ---------------------------------------------------------------------------
 
-import re  # noqa: E402
-
-
-def _simple_text_feats(text: str) -> np.ndarray:
-    words = text.split()
-    n_words = len(words)
-    n_chars = len(text)
-    avg_wlen = sum(len(w) for w in words) / max(1, n_words)
-    uniq_ratio = len(set(w.lower() for w in words)) / max(1, n_words)
-    sents = re.split(r"[.!?]+", text)
-    sents = [s.strip() for s in sents if s.strip()]
-    n_sents = max(1, len(sents))
-    avg_sent_len = n_words / n_sents
-    stop_cnt = sum(1 for w in words if w.lower() in ENGLISH_STOP_WORDS)
-    stop_ratio = stop_cnt / max(1, n_words)
-    return np.array(
-        [n_words, n_chars, avg_wlen, uniq_ratio, n_sents, avg_sent_len, stop_ratio],
-        dtype=float,
-    )
-
-
 def _predict_content_norm(text: str, model: XGBRegressor) -> float:
     embedder = _get_embedder()
-    emb = embedder.encode([text], batch_size=1, show_progress_bar=False, convert_to_numpy=True)
-    feats = _simple_text_feats(text)[:6]  # first 6 features (matches training)
-    x = np.hstack([emb, feats.reshape(1, -1)])
-    y = float(model.predict(x)[0])
+    with stage("encode"):
+        emb = embedder.encode([text], batch_size=1, show_progress_bar=False, convert_to_numpy=True)
+    with stage("text_features"):
+        feats = text_features([text], MODEL_FEATURES)  # shared with training
+    with stage("predict"):
+        x = np.hstack([emb, feats])
+        y = float(model.predict(x)[0])
     if not np.isfinite(y):
         y = 0.0
     return float(np.clip(y, 0.0, 1.0))
 
 
 def _to_band_0_9(overall_01: float) -> float:
+    lut = _get_band_lut()
+    if lut is not None:
+        return lut(overall_01)
     band = 4.0 + 5.0 * float(np.clip(overall_01, 0, 1))
     return float(np.round(band * 2) / 2)
 
 
+def _timed_response(resp: BaseModel, timer: StageTimer, include_timings: bool) -> Response:
+    """Serialize `resp` and attach the stage trace as a Server-Timing header.
+
+    With include_timings the trace is also embedded as `timings_ms`; its `serialization`
+    entry covers building the response model, while the header also counts the final
+    JSON encode.
+    """
+    with timer.stage("serialization"):
+        if include_timings:
+            resp.timings_ms = timer.snapshot()
+        body = resp.model_dump_json()
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Server-Timing": server_timing(timer.snapshot())},
+    )
+
+
 def _nan_to_none(x: Optional[float]) -> Optional[float]:
     if x is None:
         return None
@@ -135,11 +275,25 @@ def _nan_to_none(x: Optional[float]) -> Optional[float]:
         return None
 
 
+def _extract_speaking_in_thread(
+    audio: IngestedAudio, transcript: Optional[str]
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """asyncio.to_thread target: keeps the event loop free and stays visible to request profiling."""
+    with follow_thread():
+        return _safe_extract_speaking(audio, transcript=transcript)
+
+
 def _safe_extract_speaking(
-    audio_path: str, transcript: Optional[str] = None
+    audio: IngestedAudio, transcript: Optional[str] = None
 ) -> Tuple[Dict[str, Any], Dict[str, float]]:
-    res = extract_features(audio_path, transcript=transcript)
+    # Raw PCM / streaming downmix+resample / librosa fallback, see audio_ingest.IngestedAudio.load
+    res, err = extract_part(audio, transcript)
+    if err:
+        logger.warning("Audio decode failed: %s", err)
+    return _normalize_speaking_result(res)
+
 
+def _normalize_speaking_result(res: Any) -> Tuple[Dict[str, Any], Dict[str, float]]:
     feats: Dict[str, Any] = {}
     scores_raw: Dict[str, Any] = {}
 
@@ -221,6 +375,7 @@ class WritingResponse(BaseModel):
     subscores_01: SubscoresResponse
     overall_01: float
     band_estimate: float
+    timings_ms: Optional[Dict[str, float]] = None
 
 
 class SpeakingResponse(BaseModel):
@@ -228,11 +383,31 @@ class SpeakingResponse(BaseModel):
     speaking_features: Dict[str, Any] = {}
     overall_01: float
     band_estimate: float
+    timings_ms: Optional[Dict[str, float]] = None
+
+
+class SpeakingPartResponse(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    subscores_01: SubscoresResponse
+    speaking_features: Dict[str, Any] = {}
+    overall_01: Optional[float] = None
+    band_estimate: Optional[float] = None
+    timings_ms: Optional[Dict[str, float]] = None
+
+
+class SpeakingBatchResponse(BaseModel):
+    parts: List[SpeakingPartResponse]
+    subscores_01: SubscoresResponse
+    overall_01: float
+    band_estimate: float
+    timings_ms: Optional[Dict[str, float]] = None
 
 
 class HealthResponse(BaseModel):
     ok: bool
     model_loaded: bool
+    model_version: Optional[str] = None
 
 
 # ---------------------------------------------------------------------------
@@ -240,6 +415,17 @@ class HealthResponse(BaseModel):
 # ---------------------------------------------------------------------------
 app = FastAPI(title="IELTS ML Scoring Service", version="1.0.0")
 
+# Added before CORS so that early 413s still carry CORS headers.
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=int(SPEAKING_MAX_UPLOAD_MB * MIB),
+    paths=("/score/speaking",),
+)
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=int(SPEAKING_MAX_UPLOAD_MB * MIB) * SPEAKING_BATCH_MAX_PARTS,
+    paths=("/score/speaking/batch",),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -248,15 +434,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_profile_store = ProfileStore(PROFILE_DIR, keep=PROFILE_KEEP)
+if PROFILE_TOKEN:
+    app.add_middleware(
+        ProfileMiddleware,
+        token=PROFILE_TOKEN,
+        store=_profile_store,
+        interval_s=PROFILE_INTERVAL_MS / 1000.0,
+    )
+
 
 @app.on_event("startup")
 async def _startup() -> None:
     """Eagerly load models so the first request is fast."""
+    global _job_workers
     _get_writing_model()
     _get_embedder()
+    _get_band_lut()
+    if JOB_WORKERS > 0:
+        _job_workers = start_workers(JOB_WORKERS)
+    if SKETCH_SNAPSHOT_S > 0:
+        task = asyncio.create_task(_sketch_snapshot_loop())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     logger.info("Startup complete. XGB loaded: %s", _store.xgb_loaded)
 
 
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    global _job_workers
+    _speaking_pool.shutdown()
+    if _job_workers is not None:
+        await asyncio.to_thread(stop_workers, _job_workers)
+        _job_workers = None
+    if SKETCH_SNAPSHOT_S > 0:
+        try:
+            _snapshot_sketch()
+        except Exception as exc:
+            logger.warning("Score sketch snapshot failed: %s", exc)
+
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
@@ -264,12 +481,54 @@ async def _startup() -> None:
 
 @app.get("/health", response_model=HealthResponse)
 async def health() -> HealthResponse:
-    return HealthResponse(ok=True, model_loaded=_store.xgb_loaded)
+    return HealthResponse(ok=True, model_loaded=_store.xgb_loaded, model_version=_model_version())
+
+
+@app.get("/debug/memory")
+async def memory_stats(x_profile: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Speaking memory budget state plus recent estimate-vs-measured peak RSS for tuning.
+
+    Gated by the profiling token (X-Profile header); without PROFILE_TOKEN it is always 404.
+    """
+    if not token_ok(x_profile, PROFILE_TOKEN):
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"budget": _mem_budget.stats(), "requests": _mem_log.summary()}
+
+
+_PROFILE_FORMATS = {
+    "json": (".json", "application/json"),
+    "collapsed": (".folded", "text/plain; charset=utf-8"),
+    "pstats": (".pstats", "application/octet-stream"),
+}
+
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = "json",
+    x_profile: Optional[str] = Header(None),
+) -> FileResponse:
+    """Fetch a stored request profile (same token as the X-Profile request header)."""
+    if not token_ok(x_profile, PROFILE_TOKEN):
+        raise HTTPException(status_code=404, detail="Not found")
+    if format not in _PROFILE_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {sorted(_PROFILE_FORMATS)}")
+    suffix, media_type = _PROFILE_FORMATS[format]
+    path = _profile_store.path(profile_id, suffix)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=media_type, filename=path.name)
 
 
 @app.post("/score/writing", response_model=WritingResponse)
-async def score_writing(req: WritingRequest) -> WritingResponse:
-    text = req.text.strip()
+async def score_writing(req: WritingRequest, timings: bool = False) -> Response:
+    """Score an essay; `?timings=1` also returns the stage trace as `timings_ms`."""
+    with timing_scope() as timer:
+        return _timed_response(_writing_response(req.text), timer, timings)
+
+
+def _writing_response(text: str) -> WritingResponse:
+    text = text.strip()
     if not text:
         raise HTTPException(status_code=422, detail="text must not be empty")
 
@@ -286,63 +545,52 @@ async def score_writing(req: WritingRequest) -> WritingResponse:
         logger.error("Writing scoring failed: %s", exc, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Scoring error: {exc}") from exc
 
-    overall, band = _fuse_scores(content_score=content_01, fluency_score=None, pronunciation_score=None)
-    return WritingResponse(
-        subscores_01=SubscoresResponse(content=_nan_to_none(content_01)),
-        overall_01=overall,
-        band_estimate=band,
-    )
+    with stage("fusion"):
+        overall, band = _fuse_scores(content_score=content_01, fluency_score=None, pronunciation_score=None)
+        _store.sketch.add(overall)
+    with stage("serialization"):
+        return WritingResponse(
+            subscores_01=SubscoresResponse(content=_nan_to_none(content_01)),
+            overall_01=overall,
+            band_estimate=band,
+        )
 
 
-@app.post("/score/speaking", response_model=SpeakingResponse)
-async def score_speaking(
-    audio: UploadFile = File(...),
-    transcript: Optional[str] = Form(None),
-) -> SpeakingResponse:
-    # Write uploaded audio to a temp file so librosa can read it
-    suffix = Path(audio.filename or "audio.wav").suffix or ".wav"
+def _score_transcript_content(transcript: Optional[str]) -> Optional[float]:
+    """Content score from the transcript; None when there is no text or no writing model."""
+    if not (transcript or "").strip():
+        return None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await audio.read()
-            tmp.write(content)
-            tmp_path = tmp.name
+        wm = _get_writing_model()
+        if wm is not None:
+            return _predict_content_norm(transcript, wm)
     except Exception as exc:
-        raise HTTPException(status_code=400, detail=f"Failed to read audio: {exc}") from exc
+        logger.warning("Content scoring skipped: %s", exc)
+    return None
 
-    # Content scoring from transcript
-    content_score: Optional[float] = None
-    text_for_content = transcript or ""
-    if text_for_content.strip():
-        try:
-            wm = _get_writing_model()
-            if wm is not None:
-                content_score = _predict_content_norm(text_for_content, wm)
-        except Exception as exc:
-            logger.warning("Content scoring skipped: %s", exc)
 
-    # Speaking features
-    fluency_score: Optional[float] = None
-    pronunciation_score: Optional[float] = None
-    spk_feats: Dict[str, Any] = {}
+async def _extract_speaking_or_empty(
+    audio: IngestedAudio, transcript: Optional[str]
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
     try:
-        spk_feats, spk_scores = _safe_extract_speaking(tmp_path, transcript=transcript)
-        fluency_score = spk_scores.get("fluency_01")
-        pronunciation_score = spk_scores.get("pronunciation_01")
+        return await asyncio.to_thread(_extract_speaking_in_thread, audio, transcript)
     except Exception as exc:
         logger.error("Speech feature extraction failed: %s", exc, exc_info=True)
-    finally:
-        # Clean up temp file
-        try:
-            Path(tmp_path).unlink(missing_ok=True)
-        except Exception:
-            pass
+        return {}, {}
 
-    try:
-        overall, band = _fuse_scores(content_score, fluency_score, pronunciation_score)
-    except ValueError:
-        raise HTTPException(status_code=422, detail="No subscores could be computed from input")
 
-    # Sanitize spk_feats: convert any numpy/nan values to JSON-safe types
+def _budget_http_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, RequestTooLarge):
+        return HTTPException(status_code=413, detail=str(exc))
+    return HTTPException(
+        status_code=503,
+        detail=str(exc),
+        headers={"Retry-After": str(max(1, int(SPEAKING_QUEUE_TIMEOUT_S)))},
+    )
+
+
+def _json_safe_features(spk_feats: Dict[str, Any]) -> Dict[str, Any]:
+    """Sanitize spk_feats: convert any numpy/nan values to JSON-safe types."""
     safe_feats: Dict[str, Any] = {}
     for k, v in spk_feats.items():
         if isinstance(v, (np.floating, float)):
@@ -351,14 +599,415 @@ async def score_speaking(
             safe_feats[k] = int(v)
         else:
             safe_feats[k] = v
+    return safe_feats
+
 
-    return SpeakingResponse(
-        subscores_01=SubscoresResponse(
-            content=_nan_to_none(content_score),
-            fluency=_nan_to_none(fluency_score),
-            pronunciation=_nan_to_none(pronunciation_score),
-        ),
-        speaking_features=safe_feats,
-        overall_01=overall,
-        band_estimate=band,
+def _speaking_estimate(upload: IngestedAudio) -> int:
+    return estimate_speaking_bytes(
+        upload.info, os.path.getsize(upload.path), streamed=upload.method != "decode"
     )
+
+
+def _check_duration(info: Optional[AudioInfo], limit_s: float) -> None:
+    if info is not None and limit_s and info.duration_s > limit_s:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio is {info.duration_s:.0f}s long; the limit is {limit_s:.0f}s",
+        )
+
+
+async def _receive_speaking_upload(
+    audio: UploadFile,
+    audio_format: str,
+    max_duration_s: float = SPEAKING_MAX_DURATION_S,
+    digest: Optional[Any] = None,
+) -> IngestedAudio:
+    """Admit from the header, then copy the upload to a temp file in chunks (nothing is decoded here).
+
+    `digest` (a hashlib object) is fed every chunk, for content-hash dedup without re-reading the file.
+    """
+    raw = None if audio_format == "auto" else audio_format
+    if raw is not None and raw not in RAW_FORMATS:
+        raise HTTPException(
+            status_code=422, detail=f"audio_format must be 'auto' or one of {sorted(RAW_FORMATS)}"
+        )
+    try:
+        head = await audio.read(HEADER_BYTES)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Failed to read audio: {exc}") from exc
+    if raw is not None:
+        info = raw_info(audio.size, raw) if audio.size is not None else None
+    else:
+        info = sniff_header(head)  # WAV / FLAC; other containers are probed once on disk
+    _check_duration(info, max_duration_s)
+
+    suffix = ".pcm" if raw else (Path(audio.filename or "audio.wav").suffix or ".wav")
+    max_bytes = int(SPEAKING_MAX_UPLOAD_MB * MIB)
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    admitted = False
+    try:
+        with tmp:
+            size, chunk = 0, head
+            while chunk:
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise HTTPException(
+                        status_code=413, detail=f"Upload exceeds {SPEAKING_MAX_UPLOAD_MB:.0f} MiB"
+                    )
+                tmp.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                chunk = await audio.read(UPLOAD_CHUNK_BYTES)
+        if raw is not None:
+            info = raw_info(size, raw)
+        elif info is None:
+            info = probe(tmp.name)
+        _check_duration(info, max_duration_s)
+        admitted = True
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Failed to read audio: {exc}") from exc
+    finally:
+        if not admitted:
+            Path(tmp.name).unlink(missing_ok=True)
+    return IngestedAudio(tmp.name, info, raw)
+
+
+@app.post("/score/speaking", response_model=SpeakingResponse)
+async def score_speaking(
+    audio: UploadFile = File(...),
+    transcript: Optional[str] = Form(None),
+    audio_format: str = Form("auto"),
+    timings: bool = False,
+) -> Response:
+    """Score a spoken answer; `?timings=1` also returns the stage trace as `timings_ms`.
+
+    `audio_format=pcm_s16le|pcm_f32le` declares headerless 16 kHz mono PCM: no decode, no resample.
+    """
+    with timing_scope() as timer:
+        return await _score_speaking(audio, transcript, audio_format, timer, timings)
+
+
+async def _score_speaking(
+    audio: UploadFile, transcript: Optional[str], audio_format: str, timer: StageTimer, timings: bool
+) -> Response:
+    with stage("upload"):
+        upload = await _receive_speaking_upload(audio, audio_format)
+
+    try:
+        # Memory admission from the container header, before anything is decoded
+        info = upload.info
+        estimate = _speaking_estimate(upload)
+        try:
+            async with _mem_budget.reserve(estimate):
+                content_score = _score_transcript_content(transcript)
+                # Speaking features (decode / features / bootstrap are timed inside speech_features)
+                with _rss_watcher.track() as rss:
+                    spk_feats, spk_scores = await _extract_speaking_or_empty(upload, transcript)
+        except (RequestTooLarge, BudgetBusy) as exc:
+            raise _budget_http_error(exc) from exc
+    finally:
+        # Clean up temp file
+        try:
+            Path(upload.path).unlink(missing_ok=True)
+        except Exception:
+            pass
+
+    row = _mem_log.add(info, estimate, rss.peak_delta if rss is not None else None, method=upload.method)
+    if row["rss_peak_delta_mib"] is not None and row["rss_peak_delta_mib"] > row["estimate_mib"]:
+        logger.info("Speaking memory estimate exceeded (first request includes warm-up): %s", row)
+    resp = _speaking_response(content_score, spk_feats, spk_scores)
+    return _timed_response(resp, timer, timings)
+
+
+def _speaking_response(
+    content_score: Optional[float], spk_feats: Dict[str, Any], spk_scores: Dict[str, float]
+) -> SpeakingResponse:
+    fluency_score = spk_scores.get("fluency_01")
+    pronunciation_score = spk_scores.get("pronunciation_01")
+
+    with stage("fusion"):
+        try:
+            overall, band = _fuse_scores(content_score, fluency_score, pronunciation_score)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="No subscores could be computed from input")
+        _store.sketch.add(overall)
+
+    with stage("serialization"):
+        safe_feats = _json_safe_features(spk_feats)
+        return SpeakingResponse(
+            subscores_01=SubscoresResponse(
+                content=_nan_to_none(content_score),
+                fluency=_nan_to_none(fluency_score),
+                pronunciation=_nan_to_none(pronunciation_score),
+            ),
+            speaking_features=safe_feats,
+            overall_01=overall,
+            band_estimate=band,
+        )
+
+
+@app.post("/score/speaking/batch", response_model=SpeakingBatchResponse)
+async def score_speaking_batch(
+    audio: List[UploadFile] = File(...),
+    transcripts: Optional[List[str]] = Form(None),
+    audio_format: str = Form("auto"),
+    timings: bool = False,
+) -> Response:
+    """Score several speaking parts at once (e.g. a mock exam); features are extracted in parallel.
+
+    Repeat `audio` per part; `transcripts`, if given, are matched by position (empty string = none).
+    """
+    with timing_scope() as timer:
+        return await _score_speaking_batch(audio, transcripts or [], audio_format, timer, timings)
+
+
+async def _extract_in_pool(
+    upload: IngestedAudio, transcript: Optional[str], estimate: int
+) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, float]]:
+    """One part in a worker process, under the same memory budget as single requests.
+
+    If cancelled (another part of the batch was refused), a part already running in a worker is
+    waited for before its reservation is released and its temp file can be deleted.
+    """
+    async with _mem_budget.reserve(estimate):
+        try:
+            res, err, ms, rss = await _speaking_pool.submit(upload, transcript)
+        except BrokenProcessPool as exc:
+            # submit already shut down that pool (only if still current); the next submit recreates it
+            logger.error("Speaking worker pool died: %s", exc)
+            return {}, {}, {}
+        except Exception as exc:
+            logger.error("Speech feature extraction failed: %s", exc, exc_info=True)
+            return {}, {}, {}
+    if err:
+        logger.warning("Audio decode failed: %s", err)
+    _mem_log.add(upload.info, estimate, rss, method=f"pool/{upload.method}")
+    feats, scores = _normalize_speaking_result(res)
+    return feats, scores, ms
+
+
+def _weighted_mean(values: List[Optional[float]], weights: List[float]) -> Optional[float]:
+    pairs = [(v, w) for v, w in zip(values, weights) if v is not None]
+    if not pairs:
+        return None
+    return float(sum(v * w for v, w in pairs) / sum(w for _, w in pairs))
+
+
+async def _score_speaking_batch(
+    audios: List[UploadFile],
+    transcripts: List[str],
+    audio_format: str,
+    timer: StageTimer,
+    timings: bool,
+) -> Response:
+    if not 0 < len(audios) <= SPEAKING_BATCH_MAX_PARTS:
+        raise HTTPException(
+            status_code=422, detail=f"Send between 1 and {SPEAKING_BATCH_MAX_PARTS} audio parts"
+        )
+    if transcripts and len(transcripts) != len(audios):
+        raise HTTPException(
+            status_code=422, detail="transcripts must be omitted or given once per audio part"
+        )
+    texts = [t or None for t in transcripts] if transcripts else [None] * len(audios)
+
+    uploads: List[IngestedAudio] = []
+    try:
+        with stage("upload"):
+            for a in audios:
+                uploads.append(await _receive_speaking_upload(a, audio_format))
+        # Refuse an oversized part before any part reaches the pool
+        estimates = [_speaking_estimate(u) for u in uploads]
+        try:
+            for estimate in estimates:
+                _mem_budget.check(estimate)
+        except RequestTooLarge as exc:
+            raise _budget_http_error(exc) from exc
+        # Content scoring (main process) overlaps with feature extraction (worker processes). If a
+        # part times out waiting for budget, the group cancels the rest and waits for them to stop,
+        # so no worker is still reading a temp file when the finally below removes it.
+        try:
+            with stage("extract"):
+                async with asyncio.TaskGroup() as tg:
+                    content_task = tg.create_task(
+                        asyncio.to_thread(lambda: [_score_transcript_content(t) for t in texts])
+                    )
+                    part_tasks = [
+                        tg.create_task(_extract_in_pool(u, t, e))
+                        for u, t, e in zip(uploads, texts, estimates)
+                    ]
+        except* (RequestTooLarge, BudgetBusy) as eg:
+            raise _budget_http_error(eg.exceptions[0]) from None
+        content_scores = content_task.result()
+        extracted = [t.result() for t in part_tasks]
+    finally:
+        for u in uploads:
+            Path(u.path).unlink(missing_ok=True)
+
+    with stage("fusion"):
+        parts: List[SpeakingPartResponse] = []
+        for i, (a, content, (feats, scores, ms)) in enumerate(zip(audios, content_scores, extracted)):
+            sub = SubscoresResponse(
+                content=_nan_to_none(content),
+                fluency=scores.get("fluency_01"),
+                pronunciation=scores.get("pronunciation_01"),
+            )
+            try:
+                overall, band = _fuse_scores(sub.content, sub.fluency, sub.pronunciation)
+                _store.sketch.add(overall)
+            except ValueError:
+                overall, band = None, None
+            parts.append(
+                SpeakingPartResponse(
+                    index=i,
+                    filename=a.filename,
+                    subscores_01=sub,
+                    speaking_features=_json_safe_features(feats),
+                    overall_01=overall,
+                    band_estimate=band,
+                    timings_ms=ms if timings else None,
+                )
+            )
+        # Duration-weighted mean per subscore: a 2-minute long turn carries more evidence than a 20 s answer
+        weights = [
+            float(d) if isinstance(d := p.speaking_features.get("duration_s"), (int, float)) and d > 0 else 1.0
+            for p in parts
+        ]
+        agg = SubscoresResponse(
+            content=_weighted_mean([p.subscores_01.content for p in parts], weights),
+            fluency=_weighted_mean([p.subscores_01.fluency for p in parts], weights),
+            pronunciation=_weighted_mean([p.subscores_01.pronunciation for p in parts], weights),
+        )
+        try:
+            overall, band = _fuse_scores(agg.content, agg.fluency, agg.pronunciation)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="No subscores could be computed from input")
+
+    with stage("serialization"):
+        resp = SpeakingBatchResponse(parts=parts, subscores_01=agg, overall_01=overall, band_estimate=band)
+    return _timed_response(resp, timer, timings)
+
+
+# ---------------------------------------------------------------------------
+# Async jobs (queue in src/job_queue.py, workers in api/job_worker.py)
+# ---------------------------------------------------------------------------
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    deduped: bool = False
+    attempts: int = 0
+    created_at: float
+    updated_at: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+def _job_response(job: Job, deduped: bool = False) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        deduped=deduped,
+        attempts=job.attempts,
+        created_at=job.created,
+        updated_at=job.updated,
+        result=job.result,
+        error=job.error,
+    )
+
+
+def _dedup_key(*parts: str) -> str:
+    """Content hash scoped to the current model, so a model update re-scores instead of deduping."""
+    h = hashlib.sha256()
+    for part in (_model_version() or "", *parts):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _check_job_memory(upload: IngestedAudio) -> None:
+    """413 when a speaking job's header estimate exceeds JOB_MEM_MB (0 disables the check)."""
+    limit = int(JOB_MEM_MB * MIB)
+    estimate = _speaking_estimate(upload)
+    if limit and estimate > limit:
+        raise _budget_http_error(RequestTooLarge(estimate, limit))
+
+
+def _run_job(job: Job) -> Dict[str, Any]:
+    """Job worker entry point: the synchronous endpoints' scoring, returned as a JSON-able dict."""
+    if job.kind == "writing":
+        return _writing_response(job.payload["text"]).model_dump()
+    if job.kind == "speaking":
+        info = AudioInfo(**job.payload["info"]) if job.payload.get("info") else None
+        upload = IngestedAudio(job.spool_path, info, job.payload.get("raw_format"))
+        _check_job_memory(upload)  # jobs queued under a larger limit fail instead of OOM-ing the worker
+        transcript = job.payload.get("transcript")
+        content_score = _score_transcript_content(transcript)
+        spk_feats, spk_scores = _safe_extract_speaking(upload, transcript=transcript)
+        return _speaking_response(content_score, spk_feats, spk_scores).model_dump()
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+@app.post("/jobs/writing", response_model=JobResponse, status_code=202)
+async def submit_writing_job(req: WritingRequest, response: Response) -> JobResponse:
+    """Queue an essay for scoring; identical text (same model) returns the existing job."""
+    text = req.text.strip()
+    if not text:
+        raise HTTPException(status_code=422, detail="text must not be empty")
+    job, deduped = await asyncio.to_thread(
+        _get_job_queue().submit, "writing", _dedup_key("writing", text), {"text": text}
+    )
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return _job_response(job, deduped)
+
+
+@app.post("/jobs/speaking", response_model=JobResponse, status_code=202)
+async def submit_speaking_job(
+    response: Response,
+    audio: UploadFile = File(...),
+    transcript: Optional[str] = Form(None),
+    audio_format: str = Form("auto"),
+) -> JobResponse:
+    """Queue a (long) recording for scoring; same audio + transcript (same model) is deduplicated."""
+    digest = hashlib.sha256()
+    upload = await _receive_speaking_upload(audio, audio_format, JOB_MAX_DURATION_S, digest)
+    try:
+        _check_job_memory(upload)
+    except HTTPException:
+        Path(upload.path).unlink(missing_ok=True)
+        raise
+    payload = {
+        "transcript": transcript,
+        "raw_format": upload.raw_format,
+        "info": asdict(upload.info) if upload.info is not None else None,
+        "filename": audio.filename,
+    }
+    key = _dedup_key("speaking", audio_format, transcript or "", digest.hexdigest())
+    try:
+        # The queue moves the temp file into its spool (or drops it when deduplicated)
+        job, deduped = await asyncio.to_thread(_get_job_queue().submit, "speaking", key, payload, upload.path)
+    finally:
+        Path(upload.path).unlink(missing_ok=True)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return _job_response(job, deduped)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = 0.0) -> JobResponse:
+    """Job status and result; `?wait=N` long-polls up to N seconds (capped) for it to finish."""
+    queue = _get_job_queue()
+    deadline = time.monotonic() + min(max(wait, 0.0), JOB_MAX_WAIT_S)
+    delay = 0.05
+    while True:
+        job = await asyncio.to_thread(queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+        remaining = deadline - time.monotonic()
+        if job.finished or remaining <= 0:
+            return _job_response(job)
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
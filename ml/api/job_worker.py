@@ -0,0 +1,142 @@
+"""Job worker: drains the SQLite scoring queue (src/job_queue.py) with the API's own scoring code.
+
+The API starts JOB_WORKERS of these at startup. To run them separately instead (JOB_WORKERS=0 on
+the API, workers sharing the same JOB_DIR):
+
+  python -m api.job_worker --workers 2
+
+Each worker claims one job at a time under a lease that a heartbeat thread keeps extending, so a
+killed worker's job is picked up again once JOB_LEASE_S passes. Client errors (4xx, e.g. no
+subscores could be computed) fail the job immediately; anything else is retried with backoff.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+logger = logging.getLogger("ml-jobs")
+
+POLL_S = 0.5
+PURGE_EVERY_S = 300.0
+
+
+class _Heartbeat:
+    """Extends the job lease every lease_s / 3 while the job runs."""
+
+    def __init__(self, queue: Any, job_id: str, worker: str, lease_s: float):
+        self._args = (queue, job_id, worker, lease_s)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-heartbeat", daemon=True)
+
+    def _run(self) -> None:
+        queue, job_id, worker, lease_s = self._args
+        while not self._stop.wait(lease_s / 3):
+            if not queue.extend_lease(job_id, worker, lease_s):
+                logger.warning("Lost the lease on job %s", job_id)
+                return
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run(stop: Optional[Any] = None) -> None:
+    """Worker loop; `stop` is any Event-like object (multiprocessing or threading)."""
+    from api import app as svc  # models, librosa, ... only load in the worker process
+
+    queue = svc._get_job_queue()
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    last_purge = last_snapshot = time.monotonic()
+    queue.purge()
+    logger.info("Job worker %s started", worker)
+    while stop is None or not stop.is_set():
+        now = time.monotonic()
+        if now - last_purge >= PURGE_EVERY_S:
+            queue.purge()
+            last_purge = now
+        if svc.SKETCH_SNAPSHOT_S > 0 and now - last_snapshot >= svc.SKETCH_SNAPSHOT_S:
+            svc._snapshot_sketch()
+            last_snapshot = now
+
+        job = queue.claim(worker, svc.JOB_LEASE_S)
+        if job is None:
+            if stop is not None:
+                stop.wait(POLL_S)
+            else:
+                time.sleep(POLL_S)
+            continue
+
+        t0 = time.perf_counter()
+        with _Heartbeat(queue, job.id, worker, svc.JOB_LEASE_S):
+            try:
+                result = svc._run_job(job)
+            except Exception as exc:
+                retry = getattr(exc, "status_code", 500) >= 500
+                error = f"{type(exc).__name__}: {getattr(exc, 'detail', exc)}"
+                status = queue.fail(job.id, worker, error, retry=retry)
+                logger.warning("Job %s (%s) attempt %d failed -> %s: %s",
+                               job.id, job.kind, job.attempts, status, error)
+                continue
+        queue.complete(job.id, worker, result)
+        logger.info("Job %s (%s) done in %.1fs", job.id, job.kind, time.perf_counter() - t0)
+    if svc.SKETCH_SNAPSHOT_S > 0:
+        svc._snapshot_sketch()
+
+
+@dataclass
+class WorkerGroup:
+    stop: Any
+    procs: List[Any] = field(default_factory=list)
+
+
+def start_workers(n: int) -> WorkerGroup:
+    # forkserver: the API process already runs threads, a plain fork could inherit held locks
+    ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    group = WorkerGroup(stop=ctx.Event())
+    for i in range(n):
+        proc = ctx.Process(target=run, args=(group.stop,), name=f"job-worker-{i}", daemon=True)
+        proc.start()
+        group.procs.append(proc)
+    return group
+
+
+def stop_workers(group: WorkerGroup, timeout_s: float = 10.0) -> None:
+    """Ask workers to finish their current job; stragglers are terminated (their lease then expires)."""
+    group.stop.set()
+    deadline = time.monotonic() + timeout_s
+    for proc in group.procs:
+        proc.join(max(0.0, deadline - time.monotonic()))
+        if proc.is_alive():
+            proc.terminate()
+            proc.join()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Drain the scoring job queue")
+    ap.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.workers <= 1:
+        run()
+        return
+    group = start_workers(args.workers)
+    try:
+        for proc in group.procs:
+            proc.join()
+    except KeyboardInterrupt:
+        stop_workers(group)
+
+
+if __name__ == "__main__":
+    main()
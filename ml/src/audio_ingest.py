@@ -0,0 +1,173 @@
+# src/audio_ingest.py
+"""
+口說上傳的入口：先看標頭決定收不收，收下的檔案一趟串流解成 16 kHz 單聲道。
+
+- sniff_header(head)：只看上傳的前 HEADER_BYTES 位元組。
+    WAV   自己走 RIFF 區塊找 fmt / data（libsndfile 讀截斷的 WAV 會把長度夾成實際拿到的位元組數，不能直接丟給 sf.info）；
+          只有固定樣本寬的編碼（PCM / float / A-law / μ-law，或 EXTENSIBLE 的 PCM / float）才能用 data 大小 ÷ block_align
+          算長度。ADPCM / GSM 等壓縮編碼一個 block 含多個樣本，這樣算會短好幾百倍，所以一律回 None 交給 probe
+    FLAC  STREAMINFO 裡就有總樣本數
+  其他容器（OGG、webm、m4a…）回 None，交給呼叫端落地後再用 audio_source.probe 讀整檔標頭——仍在解碼之前。
+- RAW_FORMATS：用戶端宣告上傳的已是 16 kHz 單聲道、無檔頭的 PCM，長度 = 位元組數 / 樣本寬，
+  讀取就是 np.fromfile，完全跳過解碼與重採樣。int16 依 libsndfile 慣例除以 32768，和同樣內容的 WAV 解碼結果一致。
+- load_stream(path, sr)：sf.blocks 逐塊讀 → 各聲道平均成單聲道 → soxr.ResampleStream（多相濾波，HQ，同 librosa 預設的
+  soxr_hq）→ 寫進預先配置好的輸出陣列。峰值只有輸出 + 一個區塊，不會出現原始取樣率的多聲道全長陣列；
+  長度與 librosa.load 相同（ceil(frames × sr / native)），取樣率已是目標值時不重採樣。
+- UploadLimitMiddleware：純 ASGI，Content-Length 超過上限的請求在讀 body 之前就回 413。
+  沒帶 Content-Length（chunked）的上傳由 handler 邊寫暫存檔邊計數。
+"""
+from __future__ import annotations
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from audio_source import AudioInfo, Source, load_audio
+
+TARGET_SR = 16000
+HEADER_BYTES = 64 * 1024
+BLOCK_FRAMES = 64 * 1024
+RAW_FORMATS = {"pcm_s16le": np.dtype("<i2"), "pcm_f32le": np.dtype("<f4")}
+_FLAC_MAGIC = b"fLaC"
+# wFormatTag：PCM、IEEE float、A-law、μ-law——一個 block 正好一個 frame
+_WAV_LINEAR_TAGS = {0x0001, 0x0003, 0x0006, 0x0007}
+_WAV_EXTENSIBLE = 0xFFFE
+# WAVE_FORMAT_EXTENSIBLE 的 SubFormat GUID 除了前 2 位元組（格式代碼）之外的固定尾段
+_KSDATAFORMAT_TAIL = b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+
+
+def _wav_format_tag(head: bytes, body: int, size: int) -> Optional[int]:
+    tag = struct.unpack_from("<H", head, body)[0]
+    if tag != _WAV_EXTENSIBLE:
+        return tag
+    # cbSize(2) + wValidBitsPerSample(2) + dwChannelMask(4) 之後才是 16 B 的 SubFormat
+    if size < 40 or body + 40 > len(head) or head[body + 26:body + 40] != _KSDATAFORMAT_TAIL:
+        return None
+    return struct.unpack_from("<H", head, body + 24)[0]
+
+
+def _sniff_wav(head: bytes) -> Optional[AudioInfo]:
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    fmt: Optional[Tuple[int, int, int]] = None  # 只在編碼是固定樣本寬時設定
+    pos = 12
+    while pos + 8 <= len(head):
+        chunk_id, size = head[pos:pos + 4], struct.unpack_from("<I", head, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt " and body + 16 <= len(head):
+            if _wav_format_tag(head, body, size) not in _WAV_LINEAR_TAGS:
+                return None
+            _, channels, sr, _, block_align, _ = struct.unpack_from("<HHIIHH", head, body)
+            fmt = (channels, sr, block_align)
+        elif chunk_id == b"data":
+            # 0 / 0xFFFFFFFF：邊錄邊寫、長度沒回填的串流 WAV
+            if fmt is None or size in (0, 0xFFFFFFFF) or not fmt[1] or not fmt[2]:
+                return None
+            channels, sr, block_align = fmt
+            return AudioInfo(size // block_align, sr, channels, "WAV")
+        pos = body + size + (size & 1)
+    return None
+
+
+def _sniff_flac(head: bytes) -> Optional[AudioInfo]:
+    # fLaC + 區塊標頭（1 B 類型 + 3 B 長度）+ STREAMINFO（34 B，第 10–17 位元組：20b 取樣率 / 3b 聲道-1 / 5b 位元深-1 / 36b 樣本數）
+    if len(head) < 8 + 34 or head[:4] != _FLAC_MAGIC or head[4] & 0x7F != 0:
+        return None
+    x = int.from_bytes(head[8 + 10:8 + 18], "big")
+    sr, channels, frames = x >> 44, ((x >> 41) & 0x7) + 1, x & ((1 << 36) - 1)
+    if not sr or not frames:
+        return None
+    return AudioInfo(frames, sr, channels, "FLAC")
+
+
+def sniff_header(head: bytes) -> Optional[AudioInfo]:
+    return _sniff_wav(head) or _sniff_flac(head)
+
+
+def raw_info(nbytes: int, raw_format: str) -> AudioInfo:
+    return AudioInfo(nbytes // RAW_FORMATS[raw_format].itemsize, TARGET_SR, 1, raw_format)
+
+
+def load_raw(path: Source, raw_format: str) -> np.ndarray:
+    dtype = RAW_FORMATS[raw_format]
+    y = np.fromfile(path, dtype=dtype)
+    if dtype.kind == "i":
+        return y.astype(np.float32) / np.float32(32768.0)
+    return y.astype(np.float32, copy=False)
+
+
+def load_stream(path: Source, sr: int = TARGET_SR, block_frames: int = BLOCK_FRAMES) -> Tuple[np.ndarray, int]:
+    """libsndfile 讀得懂的檔案：一趟 讀塊 → 降聲道 → 重採樣；結果與 load_audio 在重採樣誤差內相同。"""
+    import soundfile as sf
+    with sf.SoundFile(str(path)) as f:
+        native = f.samplerate
+        n_out = int(np.ceil(f.frames * sr / native))
+        out = np.zeros(n_out, dtype=np.float32)
+        stream = None
+        if native != sr:
+            import soxr
+            stream = soxr.ResampleStream(native, sr, 1, dtype="float32", quality="HQ")
+        k = 0
+
+        def put(chunk: np.ndarray) -> None:
+            nonlocal k
+            m = min(len(chunk), n_out - k)
+            out[k:k + m] = chunk[:m]
+            k += m
+
+        for block in f.blocks(blocksize=block_frames, dtype="float32", always_2d=True):
+            mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+            put(mono if stream is None else stream.resample_chunk(mono))
+        if stream is not None:
+            put(stream.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+    return out, sr
+
+
+@dataclass(frozen=True)
+class IngestedAudio:
+    """落地後的上傳：path + 標頭資訊 + 解碼方式（raw / stream / decode）。"""
+
+    path: str
+    info: Optional[AudioInfo]
+    raw_format: Optional[str] = None
+
+    @property
+    def method(self) -> str:
+        if self.raw_format is not None:
+            return "raw"
+        return "stream" if self.info is not None else "decode"
+
+    def load(self, sr: int = TARGET_SR) -> Tuple[np.ndarray, int]:
+        if self.raw_format is not None:
+            return load_raw(self.path, self.raw_format), TARGET_SR
+        if self.info is not None:
+            try:
+                return load_stream(self.path, sr)
+            except Exception:
+                pass  # 標頭看起來對、內容 libsndfile 卻讀不了：退回 librosa（audioread）
+        return load_audio(self.path, sr=sr, mono=True)
+
+
+class UploadLimitMiddleware:
+    """Content-Length > max_bytes 的請求（限定路徑）不讀 body 直接回 413。"""
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.max_bytes and scope["path"] in self.paths:
+            length = dict(scope["headers"]).get(b"content-length")
+            if length is not None and length.isdigit() and int(length) > self.max_bytes:
+                body = json.dumps({"detail": f"Upload exceeds {self.max_bytes // (1 << 20)} MiB"}).encode()
+                await send({"type": "http.response.start", "status": 413,
+                            "headers": [(b"content-type", b"application/json"),
+                                        (b"content-length", str(len(body)).encode()),
+                                        (b"connection", b"close")]})
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
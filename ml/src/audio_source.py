@@ -0,0 +1,243 @@
+# src/audio_source.py
+"""
+音檔來源抽象：一般檔案路徑，或直接指向 ZIP 內成員的 URI（不必先解壓）。
+
+  zip://data/raw/l2arctic/ABA.zip!ABA/wav/arctic_a0001.wav
+
+- 每個 ZIP 的 central directory 只解析一次（依路徑快取，並記下 mtime + size），之後查成員是 dict 查詢。
+  同一路徑的 mtime / size 變了（長時間執行中 ZIP 被重寫）就換成新的 _ZipArchive，舊的立刻 close()：
+  fd 等正在讀的執行緒讀完才真的關掉，不會累積。close_archives() 關掉全部（測試 / 長駐行程收尾用）。
+- stored（未壓縮，L2-ARCTIC 的 wav 都是）成員：讀 local header 算出資料起點後直接 os.pread，
+  不建立 ZipFile、不經過解壓緩衝；壓縮過的成員才退回 ZipFile.open。
+- pread 不共用檔案位置，多執行緒 / fork 後的多行程共用同一個 fd 也安全。
+
+用法：
+  from audio_source import load_audio
+  y, sr = load_audio("zip://ABA.zip!ABA/wav/arctic_a0001.wav", sr=16000)
+"""
+from __future__ import annotations
+
+import io
+import os
+import struct
+import threading
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+ZIP_SCHEME = "zip://"
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")  # 30 bytes
+_LOCAL_MAGIC = b"PK\x03\x04"
+
+Source = Union[str, os.PathLike]
+
+
+def is_zip_uri(src: Source) -> bool:
+    return isinstance(src, str) and src.startswith(ZIP_SCHEME)
+
+
+def zip_uri(zip_path: Source, member: str) -> str:
+    return f"{ZIP_SCHEME}{Path(zip_path).as_posix()}!{member}"
+
+
+def parse_zip_uri(uri: str) -> Tuple[Path, str]:
+    if not is_zip_uri(uri) or "!" not in uri:
+        raise ValueError(f"不是 zip URI：{uri}（格式 zip://<archive>.zip!<member>）")
+    archive, member = uri[len(ZIP_SCHEME):].split("!", 1)
+    return Path(archive), member
+
+
+class _ArchiveClosed(ValueError):
+    pass
+
+
+class _ZipArchive:
+    """單一 ZIP 的 central directory 快取 + 成員讀取。"""
+
+    def __init__(self, path: Path, stamp: Tuple[int, int] = (0, 0)):
+        self.path = path
+        self.stamp = stamp  # (mtime_ns, size)：與磁碟上的不同就要換新的
+        with zipfile.ZipFile(path) as zf:
+            self.infos: Dict[str, zipfile.ZipInfo] = {i.filename: i for i in zf.infolist()}
+        self._data_offset: Dict[str, int] = {}
+        self._fd: Optional[int] = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self._zf: zipfile.ZipFile | None = None
+        self._lock = threading.Lock()
+        self._state = threading.Lock()  # 保護 _fd / _readers / _closing
+        self._readers = 0
+        self._closing = False
+
+    @contextmanager
+    def _use(self) -> Iterator[int]:
+        with self._state:
+            if self._closing or self._fd is None:
+                raise _ArchiveClosed(f"{self.path} 已關閉")
+            self._readers += 1
+            fd = self._fd
+        try:
+            yield fd
+        finally:
+            with self._state:
+                self._readers -= 1
+                if self._closing and not self._readers:
+                    self._release()
+
+    def _release(self) -> None:
+        # 呼叫端持有 _state
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+        if self._zf is not None:
+            self._zf.close()
+            self._zf = None
+
+    def close(self) -> None:
+        """之後的讀取會失敗；正在讀的執行緒讀完後才真的關 fd。"""
+        with self._state:
+            self._closing = True
+            if not self._readers:
+                self._release()
+
+    @property
+    def closed(self) -> bool:
+        return self._fd is None
+
+    def _pread(self, fd: int, n: int, offset: int) -> bytes:
+        if hasattr(os, "pread"):
+            return os.pread(fd, n, offset)
+        with self._lock:  # Windows 沒有 pread
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, n)
+
+    def __del__(self):
+        try:
+            if self._fd is not None:
+                os.close(self._fd)
+        except (AttributeError, OSError):
+            pass
+
+    def members(self) -> List[str]:
+        return list(self.infos)
+
+    def _offset(self, fd: int, info: zipfile.ZipInfo) -> int:
+        off = self._data_offset.get(info.filename)
+        if off is None:
+            # local header 的 extra 長度可能與 central directory 不同，要讀 local header 本身
+            hdr = _LOCAL_HEADER.unpack(self._pread(fd, _LOCAL_HEADER.size, info.header_offset))
+            if hdr[0] != _LOCAL_MAGIC:
+                raise zipfile.BadZipFile(f"{self.path}: {info.filename} 的 local header 損毀")
+            off = info.header_offset + _LOCAL_HEADER.size + hdr[9] + hdr[10]
+            self._data_offset[info.filename] = off
+        return off
+
+    def read(self, member: str) -> bytes:
+        info = self.infos.get(member)
+        if info is None:
+            raise FileNotFoundError(f"{self.path} 內沒有 {member}")
+        with self._use() as fd:
+            if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                data = self._pread(fd, info.file_size, self._offset(fd, info))
+                if len(data) != info.file_size:
+                    raise zipfile.BadZipFile(f"{self.path}: {member} 讀取長度不足")
+                return data
+            with self._lock:
+                if self._zf is None:
+                    self._zf = zipfile.ZipFile(self.path)
+                return self._zf.read(member)
+
+
+_ARCHIVES: Dict[str, _ZipArchive] = {}
+_ARCHIVES_LOCK = threading.Lock()
+
+
+def _archive(path: Path) -> _ZipArchive:
+    st = path.stat()
+    key, stamp = str(path.resolve()), (st.st_mtime_ns, st.st_size)
+    arc = _ARCHIVES.get(key)
+    if arc is None or arc.stamp != stamp:
+        with _ARCHIVES_LOCK:
+            arc = _ARCHIVES.get(key)
+            if arc is None or arc.stamp != stamp:
+                old, arc = arc, _ZipArchive(path, stamp)
+                _ARCHIVES[key] = arc
+                if old is not None:
+                    old.close()
+    return arc
+
+
+def close_archives() -> None:
+    """關掉並清空所有快取的 ZIP（之後再用到會重新開）。"""
+    with _ARCHIVES_LOCK:
+        archives = list(_ARCHIVES.values())
+        _ARCHIVES.clear()
+    for arc in archives:
+        arc.close()
+
+
+def zip_members(zip_path: Source) -> List[str]:
+    return _archive(Path(zip_path)).members()
+
+
+def iter_zip_uris(zip_path: Source, suffix: str = ".wav") -> Iterator[str]:
+    """依 ZIP 內順序列出副檔名符合的成員 URI（略過 macOS 的 __MACOSX/ 與 ._ 檔）。"""
+    for m in zip_members(zip_path):
+        name = PurePosixPath(m).name
+        if m.lower().endswith(suffix) and not m.startswith("__MACOSX/") and not name.startswith("._"):
+            yield zip_uri(zip_path, m)
+
+
+def exists(src: Source) -> bool:
+    if is_zip_uri(src):
+        archive, member = parse_zip_uri(src)
+        return archive.exists() and member in _archive(archive).infos
+    return Path(src).exists()
+
+
+def read_bytes(src: Source) -> bytes:
+    if is_zip_uri(src):
+        archive, member = parse_zip_uri(src)
+        try:
+            return _archive(archive).read(member)
+        except _ArchiveClosed:  # 剛好被換成新版本（ZIP 重寫）：用新的再讀一次
+            return _archive(archive).read(member)
+    return Path(src).read_bytes()
+
+
+def read_text(src: Source, encoding: str = "utf-8") -> str:
+    return read_bytes(src).decode(encoding, errors="ignore")
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    frames: int
+    samplerate: int
+    channels: int
+    format: str
+
+    @property
+    def duration_s(self) -> float:
+        return self.frames / self.samplerate if self.samplerate else 0.0
+
+
+def probe(src: Source) -> Optional[AudioInfo]:
+    """只讀容器標頭（libsndfile）取得長度 / 取樣率 / 聲道數，不解碼；讀不懂的格式（webm、m4a…）回 None。"""
+    import soundfile as sf
+    try:
+        info = sf.info(io.BytesIO(read_bytes(src)) if is_zip_uri(src) else str(src))
+    except Exception:
+        return None
+    if info.frames <= 0 or info.samplerate <= 0:
+        return None
+    return AudioInfo(int(info.frames), int(info.samplerate), int(info.channels), str(info.format))
+
+
+def load_audio(src: Source, sr: int = 16000, mono: bool = True) -> Tuple[np.ndarray, int]:
+    """librosa.load 的替代：一般路徑直接交給 librosa；zip URI 讀成員位元組後以記憶體檔案解碼。"""
+    import librosa
+    if is_zip_uri(src):
+        return librosa.load(io.BytesIO(read_bytes(src)), sr=sr, mono=mono)
+    return librosa.load(src, sr=sr, mono=mono)
@@ -0,0 +1,118 @@
+# src/band_lut.py
+"""
+overall_01 → band 的校準映射（linear / quantile / isotonic）與密集查表。
+
+- 三種映射都是整個陣列一次算（只依賴 numpy，服務端不需要 sklearn / pandas）。
+- calibrate_band.py 擬合完曲線後以 compile_lut() 在 0..1 上取 LUT_BINS 個等距點，
+  存成 artifacts/calibration/band_lut.npy（float32）+ band_lut.json（模式與擬合參數）。
+- API / CLI 以 load_lut() 載入；每次查詢 = 取最近的格點，O(1)。
+  格點上與精確映射完全相同；兩格點之間只有在 band 的階梯邊界落在半格以內時才可能差一階。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+LUT_BINS = 10001
+CAL_DIR = Path("artifacts") / "calibration"
+LUT_NPY = "band_lut.npy"
+LUT_JSON = "band_lut.json"
+BAND_MAX = 9.0
+
+
+# -----------------------------
+# 精確映射（向量化）
+# -----------------------------
+def to_half_band(x: np.ndarray) -> np.ndarray:
+    return np.round(x * 2) / 2
+
+
+def linear_map(overall: np.ndarray, low_high=(4.0, 9.0)) -> np.ndarray:
+    y = low_high[0] + (low_high[1] - low_high[0]) * np.clip(overall, 0, 1)
+    return to_half_band(y)
+
+
+def quantile_band(overall: np.ndarray, quantiles: Sequence[float], bands: Sequence[float]) -> np.ndarray:
+    """overall <= quantiles[i]（第一個 >= 的斷點）→ bands[i]；超過最後一個斷點用最後一個 band。"""
+    xs = np.clip(np.asarray(overall, dtype=float), 0, 1)
+    idx = np.minimum(np.searchsorted(np.asarray(quantiles, dtype=float), xs, side="right"), len(bands) - 1)
+    return to_half_band(np.asarray(bands, dtype=float)[idx])
+
+
+def isotonic_band(overall: np.ndarray, knots_x: Sequence[float], knots_y: Sequence[float], lo: float) -> np.ndarray:
+    """IsotonicRegression(out_of_bounds="clip") 的預測 = 在 thresholds 之間線性內插、兩端截斷。"""
+    y = np.interp(np.asarray(overall, dtype=float), knots_x, knots_y)
+    return to_half_band(lo + (BAND_MAX - lo) * np.clip(y, 0, 1))
+
+
+def mapping_from_meta(meta: dict) -> Callable[[np.ndarray], np.ndarray]:
+    """由 band_lut.json 的參數重建精確映射（測試與除錯用）。"""
+    mode = meta["mode"]
+    if mode == "linear":
+        return lambda xs: linear_map(xs, (meta["low"], meta["high"]))
+    if mode == "quantile":
+        return lambda xs: quantile_band(xs, meta["quantiles"], meta["bands"])
+    if mode == "isotonic":
+        return lambda xs: isotonic_band(xs, meta["knots_x"], meta["knots_y"], meta["lo"])
+    raise ValueError(f"未知的校準模式：{mode}")
+
+
+# -----------------------------
+# 查表
+# -----------------------------
+def lut_index(overall: np.ndarray, bins: int) -> np.ndarray:
+    """最近格點（四捨五入，.5 一律進位）；NaN 視為 0。"""
+    xs = np.nan_to_num(np.clip(np.asarray(overall, dtype=float), 0, 1), nan=0.0)
+    return np.floor(xs * (bins - 1) + 0.5).astype(np.intp)
+
+
+def compile_lut(mapping: Callable[[np.ndarray], np.ndarray], bins: int = LUT_BINS) -> np.ndarray:
+    return np.ascontiguousarray(mapping(np.linspace(0.0, 1.0, bins)), dtype=np.float32)
+
+
+def save_lut(table: np.ndarray, meta: dict, cal_dir: Path = CAL_DIR) -> Path:
+    cal_dir.mkdir(parents=True, exist_ok=True)
+    npy = cal_dir / LUT_NPY
+    tmp = cal_dir / (LUT_NPY + ".tmp.npy")
+    np.save(tmp, table)
+    os.replace(tmp, npy)
+    info = {**meta, "bins": int(len(table)), "sha1": hashlib.sha1(table.tobytes()).hexdigest()}
+    (cal_dir / LUT_JSON).write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+    return npy
+
+
+class BandLUT:
+    def __init__(self, table: np.ndarray, meta: dict):
+        self.table = table
+        self.meta = meta
+        self.bins = len(table)
+        self._scale = float(self.bins - 1)
+
+    @property
+    def mode(self) -> str:
+        return self.meta.get("mode", "unknown")
+
+    def __call__(self, overall_01: float) -> float:
+        x = float(overall_01)
+        x = 0.0 if not x > 0.0 else (1.0 if x > 1.0 else x)  # clip；NaN → 0
+        return float(self.table[int(x * self._scale + 0.5)])
+
+    def map(self, overall: np.ndarray) -> np.ndarray:
+        return self.table[lut_index(overall, self.bins)].astype(float)
+
+
+def load_lut(cal_dir: Path = CAL_DIR) -> Optional[BandLUT]:
+    """沒有校準產物時回傳 None（呼叫端退回線性映射）；檔案不一致時 raise ValueError。"""
+    npy, js = cal_dir / LUT_NPY, cal_dir / LUT_JSON
+    if not npy.exists() or not js.exists():
+        return None
+    table = np.load(npy)
+    meta = json.loads(js.read_text(encoding="utf-8"))
+    if table.ndim != 1 or len(table) != meta.get("bins") or hashlib.sha1(table.tobytes()).hexdigest() != meta.get("sha1"):
+        raise ValueError(f"{npy} 與 {js} 不一致，請重新執行 make calibrate")
+    return BandLUT(table, meta)
@@ -3,57 +3,90 @@ from __future__ import annotations
 import argparse, math
 from pathlib import Path
 import numpy as np
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-from xgboost import XGBRegressor
-from speech_features import extract_features
+
+from band_lut import BandLUT, load_lut
+from pcm_shards import parse_part
+from text_features import MODEL_FEATURES, text_features
+
+# pandas / sentence_transformers / xgboost / librosa 延遲載入：
+# --help 不需要任何一個，純音檔 manifest（無 transcript）也不需要文字模型。
 
 ART_DIR = Path("artifacts") / "writing_baseline"
 EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-def _simple_text_feats(text: str):
-    import re
-    words = text.split()
-    n_words = len(words)
-    n_chars = len(text)
-    avg_wlen = (sum(len(w) for w in words) / max(1, n_words))
-    uniq_ratio = len(set(w.lower() for w in words)) / max(1, n_words)
-    sents = re.split(r"[.!?]+", text)
-    sents = [s.strip() for s in sents if s.strip()]
-    n_sents = max(1, len(sents))
-    avg_sent_len = n_words / n_sents
-    return np.array([n_words, n_chars, avg_wlen, uniq_ratio, n_sents, avg_sent_len], dtype=float)
-
-def _to_band_0_9(overall_01: float) -> float:
+def _to_band_0_9(overall_01: float, lut: BandLUT | None = None) -> float:
+    if lut is not None:  # make calibrate 產生的校準查表
+        return lut(overall_01)
     band = 4.0 + 5.0 * float(np.clip(overall_01, 0, 1))
     return float(np.round(band * 2) / 2)
 
+class _ContentModels:
+    """第一筆有 transcript 的資料出現時才載入 XGBoost 與 SentenceTransformer。"""
+
+    def __init__(self):
+        self._wm = None
+        self._embedder = None
+
+    def get(self):
+        if self._wm is None:
+            from sentence_transformers import SentenceTransformer
+            from xgboost import XGBRegressor
+            wm = XGBRegressor()
+            wm.load_model(str(ART_DIR / "xgb.json"))
+            self._embedder = SentenceTransformer(EMB_MODEL)
+            self._wm = wm
+        return self._wm, self._embedder
+
+def _iter_manifest(path: str, limit: int):
+    """(audio_path, transcript, 訊號=None)：音檔由 extract_features 自己讀。"""
+    import pandas as pd
+    man = pd.read_csv(path)
+    if limit > 0:
+        man = man.head(limit)
+    for _, row in man.iterrows():
+        tx = row.get("transcript", "")
+        text = "" if (isinstance(tx, float) and math.isnan(tx)) else str(tx)
+        yield str(row["audio_path"]), text, None
+
+def _iter_shards(path: str, limit: int, part: tuple[int, int]):
+    """(audio_path, transcript, (y, sr))：從 pcm_shards 循序讀已解碼的 PCM，不碰原始小檔。"""
+    from itertools import islice
+    from pcm_shards import PcmShards
+    ds = PcmShards(path)
+    it = ds.iter_utterances(*part)
+    for y, meta in (islice(it, limit) if limit > 0 else it):
+        yield meta["audio_path"], meta.get("transcript", ""), (y, ds.sr)
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--manifest", required=True, help="CSV: audio_path,transcript")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--manifest", help="CSV: audio_path,transcript")
+    src.add_argument("--shards", help="pcm_shards.py pack 產生的資料夾（循序讀已解碼 PCM）")
+    ap.add_argument("--part", type=parse_part, default=(0, 1),
+                    help="搭配 --shards：只跑第 k 份 shard（k/N，例如 0/4），N 個行程各跑一份")
     ap.add_argument("--out", required=True, help="輸出 CSV")
     ap.add_argument("--limit", type=int, default=0, help="只跑前 N 筆（0 = 全部）")
     args = ap.parse_args()
 
-    man = pd.read_csv(args.manifest)
-    if args.limit > 0:
-        man = man.head(args.limit)
+    import pandas as pd
+    from speech_features import extract_features, extract_features_from_signal
+
+    items = (_iter_shards(args.shards, args.limit, args.part) if args.shards
+             else _iter_manifest(args.manifest, args.limit))
 
-    wm = XGBRegressor()
-    wm.load_model(str(ART_DIR / "xgb.json"))
-    embedder = SentenceTransformer(EMB_MODEL)
+    models = _ContentModels()
+    lut = load_lut()
+    print(f"[INFO] band 映射：{lut.mode + ' LUT' if lut else 'linear'}")
 
     rows = []
-    for _, row in man.iterrows():
-        audio = str(row["audio_path"])
-        tx = row.get("transcript", "")
-        text = "" if (isinstance(tx, float) and math.isnan(tx)) else str(tx)
+    for audio, text, signal in items:
 
         # content
         if text:
+            wm, embedder = models.get()
             try:
                 E = embedder.encode([text], batch_size=64, show_progress_bar=False, convert_to_numpy=True)
-                F = _simple_text_feats(text).reshape(1, -1)
+                F = text_features([text], MODEL_FEATURES)
                 X = np.hstack([E, F])
                 content = float(np.clip(wm.predict(X)[0], 0, 1))
             except Exception as e:
@@ -64,7 +97,10 @@ def main():
 
         # speaking
         try:
-            spk_feats, spk_scores, spk_unc = extract_features(audio, transcript=text)
+            if signal is None:
+                spk_feats, spk_scores, spk_unc = extract_features(audio, transcript=text)
+            else:
+                spk_feats, spk_scores, spk_unc = extract_features_from_signal(*signal, transcript=text)
             fluency = spk_scores["fluency_score"]
             pron = spk_scores["pronunciation_score"]
             flu_std = spk_unc["fluency_std"]
@@ -94,7 +130,7 @@ def main():
             overall = sum(v * (w / w_sum) for v, w in parts)
             # 簡單不確定度：成分的 std 以相同比重合成
             overall_std = float(np.sqrt(( (flu_std*w_flu)**2 + (pron_std*w_pron)**2 )) / max(1e-6, w_sum))
-            band = _to_band_0_9(overall)
+            band = _to_band_0_9(overall, lut)
         else:
             overall = np.nan; overall_std = 0.0; band = np.nan
 
@@ -1,17 +1,13 @@
 # src/calibrate_band.py
 from __future__ import annotations
-import argparse, json
+import argparse, json, time
 from pathlib import Path
 import numpy as np
 import pandas as pd
-from sklearn.isotonic import IsotonicRegression
 
-def to_half_band(x: np.ndarray) -> np.ndarray:
-    return np.round(x * 2) / 2
-
-def linear_map(overall: np.ndarray, low_high=(4.0, 9.0)) -> np.ndarray:
-    y = low_high[0] + (low_high[1] - low_high[0]) * np.clip(overall, 0, 1)
-    return to_half_band(y)
+# 映射本身（向量化、只依賴 numpy）放在 band_lut.py，API / CLI 共用
+from band_lut import CAL_DIR, compile_lut, isotonic_band, linear_map, quantile_band, save_lut, to_half_band
+from score_sketch import load_merged
 
 def parse_quantile_spec(spec: str) -> list[tuple[float, float]]:
     """
@@ -37,16 +33,10 @@ def quantile_map(overall: np.ndarray, spec_pairs: list[tuple[float, float]]) ->
     ps = [p for _, p in spec_pairs]
     bs = [b for b, _ in spec_pairs]
     qs = np.quantile(xs, ps, method="linear")
-
-    # 對每一個樣本找第一個 >= 的 quantile 位置
-    band = np.empty_like(xs)
-    for i, v in enumerate(xs):
-        idx = int(np.searchsorted(qs, v, side="right"))
-        idx = min(idx, len(bs)-1)
-        band[i] = bs[idx]
-    return to_half_band(band), {"bands": bs, "percentiles": ps, "quantiles": qs.tolist()}
+    return quantile_band(xs, qs, bs), {"bands": bs, "percentiles": ps, "quantiles": qs.tolist()}
 
 def fit_isotonic(overall: np.ndarray, band_true: np.ndarray):
+    from sklearn.isotonic import IsotonicRegression
     lo = 4.0 if np.nanmin(band_true) >= 4.0 else 0.0
     y = (np.clip(band_true, lo, 9.0) - lo) / (9.0 - lo)
     iso = IsotonicRegression(y_min=0.0, y_max=1.0, increasing=True, out_of_bounds="clip")
@@ -58,10 +48,15 @@ def export_curve_json(xs: np.ndarray, bands: np.ndarray, out_json: Path, mode: s
     out_json.parent.mkdir(parents=True, exist_ok=True)
     out_json.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
+def export_lut(mapping, meta: dict, cal_dir: Path, bins: int):
+    """把擬合好的映射編成密集查表（API / CLI 使用）。"""
+    npy = save_lut(compile_lut(mapping, bins), meta, cal_dir)
+    print(f"[OK] band LUT ({meta['mode']}, {bins} bins) -> {npy}")
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--scores", required=True, help="輸入 CSV（至少含 overall_01）")
-    ap.add_argument("--out", required=True, help="輸出 CSV（多一欄 band_calibrated）")
+    ap.add_argument("--scores", default="", help="輸入 CSV（至少含 overall_01）；--from-sketch 時可省略")
+    ap.add_argument("--out", default="", help="輸出 CSV（多一欄 band_calibrated）")
     ap.add_argument("--mode", choices=["linear","quantile","isotonic"], default="linear")
     ap.add_argument("--low", type=float, default=4.0, help="linear 模式最低 band")
     ap.add_argument("--high", type=float, default=9.0, help="linear 模式最高 band")
@@ -69,14 +64,26 @@ def main():
                     default="4.0:0.05,4.5:0.10,5.0:0.20,5.5:0.35,6.0:0.55,6.5:0.70,7.0:0.85,7.5:0.93,8.0:0.97,8.5:0.99,9.0:1.00",
                     help="quantile 模式的 band:percentile 斷點（0..1）")
     ap.add_argument("--labels", default="", help="isotonic 模式：CSV，含 overall_01,band_true")
+    ap.add_argument("--lut-bins", type=int, default=10001, help="匯出給 API / CLI 的查表格數（0 = 不匯出）")
+    ap.add_argument("--from-sketch", nargs="+", default=[],
+                    help="quantile 模式：改由 API 的 score sketch 快照（檔案或資料夾，可多個）擬合斷點")
+    ap.add_argument("--sketch-since-hours", type=float, default=0.0, help="只合併這段時間內更新過的快照（0 = 全部）")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.scores)
-    if "overall_01" not in df.columns:
-        raise SystemExit("scores 缺少 overall_01 欄位")
+    if args.from_sketch and args.mode != "quantile":
+        raise SystemExit("--from-sketch 只適用於 --mode quantile")
+    if not args.from_sketch and not (args.scores and args.out):
+        raise SystemExit("需要 --scores 與 --out（或 quantile 模式改用 --from-sketch）")
+    df = None
+    if args.scores:
+        if not args.out:
+            raise SystemExit("指定 --scores 時需要 --out")
+        df = pd.read_csv(args.scores)
+        if "overall_01" not in df.columns:
+            raise SystemExit("scores 缺少 overall_01 欄位")
 
     out_path = Path(args.out)
-    cal_dir = Path("artifacts") / "calibration"
+    cal_dir = CAL_DIR
     cal_dir.mkdir(parents=True, exist_ok=True)
 
     if args.mode == "linear":
@@ -85,18 +92,31 @@ def main():
         # 匯出曲線（均勻取 0..1）
         grid = np.linspace(0,1,201)
         export_curve_json(grid, linear_map(grid, (args.low,args.high)), cal_dir/"linear_curve.json", "linear", {"low":args.low,"high":args.high})
+        lut_meta = {"mode": "linear", "low": args.low, "high": args.high}
+        mapping = lambda xs: linear_map(xs, (args.low, args.high))
         print(f"[OK] linear[{args.low},{args.high}] -> {out_path} ({len(df)} rows)")
 
     elif args.mode == "quantile":
         pairs = parse_quantile_spec(args.quantile_spec)
-        bands, meta = quantile_map(df["overall_01"].values, pairs)
-        df["band_calibrated"] = bands
-        df.to_csv(out_path, index=False)
-        # 匯出離散映射（含實際量化點）
+        if args.from_sketch:
+            t0 = time.perf_counter()
+            sk = load_merged(args.from_sketch, since_s=args.sketch_since_hours * 3600)
+            ps, bs = [p for _, p in pairs], [b for b, _ in pairs]
+            meta = {"bands": bs, "percentiles": ps, "quantiles": sk.quantiles(ps).tolist(), "sketch_n": sk.n}
+            print(f"[OK] sketch n={sk.n} | 斷點擬合 {(time.perf_counter()-t0)*1e3:.1f} ms（含讀檔）")
+        else:
+            _, meta = quantile_map(df["overall_01"].values, pairs)
+        if df is not None:
+            bands = quantile_band(df["overall_01"].values, meta["quantiles"], meta["bands"])
+            df["band_calibrated"] = bands
+            df.to_csv(out_path, index=False)
+            print(f"[OK] quantile -> {out_path} ({len(df)} rows) | filled={int(np.isfinite(bands).sum())}")
+        # 匯出離散映射（以實際資料擬合出的量化點套到均勻格點上）
         grid = np.linspace(0,1,201)
-        grid_bands, meta_grid = quantile_map(grid, pairs)
+        grid_bands = quantile_band(grid, meta["quantiles"], meta["bands"])
         export_curve_json(grid, grid_bands, cal_dir/"quantile_map.json", "quantile", {"spec":pairs, "fit":meta})
-        print(f"[OK] quantile -> {out_path} ({len(df)} rows) | filled={int(np.isfinite(bands).sum())}")
+        lut_meta = {"mode": "quantile", "quantiles": meta["quantiles"], "bands": meta["bands"]}
+        mapping = lambda xs: quantile_band(xs, meta["quantiles"], meta["bands"])
 
     else:  # isotonic
         if not args.labels:
@@ -105,13 +125,18 @@ def main():
         if not {"overall_01","band_true"}.issubset(lab.columns):
             raise SystemExit("labels 需含 overall_01, band_true")
         iso, lo = fit_isotonic(lab["overall_01"].values, lab["band_true"].values)
-        yhat = iso.predict(df["overall_01"].values)
-        band = lo + (9.0 - lo) * np.clip(yhat, 0, 1)
-        df["band_calibrated"] = to_half_band(band)
+        # IsotonicRegression 的預測就是 thresholds 之間的線性內插：存 knots，之後只需 np.interp
+        kx, ky = iso.X_thresholds_.tolist(), iso.y_thresholds_.tolist()
+        df["band_calibrated"] = isotonic_band(df["overall_01"].values, kx, ky, lo)
         df.to_csv(out_path, index=False)
         xs = np.linspace(0,1,201)
         export_curve_json(xs, lo + (9.0-lo)*iso.predict(xs), cal_dir/"isotonic_curve.json", "isotonic", {"lo":lo})
         print(f"[OK] isotonic(lo={lo}) -> {out_path} ({len(df)} rows)")
+        lut_meta = {"mode": "isotonic", "lo": lo, "knots_x": kx, "knots_y": ky}
+        mapping = lambda xs: isotonic_band(xs, kx, ky, lo)
+
+    if args.lut_bins > 0:
+        export_lut(mapping, lut_meta, cal_dir, args.lut_bins)
 
 if __name__ == "__main__":
     main()
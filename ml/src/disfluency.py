@@ -0,0 +1,168 @@
+# src/disfluency.py
+"""
+逐字稿 disfluency 掃描器：只分詞一次，以 token 層級的 Aho–Corasick 自動機一次比對
+所有 filler 與 self-repair 編輯語（天然具有詞邊界），同時計算重複詞。
+
+- scan(transcript) 不做跨請求的快取（逐字稿不該留在 API 行程裡）：一次請求內由
+  speech_features.extract_features_from_signal 掃描一次，把 stats() 傳給基本特徵與 8 次 bootstrap 共用。
+- 每個 token 與每個命中都帶有字元位置（char_start / char_end）與 token 區間，
+  之後可與音訊時間軸對齊。
+- 一般文字（片語內的字以單一空白隔開）的計數與舊版 regex 相同：同一類別內 leftmost-longest、不重疊；
+  filler 與編輯語各自獨立計數（例如 "i mean" 兩邊都算）。token 以 [A-Za-z']+ 切分，比對時忽略大小寫與頭尾的撇號。
+- 與舊版不同（刻意的行為改變，會影響口說特徵的 filler / self-repair 數）：多字片語的字與字之間允許任意空白與逗號，
+  所以 "you  know"、"you, know"、"kind  of"、"i\nmean" 現在都會算到，舊版 regex 只認單一空白（"no, i mean" 例外）；
+  遇到句點等其他標點仍會斷開（"you. know" 不算）。
+- 單次掃描只比舊版 regex 組快約 0.95–1.25 倍；真正省下的是每次請求只掃描一次、結果傳給 8 次 bootstrap（約 10 倍）。
+"""
+from __future__ import annotations
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from itertools import accumulate, compress, count
+from operator import eq
+from typing import Dict, List, Optional, Tuple
+
+FILLER_PHRASES = ("um", "uh", "er", "ah", "hmm", "you know", "kinda", "kind of", "sorta",
+                  "lik", "like", "i mean", "well")
+REPAIR_PHRASES = ("sorry", "i mean", "no i mean", "let me", "actually")
+
+# 每個 token 連同其後的分隔字元一起切出（一次 C 層 findall），字元位置由長度累加還原
+_PAIR_RE = re.compile(r"([A-Za-z']+)([^A-Za-z']*)")
+_LEAD_RE = re.compile(r"[^A-Za-z']*")
+_JOINERS = " ,\t\r\n"
+
+
+@dataclass(frozen=True)
+class Token:
+    text: str
+    char_start: int
+    char_end: int
+
+
+@dataclass(frozen=True)
+class PhraseMatch:
+    phrase: str
+    category: str  # "filler" | "repair"
+    tok_start: int
+    tok_end: int   # exclusive
+    char_start: int
+    char_end: int
+
+
+@dataclass(frozen=True)
+class DisfluencyScan:
+    words: Tuple[str, ...]
+    starts: Tuple[int, ...]  # words[i] 在 transcript.strip() 中的起始字元位置
+    fillers: Tuple[PhraseMatch, ...]
+    repairs: Tuple[PhraseMatch, ...]
+    repeats: Tuple[int, ...]  # token index i，表示 words[i] 與 words[i-1] 相同（不分大小寫）
+
+    @property
+    def tokens(self) -> Tuple[Token, ...]:
+        return tuple(Token(w, a, a + len(w)) for w, a in zip(self.words, self.starts))
+
+    def stats(self) -> Dict[str, float]:
+        """與舊版 speech_features._disfluency_stats 相同的欄位。"""
+        n_words = len(self.words)
+        filler = len(self.fillers)
+        repair = len(self.repeats) + len(self.repairs)
+        per100 = lambda c: (c * 100.0 / max(1, n_words))
+        return {
+            "filler_count": float(filler),
+            "self_repair_count": float(repair),
+            "words": float(n_words),
+            "filler_per_100w": per100(filler),
+            "self_repair_per_100w": per100(repair),
+        }
+
+
+class _TokenAutomaton:
+    """邊為 token 的 Aho–Corasick；output 存 (phrase, category, 長度)。"""
+
+    def __init__(self, phrases: List[Tuple[str, str]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[str, str, int]]] = [[]]
+        for phrase, category in phrases:
+            s = 0
+            toks = phrase.split()
+            for t in toks:
+                nxt = self.goto[s].get(t)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[s][t] = nxt
+                s = nxt
+            self.out[s].append((phrase, category, len(toks)))
+        # 出現在任何片語中的 token；其餘 token 一律讓自動機回到 root，可以整段略過
+        self.alphabet = frozenset(t for g in self.goto for t in g)
+        # BFS 建 failure link，並把 fail 狀態的 output 併入（dictionary suffix links 攤平）
+        q = deque(self.goto[0].values())
+        while q:
+            s = q.popleft()
+            for t, nxt in self.goto[s].items():
+                q.append(nxt)
+                f = self.fail[s]
+                while f and t not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(t, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find_all(self, keys: List[str], gaps: Tuple[str, ...]) -> List[Tuple[int, int, str, str]]:
+        """
+        回傳所有命中 (tok_start, tok_end, phrase, category)，可能重疊。
+        gaps[i] 是 keys[i] 與 keys[i+1] 之間的原文；含標點時片語不能跨越。
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        hits = []
+        s, prev = 0, -2
+        for i in compress(count(), map(self.alphabet.__contains__, keys)):
+            if s and (i != prev + 1 or gaps[prev].strip(_JOINERS)):
+                s = 0
+            prev = i
+            k = keys[i]
+            while s and k not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(k, 0)
+            if s and out[s]:
+                for phrase, category, n in out[s]:
+                    hits.append((i + 1 - n, i + 1, phrase, category))
+        return hits
+
+
+_AUTOMATON = _TokenAutomaton(
+    [(p, "filler") for p in FILLER_PHRASES] + [(p, "repair") for p in REPAIR_PHRASES]
+)
+
+
+def _leftmost_longest(hits: List[Tuple[int, int, str, str]]) -> List[Tuple[int, int, str, str]]:
+    chosen, last_end = [], 0
+    for h in sorted(hits, key=lambda h: (h[0], -h[1])):
+        if h[0] >= last_end:
+            chosen.append(h)
+            last_end = h[1]
+    return chosen
+
+
+def scan(transcript: Optional[str]) -> DisfluencyScan:
+    t = (transcript or "").strip()
+    pairs = _PAIR_RE.findall(t)
+    if not pairs:
+        return DisfluencyScan((), (), (), (), ())
+    words, gaps = zip(*pairs)
+    lowered = " ".join(words).lower().split(" ")
+    keys = [w.strip("'") for w in lowered] if "'" in t else lowered
+    # 起始位置 = 前導分隔長度 + 之前所有 (token + 分隔) 的長度
+    starts = tuple(accumulate(map(len, map("".join, pairs[:-1])), initial=_LEAD_RE.match(t).end()))
+
+    hits = _AUTOMATON.find_all(keys, gaps)
+    by_cat: Dict[str, List[PhraseMatch]] = {"filler": [], "repair": []}
+    for cat in by_cat:
+        for a, b, phrase, _ in _leftmost_longest([h for h in hits if h[3] == cat]):
+            by_cat[cat].append(PhraseMatch(phrase, cat, a, b, starts[a], starts[b - 1] + len(words[b - 1])))
+
+    repeats = tuple(compress(count(1), map(eq, lowered[1:], lowered[:-1])))
+    return DisfluencyScan(words, starts, tuple(by_cat["filler"]), tuple(by_cat["repair"]), repeats)
@@ -0,0 +1,62 @@
+# src/feature_cache.py
+"""
+特徵矩陣快取。
+
+key 由輸入檔內容 hash + 模型名稱 / 特徵版本組成，矩陣以 float32、C-contiguous 的 .npy 存在
+data/cache/features/ 底下；之後以 np.load(mmap_mode="r") 載入，毫秒級完成且不佔額外 RAM。
+float32 + contiguous 正好是 XGBoost DMatrix 的原生輸入格式，可直接餵入而不再轉型複製。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+CACHE_DIR = Path("data") / "cache" / "features"
+
+_HASH_MEMO: dict[tuple[str, int, int], str] = {}
+
+
+def file_sha256(path: Path | str, chunk_size: int = 1 << 20) -> str:
+    """串流計算檔案 sha256；同一行程內以 (path, size, mtime) 記憶，避免重算。"""
+    p = Path(path)
+    st = p.stat()
+    memo_key = (str(p.resolve()), st.st_size, st.st_mtime_ns)
+    if memo_key in _HASH_MEMO:
+        return _HASH_MEMO[memo_key]
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    _HASH_MEMO[memo_key] = digest
+    return digest
+
+
+def cache_key(*parts: str) -> str:
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def cached_matrix(
+    name: str,
+    key: str,
+    build: Callable[[], np.ndarray],
+    cache_dir: Path = CACHE_DIR,
+    rebuild: bool = False,
+) -> np.ndarray:
+    """
+    回傳 cache_dir/<name>-<key>.npy 的唯讀 memmap；不存在（或 rebuild=True）時呼叫 build() 產生。
+    寫入採 tmp + os.replace，中斷不會留下半個檔案。
+    """
+    path = Path(cache_dir) / f"{name}-{key}.npy"
+    if path.exists() and not rebuild:
+        return np.load(path, mmap_mode="r")
+    arr = np.ascontiguousarray(build(), dtype=np.float32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+    return np.load(path, mmap_mode="r")
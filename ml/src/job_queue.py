@@ -0,0 +1,246 @@
+# src/job_queue.py
+"""
+評分工作的本機持久化佇列（SQLite，WAL）：API 行程只負責收件 / 查詢，worker 行程負責消化。
+
+- submit(kind, dedup_key, payload, spool_src)：同一個 dedup_key（內容雜湊 + 模型版本）若已有排隊中 / 執行中 /
+  已完成且未過期的工作，直接回那一筆（deduped=True），不重算；只有最終失敗的才允許重新送。
+  上傳的音檔（spool_src）在同一個交易裡搬進 <dir>/spool/<id><副檔名>，去重時則刪掉暫存檔。
+- claim(worker, lease_s)：BEGIN IMMEDIATE 內挑最舊的可執行工作（排隊中且過了退避時間，或執行中但租約已過期
+  ＝上一個 worker 掛了 / 服務重啟），標成 running、attempts+1、租約 lease_s 秒；多個 worker 行程同時搶也只有一個拿到。
+  執行期間 worker 定期 extend_lease，所以 lease_s 可以設短，重啟後很快就會被接手。
+- complete / fail：只有持有租約的 worker 能結案（租約被別人接手後，舊 worker 的結果直接丟掉）。
+  fail 可重試時依 backoff_s × 2^(attempts-1) 退避後重新排隊；超過 max_attempts 或 retry=False 就是 failed。
+  結案時刪掉 spool 音檔，結果保留到 expires（result TTL），purge() 清掉過期的列。
+- 每次操作開一條新連線（本機 SQLite 很便宜），API 的執行緒 / 多個 worker 行程之間不必共用連線。
+
+用法：
+  q = JobQueue("artifacts/jobs")
+  job, deduped = q.submit("writing", key, {"text": essay})
+  job = q.claim("host-123", lease_s=60)
+  q.complete(job.id, "host-123", {"overall_01": 0.7})
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+STATUSES = (QUEUED, RUNNING, DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    dedup_key    TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    spool_path   TEXT,
+    result       TEXT,
+    error        TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before   REAL NOT NULL,
+    lease_until  REAL,
+    worker       TEXT,
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL,
+    expires      REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, not_before);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs(dedup_key);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs(expires);
+"""
+
+
+@dataclass(frozen=True)
+class Job:
+    id: str
+    kind: str
+    status: str
+    payload: Dict[str, Any]
+    spool_path: Optional[str]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    attempts: int
+    max_attempts: int
+    created: float
+    updated: float
+    expires: Optional[float]
+
+    @classmethod
+    def _from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"], kind=row["kind"], status=row["status"], payload=json.loads(row["payload"]),
+            spool_path=row["spool_path"], result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"], attempts=row["attempts"], max_attempts=row["max_attempts"],
+            created=row["created"], updated=row["updated"], expires=row["expires"],
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+def _unlink(path: Optional[str]) -> None:
+    if path:
+        Path(path).unlink(missing_ok=True)
+
+
+class JobQueue:
+    def __init__(self, root: Path | str, max_attempts: int = 3, result_ttl_s: float = 86400.0,
+                 backoff_s: float = 2.0):
+        self.root = Path(root)
+        self.spool = self.root / "spool"
+        self.db_path = self.root / "jobs.sqlite3"
+        self.max_attempts = max_attempts
+        self.result_ttl_s = result_ttl_s
+        self.backoff_s = backoff_s
+        self.spool.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def submit(self, kind: str, dedup_key: str, payload: Dict[str, Any],
+               spool_src: Optional[str] = None) -> Tuple[Job, bool]:
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE dedup_key=? AND status!=? AND (expires IS NULL OR expires>?)"
+                " ORDER BY created DESC LIMIT 1",
+                (dedup_key, FAILED, now),
+            ).fetchone()
+            if row is not None:
+                _unlink(spool_src)
+                return Job._from_row(row), True
+            job_id = uuid.uuid4().hex
+            spool_path = None
+            if spool_src is not None:
+                spool_path = str(self.spool / f"{job_id}{Path(spool_src).suffix}")
+                os.replace(spool_src, spool_path)
+            db.execute(
+                "INSERT INTO jobs (id, kind, dedup_key, status, payload, spool_path, max_attempts,"
+                " not_before, created, updated) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (job_id, kind, dedup_key, QUEUED, json.dumps(payload), spool_path, self.max_attempts,
+                 now, now, now),
+            )
+            row = db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return Job._from_row(row), False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None or (row["expires"] is not None and row["expires"] <= time.time()):
+            return None
+        return Job._from_row(row)
+
+    def claim(self, worker: str, lease_s: float) -> Optional[Job]:
+        now = time.time()
+        with self._tx() as db:
+            while True:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE (status=? AND not_before<=?) OR (status=? AND lease_until<?)"
+                    " ORDER BY created LIMIT 1",
+                    (QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= row["max_attempts"]:
+                    # 租約過期且已用完次數（例如每次都把 worker 弄掛的輸入）：直接結案，不再重跑
+                    self._finish(db, row, FAILED, None, row["error"] or "worker lost the job too many times", now)
+                    continue
+                db.execute(
+                    "UPDATE jobs SET status=?, attempts=attempts+1, worker=?, lease_until=?, updated=? WHERE id=?",
+                    (RUNNING, worker, now + lease_s, now, row["id"]),
+                )
+                return Job._from_row(db.execute("SELECT * FROM jobs WHERE id=?", (row["id"],)).fetchone())
+
+    def extend_lease(self, job_id: str, worker: str, lease_s: float) -> bool:
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_until=? WHERE id=? AND worker=? AND status=?",
+                (time.time() + lease_s, job_id, worker, RUNNING),
+            )
+        return cur.rowcount == 1
+
+    def _finish(self, db: sqlite3.Connection, row: sqlite3.Row, status: str,
+                result: Optional[Dict[str, Any]], error: Optional[str], now: float) -> None:
+        db.execute(
+            "UPDATE jobs SET status=?, result=?, error=?, lease_until=NULL, updated=?, expires=? WHERE id=?",
+            (status, json.dumps(result) if result is not None else None, error, now,
+             now + self.result_ttl_s, row["id"]),
+        )
+        _unlink(row["spool_path"])
+
+    def _held(self, db: sqlite3.Connection, job_id: str, worker: str) -> Optional[sqlite3.Row]:
+        return db.execute("SELECT * FROM jobs WHERE id=? AND worker=? AND status=?",
+                          (job_id, worker, RUNNING)).fetchone()
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        with self._tx() as db:
+            row = self._held(db, job_id, worker)
+            if row is None:
+                return False
+            self._finish(db, row, DONE, result, None, time.time())
+        return True
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> Optional[str]:
+        """回傳新狀態（queued = 會重試 / failed）；租約已不在手上則 None。"""
+        now = time.time()
+        with self._tx() as db:
+            row = self._held(db, job_id, worker)
+            if row is None:
+                return None
+            if retry and row["attempts"] < row["max_attempts"]:
+                delay = self.backoff_s * 2 ** (row["attempts"] - 1)
+                db.execute(
+                    "UPDATE jobs SET status=?, error=?, worker=NULL, lease_until=NULL, not_before=?, updated=?"
+                    " WHERE id=?",
+                    (QUEUED, error, now + delay, now, job_id),
+                )
+                return QUEUED
+            self._finish(db, row, FAILED, None, error, now)
+        return FAILED
+
+    def purge(self) -> int:
+        """刪掉結果已過期的工作（含殘留的 spool 檔）。"""
+        now = time.time()
+        with self._tx() as db:
+            rows = db.execute("SELECT id, spool_path FROM jobs WHERE expires IS NOT NULL AND expires<=?",
+                              (now,)).fetchall()
+            db.executemany("DELETE FROM jobs WHERE id=?", [(r["id"],) for r in rows])
+        for r in rows:
+            _unlink(r["spool_path"])
+        return len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {s: int(counts.get(s, 0)) for s in STATUSES}
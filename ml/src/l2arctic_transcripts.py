@@ -0,0 +1,170 @@
+# src/l2arctic_transcripts.py
+"""
+L2-ARCTIC 逐字稿查詢：每位說話者的 txt/*.txt 與 etc/txt.done.data 只解析一次，之後每句 O(1)。
+
+  <SPK>/<SPK>/wav/arctic_a0001.wav
+  <SPK>/<SPK>/txt/arctic_a0001.txt        ← 優先
+  <SPK>/<SPK>/etc/txt.done.data           ← ( arctic_a0001 "TEXT" )，txt 沒有時才用
+
+- 一般路徑與 zip://<archive>.zip!<member> 都可以（見 audio_source.py）。
+- 行程內以說話者根目錄（wav/ 的上一層）快取；給 cache_dir 時另存 JSON，
+  以 txt/ 資料夾與 txt.done.data 的 mtime（ZIP 則是 ZIP 的 size + mtime）判斷是否過期。
+  就地改寫 txt 檔內容不會改到資料夾 mtime，這種情況請刪掉快取或用 --no-cache。
+
+用法：
+  from l2arctic_transcripts import TranscriptResolver
+  res = TranscriptResolver()
+  res.lookup("data/raw/l2arctic/ABA/ABA/wav/arctic_a0001.wav")   # → "Author of the danger trail, ..."
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from audio_source import is_zip_uri, parse_zip_uri, read_text, zip_members, zip_uri
+
+CACHE_DIR = Path("data") / "cache" / "transcripts"
+CACHE_VERSION = 1
+DONE_DATA_RE = re.compile(r'^\(\s*(\S+)\s+"(.+)"\s*\)\s*$')
+
+Speaker = Dict[str, Dict[str, str]]  # {"txt": {utt: text}, "done": {utt: text}}
+
+
+def parse_txt_done_data(content: str) -> Dict[str, str]:
+    """CMU txt.done.data → {utt_id: text}（同一 utt 出現多次時取第一筆）。"""
+    out: Dict[str, str] = {}
+    for line in content.splitlines():
+        m = DONE_DATA_RE.match(line.strip())
+        if m:
+            out.setdefault(m.group(1), m.group(2))
+    return out
+
+
+def derive_txt(wav: str) -> str:
+    """.../wav/xxx.wav → .../txt/xxx.txt（最後一個 wav 資料夾換成 txt）；沒有 wav 資料夾時換副檔名。"""
+    parts = list(Path(wav).parts)
+    if "wav" in parts:
+        i = len(parts) - 1 - parts[::-1].index("wav")
+        parts[i] = "txt"
+        return str(Path(*parts).with_suffix(".txt"))
+    return str(Path(wav).with_suffix(".txt"))
+
+
+def _read(src: str) -> Optional[str]:
+    try:
+        return read_text(src)
+    except (OSError, KeyError):
+        return None
+
+
+class TranscriptResolver:
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._speakers: Dict[str, Speaker] = {}
+
+    # -----------------------------
+    # 說話者層級
+    # -----------------------------
+    @staticmethod
+    def _split(wav: str) -> Tuple[Optional[Path], str, str, str]:
+        """→ (archive 或 None, 說話者根目錄, wav 所在資料夾名, utt_id)；ZIP 內一律用 posix 路徑。"""
+        if is_zip_uri(wav):
+            archive, member = parse_zip_uri(wav)
+            parent = posixpath.dirname(member)
+            return archive, posixpath.dirname(parent), posixpath.basename(parent), \
+                posixpath.splitext(posixpath.basename(member))[0]
+        parent = os.path.dirname(wav)
+        return None, os.path.dirname(parent), os.path.basename(parent), \
+            os.path.splitext(os.path.basename(wav))[0]
+
+    @staticmethod
+    def _fingerprint(archive: Optional[Path], root: str) -> list:
+        if archive is not None:
+            st = archive.stat()
+            return [st.st_size, st.st_mtime_ns]
+        fp = []
+        for p in (os.path.join(root, "txt"), os.path.join(root, "etc", "txt.done.data")):
+            try:
+                st = os.stat(p)
+                fp.append([st.st_size, st.st_mtime_ns] if p.endswith(".data") else st.st_mtime_ns)
+            except OSError:
+                fp.append(None)
+        return fp
+
+    @staticmethod
+    def _parse(archive: Optional[Path], root: str) -> Speaker:
+        txt: Dict[str, str] = {}
+        if archive is not None:
+            prefix = f"{root}/txt/" if root else "txt/"
+            names = [m for m in zip_members(archive)
+                     if m.startswith(prefix) and m.endswith(".txt") and "/" not in m[len(prefix):]]
+            for m in names:
+                content = _read(zip_uri(archive, m))
+                if content is not None:
+                    txt[posixpath.splitext(posixpath.basename(m))[0]] = content.strip()
+            done_src = zip_uri(archive, posixpath.join(root, "etc", "txt.done.data"))
+        else:
+            try:
+                with os.scandir(os.path.join(root, "txt")) as it:
+                    files = [(e.name, e.path) for e in it if e.name.endswith(".txt") and e.is_file()]
+            except OSError:
+                files = []
+            for name, path in files:
+                content = _read(path)
+                if content is not None:
+                    txt[name[:-4]] = content.strip()
+            done_src = os.path.join(root, "etc", "txt.done.data")
+        done = _read(done_src)
+        return {"txt": txt, "done": parse_txt_done_data(done) if done else {}}
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def speaker(self, wav: str) -> Speaker:
+        """wav 所屬說話者的全部逐字稿（第一次呼叫時解析，之後直接回傳）。"""
+        archive, root, _, _ = self._split(wav)
+        key = zip_uri(archive, root) if archive is not None else os.path.abspath(root)
+        hit = self._speakers.get(key)
+        if hit is not None:
+            return hit
+        fp = self._fingerprint(archive, root) if self.cache_dir is not None else None
+        if fp is not None:
+            try:
+                data = json.loads(self._cache_path(key).read_text(encoding="utf-8"))
+                if data.get("version") == CACHE_VERSION and data.get("key") == key and data.get("fp") == fp:
+                    hit = data["speaker"]
+            except (OSError, ValueError):
+                pass
+        if hit is None:
+            hit = self._parse(archive, root)
+            if fp is not None:
+                path = self._cache_path(key)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps({"version": CACHE_VERSION, "key": key, "fp": fp, "speaker": hit},
+                                          ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, path)
+        self._speakers[key] = hit
+        return hit
+
+    # -----------------------------
+    # 單句
+    # -----------------------------
+    def lookup(self, wav: str) -> Optional[str]:
+        """txt/<utt>.txt 的內容，沒有時用 etc/txt.done.data；兩者都沒有回 None。"""
+        wav = str(wav)
+        archive, _, parent_name, utt = self._split(wav)
+        spk = self.speaker(wav)
+        if parent_name == "wav":
+            text = spk["txt"].get(utt)
+        else:
+            # 非標準結構（wav 不在 wav/ 底下）：退回逐檔推導，不進快取
+            src = derive_txt(parse_zip_uri(wav)[1]) if archive is not None else derive_txt(wav)
+            text = _read(zip_uri(archive, Path(src).as_posix()) if archive is not None else src)
+            text = text.strip() if text is not None else None
+        return text or spk["done"].get(utt) or None
@@ -0,0 +1,245 @@
+# src/mem_budget.py
+"""
+口說請求的記憶體估算與預算控管（解碼前就決定收不收）。
+
+- 估算：先讀標頭取得長度 / 取樣率 / 聲道（audio_ingest.sniff_header，或落地後 audio_source.probe），不解碼就算出峰值：
+    解碼階段   librosa：native frames × channels × 4 B（float32）× DECODE_COPIES + 16 kHz 訊號
+              串流 / raw PCM（audio_ingest）：16 kHz 訊號 × 2 + 一個區塊
+    特徵階段   16 kHz 樣本數 × FEATURE_BYTES_PER_SAMPLE（yin 分幀矩陣 + bootstrap，實測約 170 B/樣本，
+              與原始取樣率 / 聲道數無關）
+  兩者取大再加 BASE_BYTES；max_duration_s 反推某個上限內最長可收幾秒。標頭讀不懂（webm / m4a…）就用檔案大小 ÷ 保守位元率推長度、以 48 kHz 立體聲估。
+- 預算（MemoryBudget，每個 worker 行程一份）：
+    單一請求估算 > per_request_bytes  → RequestTooLarge（API 回 413，重送也沒用）
+    全域已保留 + 估算 > total_bytes    → 排隊等別人釋放，最多 queue_timeout_s，逾時 BudgetBusy（503 + Retry-After）
+  排隊依先來後到（asyncio.Condition），大請求不會被源源不絕的小請求餓死。
+- 實測：RssWatcher 一條背景執行緒在有請求追蹤時每 ~10 ms 讀 /proc/self/statm，記錄每個請求期間
+  的 RSS 峰值增量；MemoryLog 保留最近 N 筆 {估算, 實測} 供調整係數（/debug/memory，需 PROFILE_TOKEN）。
+  RSS 是行程層級的：同時多個請求時各自的增量會互相重疊，allocator 保留的空間也會讓之後的請求看起來偏小，
+  所以看的是比值的分佈，不是單筆。
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from audio_source import AudioInfo
+
+MIB = 1 << 20
+TARGET_SR = 16000
+FEATURE_BYTES_PER_SAMPLE = 176
+DECODE_COPIES = 2
+STREAM_BLOCK_BYTES = 4 * MIB
+BASE_BYTES = 16 * MIB
+# 標頭讀不懂時的保守假設：低位元率壓縮（長度推得最長）＋ 48 kHz 立體聲
+FALLBACK_BITRATE_BPS = 32_000
+FALLBACK_SR = 48000
+FALLBACK_CHANNELS = 2
+
+
+def estimate_speaking_bytes(info: Optional[AudioInfo], file_bytes: int, target_sr: int = TARGET_SR,
+                            streamed: bool = False) -> int:
+    if info is not None:
+        duration, sr, channels = info.duration_s, info.samplerate, info.channels
+    else:
+        duration, sr, channels = file_bytes * 8 / FALLBACK_BITRATE_BPS, FALLBACK_SR, FALLBACK_CHANNELS
+    n_native = duration * sr
+    n_target = duration * target_sr
+    if streamed and info is not None:
+        decode = n_target * 4 * 2 + STREAM_BLOCK_BYTES
+    else:
+        decode = n_native * channels * 4 * DECODE_COPIES + n_target * 4
+    features = n_target * (4 + FEATURE_BYTES_PER_SAMPLE)
+    return int(BASE_BYTES + max(decode, features))
+
+
+def max_duration_s(limit_bytes: int, target_sr: int = TARGET_SR) -> float:
+    """estimate_speaking_bytes 的反函數（取特徵階段，常見取樣率下它都比解碼大）：limit_bytes 內最多可收幾秒。"""
+    return max(0.0, (limit_bytes - BASE_BYTES) / (target_sr * (4 + FEATURE_BYTES_PER_SAMPLE)))
+
+
+class RequestTooLarge(Exception):
+    def __init__(self, nbytes: int, limit: int):
+        super().__init__(f"估計需要 {nbytes / MIB:.0f} MiB，超過單一請求上限 {limit / MIB:.0f} MiB")
+        self.nbytes, self.limit = nbytes, limit
+
+
+class BudgetBusy(Exception):
+    def __init__(self, nbytes: int, waited_s: float):
+        super().__init__(f"記憶體預算已滿，等了 {waited_s:.1f}s 仍無法保留 {nbytes / MIB:.0f} MiB")
+        self.nbytes, self.waited_s = nbytes, waited_s
+
+
+class MemoryBudget:
+    """async with budget.reserve(nbytes): ...；0 表示不限制。"""
+
+    def __init__(self, total_bytes: int, per_request_bytes: int, queue_timeout_s: float = 10.0):
+        self.total_bytes = total_bytes
+        self.per_request_bytes = per_request_bytes
+        self.queue_timeout_s = queue_timeout_s
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._queue: Deque[object] = deque()
+
+    def _fits(self, nbytes: int) -> bool:
+        # 一個請求都沒在跑時一定放行（per_request 已擋掉單筆就超過的），避免 total < 單筆估算時永遠排不到
+        return not self.total_bytes or self.active == 0 or self.in_use + nbytes <= self.total_bytes
+
+    def check(self, nbytes: int) -> None:
+        """單筆估算超過 per_request_bytes 就 RequestTooLarge（不保留任何額度；多 part 請求可先全部檢查再送）。"""
+        if self.per_request_bytes and nbytes > self.per_request_bytes:
+            self.rejected += 1
+            raise RequestTooLarge(nbytes, self.per_request_bytes)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        self.check(nbytes)
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        ticket = object()
+        t0 = time.monotonic()
+        async with self._cond:
+            self._queue.append(ticket)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self._queue[0] is ticket and self._fits(nbytes)),
+                    timeout=self.queue_timeout_s or None,
+                )
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise BudgetBusy(nbytes, time.monotonic() - t0) from None
+            finally:
+                self.waiting -= 1
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            self.in_use += nbytes
+            self.active += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_use -= nbytes
+                self.active -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "total_mib": round(self.total_bytes / MIB, 1),
+            "per_request_mib": round(self.per_request_bytes / MIB, 1),
+            "in_use_mib": round(self.in_use / MIB, 1),
+            "peak_in_use_mib": round(self.peak_in_use / MIB, 1),
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Track:
+    __slots__ = ("base", "peak")
+
+    def __init__(self, base: int):
+        self.base = base
+        self.peak = base
+
+    @property
+    def peak_delta(self) -> int:
+        return max(0, self.peak - self.base)
+
+
+class RssWatcher:
+    """with watcher.track() as t: ...；t.peak_delta 是期間 RSS 峰值相對起點的增量（非 Linux 則為 None）。"""
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self._active: List[_Track] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+                    continue
+            rss = rss_bytes() or 0
+            for t in active:
+                if rss > t.peak:
+                    t.peak = rss
+            time.sleep(self.interval_s)
+
+    @contextmanager
+    def track(self) -> Iterator[Optional[_Track]]:
+        base = rss_bytes()
+        if base is None:
+            yield None
+            return
+        t = _Track(base)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-watcher", daemon=True)
+                self._thread.start()
+            self._active.append(t)
+            self._wake.set()
+        try:
+            yield t
+        finally:
+            t.peak = max(t.peak, rss_bytes() or 0)
+            with self._lock:
+                self._active.remove(t)
+
+
+class MemoryLog:
+    """最近 N 筆 {估算, 實測 RSS 峰值增量}；summary() 給 實測/估算 的分佈，用來調 FEATURE_BYTES_PER_SAMPLE。"""
+
+    def __init__(self, maxlen: int = 500):
+        self.rows: Deque[Dict] = deque(maxlen=maxlen)
+
+    def add(self, info: Optional[AudioInfo], estimate: int, measured: Optional[int], **extra) -> Dict:
+        row = {
+            "duration_s": round(info.duration_s, 2) if info else None,
+            "samplerate": info.samplerate if info else None,
+            "channels": info.channels if info else None,
+            "estimate_mib": round(estimate / MIB, 1),
+            "rss_peak_delta_mib": None if measured is None else round(measured / MIB, 1),
+            **extra,
+        }
+        self.rows.append(row)
+        return row
+
+    def summary(self) -> Dict:
+        pairs = [(r["rss_peak_delta_mib"], r["estimate_mib"]) for r in self.rows
+                 if r["rss_peak_delta_mib"] is not None and r["estimate_mib"]]
+        out: Dict = {"n": len(self.rows), "recent": list(self.rows)[-10:]}
+        if pairs:
+            ratio = np.array([m / e for m, e in pairs])
+            out["measured_over_estimate"] = {
+                "p50": round(float(np.quantile(ratio, 0.5)), 3),
+                "p95": round(float(np.quantile(ratio, 0.95)), 3),
+                "max": round(float(ratio.max()), 3),
+            }
+        return out
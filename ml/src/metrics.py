@@ -1,5 +1,40 @@
+from functools import lru_cache
+
 import numpy as np
 
+
+@lru_cache(maxsize=64)
+def _quadratic_weights(n: int) -> np.ndarray:
+    """(i - j)^2 / (n - 1)^2；依等級數快取（唯讀），不必每次呼叫重建。"""
+    if n > 1:
+        W = np.fromfunction(lambda i, j: ((i - j) ** 2) / ((n - 1) ** 2), (n, n))
+    else:
+        W = np.zeros((1, 1), dtype=float)
+    W.setflags(write=False)
+    return W
+
+
+def confusion_matrix(y_true, y_pred, min_rating: int, max_rating: int) -> np.ndarray:
+    """Observed matrix O[true - min, pred - min]（float 計數），一次 bincount 完成。"""
+    y_true = np.asarray(y_true, dtype=int)
+    y_pred = np.asarray(y_pred, dtype=int)
+    n = max_rating - min_rating + 1
+    a, b = y_true - min_rating, y_pred - min_rating
+    if a.size and (min(a.min(), b.min()) < 0 or max(a.max(), b.max()) >= n):
+        raise ValueError(f"rating 超出範圍 [{min_rating}, {max_rating}]")
+    return np.bincount(a * n + b, minlength=n * n).reshape(n, n).astype(float)
+
+
+def _qwk_from_confusion(O: np.ndarray) -> float:
+    W = _quadratic_weights(O.shape[0])
+    act_hist = O.sum(axis=1)
+    pred_hist = O.sum(axis=0)
+    E = np.outer(act_hist, pred_hist) / max(1.0, O.sum())
+    num = (W * O).sum()
+    den = (W * E).sum()
+    return 1.0 - num / den if den > 0 else 0.0
+
+
 def quadratic_weighted_kappa(y_true, y_pred, min_rating=None, max_rating=None):
     """
     Quadratic Weighted Kappa (QWK).
@@ -13,23 +48,114 @@ def quadratic_weighted_kappa(y_true, y_pred, min_rating=None, max_rating=None):
     if max_rating is None:
         max_rating = int(max(y_true.max(), y_pred.max()))
 
-    n = max_rating - min_rating + 1
-    # Observed matrix
-    O = np.zeros((n, n), dtype=float)
-    for a, b in zip(y_true, y_pred):
-        O[a - min_rating, b - min_rating] += 1.0
+    return _qwk_from_confusion(confusion_matrix(y_true, y_pred, min_rating, max_rating))
 
-    # Expected matrix
-    act_hist = O.sum(axis=1)
-    pred_hist = O.sum(axis=0)
-    E = np.outer(act_hist, pred_hist) / max(1.0, O.sum())
 
-    # Quadratic weights
-    if n > 1:
-        W = np.fromfunction(lambda i, j: ((i - j) ** 2) / ((n - 1) ** 2), (n, n))
-    else:
-        W = np.zeros((1, 1), dtype=float)
+def _qwk_batch(O: np.ndarray) -> np.ndarray:
+    """O: (B, n, n) → 每個 confusion matrix 的 QWK（與 _qwk_from_confusion 相同公式，向量化）。"""
+    W = _quadratic_weights(O.shape[1])
+    act, pred = O.sum(axis=2), O.sum(axis=1)
+    total = np.maximum(1.0, O.sum(axis=(1, 2)))
+    num = np.einsum("bij,ij->b", O, W)
+    den = np.einsum("bi,bi->b", act @ W, pred) / total
+    safe = np.where(den > 0, den, 1.0)
+    return np.where(den > 0, 1.0 - num / safe, 0.0)
 
-    num = (W * O).sum()
-    den = (W * E).sum()
-    return 1.0 - num / den if den > 0 else 0.0
+
+def _band_stats(O: np.ndarray) -> tuple:
+    """O: (..., n, n) → 每個 true 等級的 (n, exact, within1, bias)；該等級沒有樣本時為 NaN。"""
+    n = O.shape[-1]
+    rows = O.sum(axis=-1)
+    diag = np.diagonal(O, axis1=-2, axis2=-1)
+    near = diag.copy()
+    near[..., 1:] += np.diagonal(O, offset=-1, axis1=-2, axis2=-1)
+    near[..., :-1] += np.diagonal(O, offset=1, axis1=-2, axis2=-1)
+    offset = np.arange(n)[None, :] - np.arange(n)[:, None]  # pred - true
+    signed = (O * offset).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return rows, diag / rows, near / rows, signed / rows
+
+
+def qwk_bootstrap(y_true, y_pred, n_boot: int = 2000, groups=None, ci: float = 0.95, seed: int = 0,
+                  min_rating=None, max_rating=None, batch: int = 500) -> dict:
+    """
+    QWK 的 bootstrap 信賴區間（percentile 法），一次呼叫同時給出：
+      - 整體 QWK 與 CI
+      - by_group：每個 group（例如 essay_set）的 QWK 與 CI（各 group 用自己的等級範圍，同單獨呼叫）
+      - by_band：每個 true 等級的樣本數、exact / ±1 一致率、平均偏差（pred - true）與各自的 CI
+
+    QWK 只依賴 confusion matrix，所以「有放回抽 N 篇」等價於對各格做 multinomial(N, O/N)：
+    每次 resample 的成本是 O(n²) 而與 N 無關（group 樣本數比格數少時改抽 index + bincount），
+    batch 個 resample 一次向量化計算。
+    給 groups 時在各 group 內分層抽樣（group 大小固定），整體 QWK 由各 group 的 resample 加總而得。
+    點估計與 quadratic_weighted_kappa 完全相同。
+    """
+    y_true = np.asarray(y_true, dtype=int)
+    y_pred = np.asarray(y_pred, dtype=int)
+    lo = int(min(y_true.min(), y_pred.min())) if min_rating is None else int(min_rating)
+    hi = int(max(y_true.max(), y_pred.max())) if max_rating is None else int(max_rating)
+    n = hi - lo + 1
+    labels = np.zeros(y_true.size, dtype=int) if groups is None else np.asarray(groups)
+    uniq = np.unique(labels)
+    q = [(1 - ci) / 2 * 100, (1 + ci) / 2 * 100]
+    rng = np.random.default_rng(seed)
+
+    O_all = confusion_matrix(y_true, y_pred, lo, hi)
+    # 每個 group：在自己的等級範圍內抽樣（格數小很多），再放回整體矩陣的對應位置
+    parts = []
+    for g in uniq:
+        m = labels == g
+        g_lo = int(min(y_true[m].min(), y_pred[m].min()))
+        g_hi = int(max(y_true[m].max(), y_pred[m].max()))
+        O_g = confusion_matrix(y_true[m], y_pred[m], g_lo, g_hi)
+        codes = (y_true[m] - g_lo) * O_g.shape[0] + (y_pred[m] - g_lo)
+        parts.append((g, int(m.sum()), g_lo - lo, O_g, codes))
+
+    boot = np.empty(n_boot)
+    g_boot = {g: np.empty(n_boot) for g, *_ in parts}
+    band_boot = np.empty((3, n_boot, n))
+    for start in range(0, n_boot, batch):
+        b = min(batch, n_boot - start)
+        O = np.zeros((b, n, n))
+        for g, size, off, O_g, codes in parts:
+            k = O_g.shape[0]
+            if size < k * k:
+                # 樣本數比格數少（例如 set 8 的 0..60 分）：直接抽 index 再 bincount 比較便宜
+                picks = codes[rng.integers(0, size, size=(b, size))] + (np.arange(b) * k * k)[:, None]
+                draws = np.bincount(picks.ravel(), minlength=b * k * k).reshape(b, k, k).astype(float)
+            else:
+                draws = rng.multinomial(size, O_g.ravel() / size, size=b).reshape(b, k, k).astype(float)
+            g_boot[g][start:start + b] = _qwk_batch(draws)
+            O[:, off:off + k, off:off + k] += draws
+        boot[start:start + b] = _qwk_batch(O)
+        _, exact, within1, bias = _band_stats(O)
+        band_boot[:, start:start + b] = exact, within1, bias
+
+    def _ci(samples):
+        vals = np.nanpercentile(samples, q, axis=0) if np.isfinite(samples).any() else [np.nan, np.nan]
+        return [float(v) for v in vals]
+
+    out = {
+        "qwk": _qwk_from_confusion(O_all),
+        "ci": _ci(boot),
+        "std": float(np.std(boot)),
+        "n": int(y_true.size),
+        "n_boot": int(n_boot),
+        "ci_level": ci,
+        "by_group": {},
+        "by_band": {},
+    }
+    if groups is not None:
+        for g, size, _, O_g, _ in parts:
+            key = g.item() if hasattr(g, "item") else g
+            out["by_group"][key] = {"n": size, "qwk": _qwk_from_confusion(O_g), "ci": _ci(g_boot[g])}
+
+    rows, exact, within1, bias = _band_stats(O_all)
+    names = ("exact", "within1", "bias")
+    for i in np.flatnonzero(rows):
+        entry = {"n": int(rows[i])}
+        for j, (name, point) in enumerate(zip(names, (exact[i], within1[i], bias[i]))):
+            entry[name] = float(point)
+            entry[f"{name}_ci"] = _ci(band_boot[j, :, i])
+        out["by_band"][lo + int(i)] = entry
+    return out
@@ -0,0 +1,238 @@
+# src/pcm_shards.py
+"""
+把 speaking manifest（audio_path,transcript）打包成少數幾個大 shard：已解碼、已重採樣的 16 kHz PCM。
+
+批次評分 L2-ARCTIC 時，每句一次小檔 open + 解碼 + 重採樣；在網路 / overlay 儲存上時間幾乎都花在
+metadata I/O。打包一次之後，評分 / 訓練只需循序讀幾個大檔，或經 mmap 隨機存取任一句。
+
+資料夾格式（<out>/）：
+  pack.json              {"sr", "dtype", "shards": [{"name", "n", "samples"}...]}
+  shard-00000.pcm        所有句子的 PCM 首尾相接（raw，無檔頭；np.memmap 直接映射）
+  shard-00000.idx.npy    int64 offsets，長度 n+1；第 i 句 = pcm[offsets[i]:offsets[i+1]]
+  shard-00000.jsonl      每句一行 {"audio_path", "transcript"[, "error"]}，順序同 offsets
+
+- dtype=float32（預設）與 load_audio 的輸出逐位元相同；int16 省一半空間，差異在量化誤差以內。
+- 解碼失敗的句子保留一筆長度 0 + error，讀取端回傳 y=None，和 extract_features 讀不到檔一樣處理。
+- 多個 worker 分工：iter_utterances(part=k, parts=N) 取第 k 份 shard（shard 間輪流分配），
+  各自循序讀自己的 shard，彼此不重疊、合起來剛好是全部。
+
+用法（在 ml/ 底下）：
+  python src/pcm_shards.py pack --manifest data/speaking_manifest.csv --out data/shards/l2arctic
+  python src/pcm_shards.py show data/shards/l2arctic
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+PACK_JSON = "pack.json"
+DEFAULT_SR = 16000
+SHARD_MB = 512
+_DTYPES = {"float32": np.float32, "int16": np.int16}
+
+Utterance = Tuple[Optional[np.ndarray], Dict[str, str]]
+
+
+# -----------------------------
+# 打包
+# -----------------------------
+def _decode(args: Tuple[str, int]) -> Tuple[Optional[np.ndarray], str]:
+    from audio_source import load_audio
+    src, sr = args
+    try:
+        y, _ = load_audio(src, sr=sr, mono=True)
+        return np.ascontiguousarray(y, dtype=np.float32), ""
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _to_dtype(y: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "int16":
+        return np.round(np.clip(y, -1.0, 1.0) * 32767.0).astype(np.int16)
+    return y
+
+
+class _ShardWriter:
+    def __init__(self, out_dir: Path, idx: int, dtype: str):
+        self.name = f"shard-{idx:05d}"
+        self.dir = out_dir
+        self.dtype = dtype
+        self._pcm = open(out_dir / f"{self.name}.pcm", "wb")
+        self._meta = open(out_dir / f"{self.name}.jsonl", "w", encoding="utf-8")
+        self.offsets = [0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets[-1] * np.dtype(_DTYPES[self.dtype]).itemsize
+
+    def add(self, y: Optional[np.ndarray], meta: Dict[str, str]) -> None:
+        if y is not None:
+            self._pcm.write(_to_dtype(y, self.dtype).tobytes())
+        self.offsets.append(self.offsets[-1] + (0 if y is None else len(y)))
+        self._meta.write(json.dumps(meta, ensure_ascii=False) + "\n")
+
+    def close(self) -> dict:
+        self._pcm.close()
+        self._meta.close()
+        np.save(self.dir / f"{self.name}.idx.npy", np.asarray(self.offsets, dtype=np.int64))
+        return {"name": self.name, "n": len(self.offsets) - 1, "samples": self.offsets[-1]}
+
+
+def pack_manifest(manifest: Path, out_dir: Path, sr: int = DEFAULT_SR, dtype: str = "float32",
+                  shard_mb: float = SHARD_MB, workers: int = 0, limit: int = 0) -> dict:
+    """依 manifest 順序解碼（workers > 1 時多行程解碼、仍保持順序）並寫成 shard；回傳 pack.json 內容。"""
+    import pandas as pd
+    if dtype not in _DTYPES:
+        raise ValueError(f"dtype 只支援 {list(_DTYPES)}")
+    man = pd.read_csv(manifest)
+    if limit > 0:
+        man = man.head(limit)
+    paths = man["audio_path"].astype(str).tolist()
+    texts = man["transcript"].fillna("").astype(str).tolist() if "transcript" in man else [""] * len(paths)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / PACK_JSON).unlink(missing_ok=True)  # 寫完才出現 → 讀取端不會看到半套
+    limit_bytes = int(shard_mb * (1 << 20))
+    shards: List[dict] = []
+    writer = _ShardWriter(out_dir, 0, dtype)
+    n_err = 0
+
+    jobs = [(p, sr) for p in paths]
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        decoded = pool.map(_decode, jobs, chunksize=16)
+    else:
+        pool, decoded = None, map(_decode, jobs)
+    try:
+        for i, (path, text, (y, err)) in enumerate(zip(paths, texts, decoded)):
+            meta = {"audio_path": path, "transcript": text}
+            if err:
+                meta["error"] = err
+                n_err += 1
+            writer.add(y, meta)
+            if writer.nbytes >= limit_bytes and i + 1 < len(paths):
+                shards.append(writer.close())
+                writer = _ShardWriter(out_dir, len(shards), dtype)
+        shards.append(writer.close())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    info = {"sr": sr, "dtype": dtype, "n": len(paths), "errors": n_err, "source": str(manifest), "shards": shards}
+    (out_dir / PACK_JSON).write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+    return info
+
+
+# -----------------------------
+# 讀取
+# -----------------------------
+class PcmShards:
+    """已打包的 shard 資料夾；len() / [i] 經 mmap 隨機存取，iter_utterances() 循序讀。"""
+
+    def __init__(self, pack_dir: Path | str):
+        self.dir = Path(pack_dir)
+        js = self.dir / PACK_JSON
+        if not js.exists():
+            raise FileNotFoundError(f"{js} 不存在（尚未打包完成？請執行 python src/pcm_shards.py pack）")
+        self.info = json.loads(js.read_text(encoding="utf-8"))
+        self.sr = int(self.info["sr"])
+        self.dtype = self.info["dtype"]
+        self.shards = self.info["shards"]
+        self._starts = np.cumsum([0] + [s["n"] for s in self.shards]).tolist()
+        self._cache: Dict[int, Tuple[np.ndarray, np.ndarray, List[dict]]] = {}
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def _open(self, k: int) -> Tuple[np.ndarray, np.ndarray, List[dict]]:
+        hit = self._cache.get(k)
+        if hit is None:
+            name = self.shards[k]["name"]
+            offsets = np.load(self.dir / f"{name}.idx.npy")
+            samples = int(offsets[-1])
+            pcm = (np.memmap(self.dir / f"{name}.pcm", dtype=_DTYPES[self.dtype], mode="r", shape=(samples,))
+                   if samples else np.empty(0, dtype=_DTYPES[self.dtype]))
+            with open(self.dir / f"{name}.jsonl", encoding="utf-8") as f:
+                metas = [json.loads(line) for line in f]
+            hit = self._cache[k] = (pcm, offsets, metas)
+        return hit
+
+    def _signal(self, pcm: np.ndarray, a: int, b: int) -> np.ndarray:
+        seg = pcm[a:b]
+        if self.dtype == "int16":
+            return seg.astype(np.float32) / np.float32(32767.0)
+        return np.array(seg)  # 複製出 mmap，呼叫端可自由修改
+
+    def __getitem__(self, i: int) -> Utterance:
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        k = bisect_right(self._starts, i) - 1
+        pcm, offsets, metas = self._open(k)
+        j = i - self._starts[k]
+        meta = metas[j]
+        return (None if "error" in meta else self._signal(pcm, offsets[j], offsets[j + 1])), meta
+
+    def shard_ids(self, part: int = 0, parts: int = 1) -> List[int]:
+        if not 0 <= part < parts:
+            raise ValueError(f"part 必須在 [0, {parts})")
+        return list(range(part, len(self.shards), parts))
+
+    def iter_utterances(self, part: int = 0, parts: int = 1) -> Iterator[Utterance]:
+        """循序讀第 part 份（共 parts 份）的 shard；每個 shard 讀完就釋放 mmap。"""
+        for k in self.shard_ids(part, parts):
+            pcm, offsets, metas = self._open(k)
+            for j, meta in enumerate(metas):
+                yield (None if "error" in meta else self._signal(pcm, offsets[j], offsets[j + 1])), meta
+            self._cache.pop(k, None)
+
+
+def parse_part(spec: str) -> Tuple[int, int]:
+    """'k/N' → (k, N)，給 CLI 的 --part 用。"""
+    try:
+        k, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--part 格式為 k/N（例如 0/4），收到 {spec!r}")
+    if not 0 <= k < n:
+        raise argparse.ArgumentTypeError(f"--part 需要 0 <= k < N，收到 {spec!r}")
+    return k, n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    pk = sub.add_parser("pack", help="manifest → PCM shards")
+    pk.add_argument("--manifest", required=True, help="CSV: audio_path,transcript（audio_path 可為 zip:// URI）")
+    pk.add_argument("--out", required=True, help="輸出資料夾")
+    pk.add_argument("--sr", type=int, default=DEFAULT_SR)
+    pk.add_argument("--dtype", choices=list(_DTYPES), default="float32")
+    pk.add_argument("--shard-mb", type=float, default=SHARD_MB, help="每個 shard 的 PCM 大小上限（MB）")
+    pk.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="解碼行程數（1 = 單行程）")
+    pk.add_argument("--limit", type=int, default=0)
+    sh = sub.add_parser("show", help="列出 shard 數、句數、總長度")
+    sh.add_argument("pack_dir")
+    args = ap.parse_args()
+
+    if args.cmd == "pack":
+        info = pack_manifest(Path(args.manifest), Path(args.out), args.sr, args.dtype,
+                             args.shard_mb, args.workers, args.limit)
+        print(f"[OK] {info['n']} 句 → {len(info['shards'])} 個 shard（{args.out}），解碼失敗 {info['errors']} 句")
+        return
+    ds = PcmShards(args.pack_dir)
+    total = sum(s["samples"] for s in ds.shards)
+    print(f"sr={ds.sr} dtype={ds.dtype} n={len(ds)} errors={ds.info.get('errors', 0)} "
+          f"hours={total / ds.sr / 3600:.2f}")
+    for s in ds.shards:
+        mb = s["samples"] * np.dtype(_DTYPES[ds.dtype]).itemsize / (1 << 20)
+        print(f"  {s['name']}: n={s['n']} {mb:.1f} MB {s['samples'] / ds.sr / 60:.1f} min")
+
+
+if __name__ == "__main__":
+    main()
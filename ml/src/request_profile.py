@@ -0,0 +1,303 @@
+# src/request_profile.py
+"""
+單一請求的除錯用 profiling（opt-in）：取樣或 cProfile + tracemalloc 峰值。
+
+- 只在服務啟動時設了 PROFILE_TOKEN 才會掛上 ProfileMiddleware；沒設就完全不在請求路徑上（零額外成本）。
+  掛上之後，也只有帶了正確 `X-Profile: <token>` 標頭、且路徑符合前綴的請求才會被 profile，
+  其餘請求只多一次標頭查找。
+- 模式（`X-Profile-Mode`）：
+    sample   （預設）另開一條執行緒，每 interval 抓一次處理請求那條執行緒的 Python 呼叫堆疊，
+             輸出 collapsed stacks（`a;b;c 次數`，可直接餵 flamegraph.pl / speedscope / inferno）
+    cprofile 決定性 profiler，輸出 .pstats（snakeviz / pstats 可讀）與依 cumtime 排序的前幾名函式
+- handler 把重活丟到 asyncio.to_thread 時，在工作執行緒裡包一層 `with follow_thread():`，
+  取樣器會一併抓那條執行緒、cProfile 模式則在那條執行緒另開一個 profiler，結束時合併。
+- 兩種模式都會開 tracemalloc（若原本沒開），記錄請求期間的記憶體峰值與結束時仍存活的前幾大配置位置。
+- tracemalloc 與取樣都是行程層級的，所以同時只 profile 一個請求（其他被 profile 的請求排隊）；
+  async handler 在 await 期間若有別的請求在同一條執行緒上跑，它們的堆疊也會被取樣到。
+- 結果存到 ProfileStore（預設保留最近 50 份），回應帶 `X-Profile-Id`，之後用 id 取回。
+
+用法：
+  PROFILE_TOKEN=s3cret uvicorn api.app:app --port 8100
+  curl -H 'X-Profile: s3cret' -F audio=@slow.wav localhost:8100/score/speaking -D -   # → X-Profile-Id: …
+  curl -H 'X-Profile: s3cret' 'localhost:8100/debug/profiles/<id>?format=collapsed' > slow.folded
+  flamegraph.pl slow.folded > slow.svg
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PROFILE_HEADER = b"x-profile"
+MODE_HEADER = b"x-profile-mode"
+ID_HEADER = b"x-profile-id"
+MODES = ("sample", "cprofile")
+DEFAULT_INTERVAL_S = 0.002
+TOP_N = 25
+
+_SELF = os.path.abspath(__file__)
+
+
+def _label(code) -> str:
+    """collapsed stacks 的節點名稱：函式 (檔名:定義行)。"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """每 interval_s 抓一次指定執行緒（可動態增減）的堆疊，累計成 {root;...;leaf: 次數}。"""
+
+    def __init__(self, thread_id: int, interval_s: float = DEFAULT_INTERVAL_S):
+        self.thread_ids = {thread_id}
+        self.interval_s = interval_s
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            for tid in list(self.thread_ids):
+                frame = frames.get(tid)
+                stack: List[str] = []
+                while frame is not None:
+                    if frame.f_code.co_filename != _SELF:
+                        stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    self.counts[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+
+class RequestProfile:
+    """with RequestProfile("sample") as p: ...；結束後 p.meta / p.collapsed() / p.pstats_bytes()。"""
+
+    def __init__(self, mode: str = "sample", interval_s: float = DEFAULT_INTERVAL_S, top_n: int = TOP_N):
+        if mode not in MODES:
+            raise ValueError(f"mode 必須是 {MODES}")
+        self.mode = mode
+        self.interval_s = interval_s
+        self.top_n = top_n
+        self.meta: Dict = {}
+        self._sampler: Optional[StackSampler] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._own_tracemalloc = False
+
+    def __enter__(self) -> "RequestProfile":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._mem0 = tracemalloc.get_traced_memory()[0]
+        self._t0, self._c0 = time.perf_counter(), time.process_time()
+        if self.mode == "sample":
+            self._sampler = StackSampler(threading.get_ident(), self.interval_s).start()
+        else:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._token = _active.set(self)
+        return self
+
+    @contextmanager
+    def attach(self) -> Iterator[None]:
+        """把目前這條（工作）執行緒納入這份 profile。"""
+        if self._sampler is not None:
+            tid = threading.get_ident()
+            self._sampler.thread_ids.add(tid)
+            try:
+                yield
+            finally:
+                self._sampler.thread_ids.discard(tid)
+            return
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            self._thread_profiles.append(prof)
+
+    def __exit__(self, *exc) -> None:
+        _active.reset(self._token)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        wall, cpu = time.perf_counter() - self._t0, time.process_time() - self._c0
+        current, peak = tracemalloc.get_traced_memory()
+        snap = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, _SELF),
+        ])
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        self.meta = {
+            "mode": self.mode,
+            "wall_ms": round(wall * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            "tracemalloc": {
+                "peak_kib": round((peak - self._mem0) / 1024, 1),
+                "retained_kib": round((current - self._mem0) / 1024, 1),
+                "top_retained": [
+                    {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                     "kib": round(s.size / 1024, 1), "count": s.count}
+                    for s in snap.statistics("lineno")[: self.top_n]
+                ],
+            },
+        }
+        if self._sampler is not None:
+            self.meta["samples"] = self._sampler.samples
+            self.meta["interval_ms"] = self.interval_s * 1000
+        if self._cprofile is not None:
+            self.meta["top_cumulative"] = self._top_functions()
+
+    def _stats(self) -> pstats.Stats:
+        return pstats.Stats(self._cprofile, *self._thread_profiles, stream=io.StringIO())
+
+    def _top_functions(self) -> List[Dict]:
+        st = self._stats()
+        rows = sorted(st.stats.items(), key=lambda kv: kv[1][3], reverse=True)[: self.top_n]
+        return [{"function": f"{name} ({os.path.basename(path)}:{line})", "calls": nc,
+                 "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)}
+                for (path, line, name), (_, nc, tt, ct, _) in rows]
+
+    def collapsed(self) -> str:
+        return self._sampler.collapsed() if self._sampler is not None else ""
+
+    def pstats_bytes(self) -> bytes:
+        if self._cprofile is None:
+            return b""
+        import marshal
+        return marshal.dumps(self._stats().stats)
+
+
+_active: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+@contextmanager
+def follow_thread() -> Iterator[None]:
+    """在 asyncio.to_thread 的工作函式裡用：目前請求有 profile 就把這條執行緒也納入，否則什麼都不做。"""
+    prof = _active.get()
+    if prof is None:
+        yield
+        return
+    with prof.attach():
+        yield
+
+
+class ProfileStore:
+    """<dir>/<id>.json（meta）+ <id>.folded 或 <id>.pstats；只保留最近 keep 份。"""
+
+    SUFFIXES = (".json", ".folded", ".pstats")
+
+    def __init__(self, root: Path, keep: int = 50):
+        self.root = Path(root)
+        self.keep = keep
+
+    @staticmethod
+    def new_id() -> str:
+        return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, profile_id: str, prof: RequestProfile, info: Dict) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        if prof.mode == "sample":
+            (self.root / f"{profile_id}.folded").write_text(prof.collapsed(), encoding="utf-8")
+        else:
+            (self.root / f"{profile_id}.pstats").write_bytes(prof.pstats_bytes())
+        path = self.root / f"{profile_id}.json"
+        path.write_text(json.dumps({"id": profile_id, **info, **prof.meta}, ensure_ascii=False, indent=2),
+                        encoding="utf-8")
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        metas = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in metas[: max(0, len(metas) - self.keep)]:
+            for suf in self.SUFFIXES:
+                old.with_suffix(suf).unlink(missing_ok=True)
+
+    def path(self, profile_id: str, suffix: str) -> Optional[Path]:
+        """id 只接受 new_id() 產生的字元，避免路徑跳脫。"""
+        if suffix not in self.SUFFIXES or not profile_id or not all(c.isalnum() or c in "-T" for c in profile_id):
+            return None
+        p = self.root / f"{profile_id}{suffix}"
+        return p if p.exists() else None
+
+
+def token_ok(given: Optional[str], token: str) -> bool:
+    return bool(token) and given is not None and hmac.compare_digest(given.encode(), token.encode())
+
+
+def _header(headers: Iterable[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for k, v in headers:
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return None
+
+
+class ProfileMiddleware:
+    """純 ASGI middleware：不帶 X-Profile 的請求直接放行，不包任何東西。"""
+
+    def __init__(self, app, token: str, store: ProfileStore, prefixes: Tuple[str, ...] = ("/score/",),
+                 interval_s: float = DEFAULT_INTERVAL_S):
+        self.app = app
+        self.token = token
+        self.store = store
+        self.prefixes = prefixes
+        self.interval_s = interval_s
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            return await self.app(scope, receive, send)
+        given = _header(scope["headers"], PROFILE_HEADER)
+        if given is None or not token_ok(given, self.token):
+            return await self.app(scope, receive, send)
+
+        mode = _header(scope["headers"], MODE_HEADER) or "sample"
+        if mode not in MODES:
+            mode = "sample"
+        profile_id = self.store.new_id()
+        status: Dict[str, int] = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (ID_HEADER, profile_id.encode())]}
+            await send(message)
+
+        async with self._lock:
+            prof = RequestProfile(mode, self.interval_s)
+            try:
+                with prof:
+                    await self.app(scope, receive, send_with_id)
+            finally:
+                info = {"path": scope["path"], "method": scope["method"], "status": status.get("code"),
+                        "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                await asyncio.to_thread(self.store.save, profile_id, prof, info)
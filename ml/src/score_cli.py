@@ -1,15 +1,17 @@
 from __future__ import annotations
 import argparse, json, sys
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from xgboost import XGBRegressor
-from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
 
-# 你專案內的語音特徵
-from speech_features import extract_features  # 保留原 import；下方會做兼容包裝
+from band_lut import load_lut
+from text_features import MODEL_FEATURES, text_features
+
+# 重量級依賴（sentence_transformers / torch / xgboost / sklearn / librosa）一律延遲到
+# 真正需要的路徑才 import：--help 與純音檔評分不該付出載入文字模型的時間。
+if TYPE_CHECKING:
+    from xgboost import XGBRegressor
 
 ART_DIR = Path("artifacts") / "writing_baseline"
 EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
@@ -17,25 +19,8 @@ EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 # -----------------------------
 # Utilities
 # -----------------------------
-def _simple_text_feats(text: str) -> np.ndarray:
-    import re
-    words = text.split()
-    n_words = len(words)
-    n_chars = len(text)
-    avg_wlen = (sum(len(w) for w in words) / max(1, n_words))
-    uniq_ratio = len(set(w.lower() for w in words)) / max(1, n_words)
-    sents = re.split(r"[.!?]+", text)
-    sents = [s.strip() for s in sents if s.strip()]
-    n_sents = max(1, len(sents))
-    avg_sent_len = n_words / n_sents
-    stop_cnt = sum(1 for w in words if w.lower() in ENGLISH_STOP_WORDS)
-    stop_ratio = stop_cnt / max(1, n_words)
-    return np.array(
-        [n_words, n_chars, avg_wlen, uniq_ratio, n_sents, avg_sent_len, stop_ratio],
-        dtype=float,
-    )
-
 def _embed_texts(texts):
+    from sentence_transformers import SentenceTransformer
     model = SentenceTransformer(EMB_MODEL)
     return model.encode(texts, batch_size=64, show_progress_bar=False, convert_to_numpy=True)
 
@@ -43,21 +28,26 @@ def _load_writing_model() -> XGBRegressor:
     path = ART_DIR / "xgb.json"
     if not path.exists():
         raise FileNotFoundError(f"找不到 {path}，請先執行 make train_writing")
+    from xgboost import XGBRegressor
     m = XGBRegressor()
     m.load_model(str(path))
     return m
 
 def _predict_content_norm(text: str, model: XGBRegressor) -> float:
     E = _embed_texts([text])
-    F = _simple_text_feats(text)[:6]  # 與訓練特徵一致（前 6 個）
-    X = np.hstack([E, F.reshape(1, -1)])
+    F = text_features([text], MODEL_FEATURES)  # 與訓練特徵一致（前 6 個）
+    X = np.hstack([E, F])
     y = float(model.predict(X)[0])
     if not np.isfinite(y):
         y = 0.0
     return float(np.clip(y, 0.0, 1.0))
 
 def _to_band_0_9(overall_01: float) -> float:
-    # 暫時線性映射：0→約4.0；1→約9.0，四捨五入到 0.5
+    # 有校準查表（make calibrate → artifacts/calibration/band_lut.npy）就用查表
+    lut = load_lut()
+    if lut is not None:
+        return lut(overall_01)
+    # 否則線性映射：0→約4.0；1→約9.0，四捨五入到 0.5
     band = 4.0 + 5.0 * float(np.clip(overall_01, 0, 1))
     return float(np.round(band * 2) / 2)
 
@@ -79,6 +69,8 @@ def _safe_extract_speaking(audio_path: str, transcript: Optional[str] = None
     Wrap speech_features.extract_features to tolerate different return signatures.
     Always returns (features_dict, scores_dict) with keys 'fluency_01' and 'pronunciation_01' if available.
     """
+    from speech_features import extract_features  # librosa 只在音檔路徑載入
+
     res = extract_features(audio_path, transcript=transcript)
 
     feats: Dict[str, Any] = {}
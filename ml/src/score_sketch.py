@@ -0,0 +1,143 @@
+# src/score_sketch.py
+"""
+overall_01 的串流分位數 sketch（給線上 band 校準用）。
+
+overall_01 的值域固定在 [0, 1]，所以不用 t-digest / KLL 這類通用 sketch：
+直接用與 band_lut 相同的 10,001 個格點做計數直方圖。
+  - 更新：一次整數加法（O(1)），誤差上限 = 半格（5e-5）
+  - 合併：計數相加（可交換、可結合），跨 worker / 機器任意順序合併結果相同
+  - 分位數：cumsum + searchsorted，與 np.quantile(method="linear") 在格點化資料上的結果完全相同，
+    重新擬合 --quantile-spec 斷點只要幾毫秒
+  - 快照：每個 worker 寫自己的 .npz（原子替換），calibrate_band --from-sketch 讀整個資料夾合併
+
+用法（在 ml/ 底下）：
+  python src/score_sketch.py show artifacts/calibration/sketch
+  python src/score_sketch.py merge node-a/ node-b/ -o merged.npz
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from band_lut import CAL_DIR, LUT_BINS, lut_index
+
+SKETCH_DIR = CAL_DIR / "sketch"
+
+
+class QuantileSketch:
+    def __init__(self, bins: int = LUT_BINS, counts: np.ndarray | None = None):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64) if counts is None else counts.astype(np.int64, copy=False)
+        if self.counts.shape != (bins,):
+            raise ValueError(f"counts 長度 {self.counts.shape} 與 bins={bins} 不符")
+        self._scale = float(bins - 1)
+        self._lock = threading.Lock()
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    def add(self, overall_01: float) -> None:
+        x = float(overall_01)
+        if x != x:  # NaN 不計
+            return
+        x = 0.0 if x < 0.0 else (1.0 if x > 1.0 else x)
+        i = int(x * self._scale + 0.5)
+        with self._lock:
+            self.counts[i] += 1
+
+    def add_many(self, xs: Iterable[float]) -> None:
+        xs = np.asarray(list(xs) if not isinstance(xs, np.ndarray) else xs, dtype=float)
+        xs = xs[np.isfinite(xs)]
+        inc = np.bincount(lut_index(xs, self.bins), minlength=self.bins)
+        with self._lock:
+            self.counts += inc
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.bins != self.bins:
+            raise ValueError(f"無法合併 bins={self.bins} 與 bins={other.bins} 的 sketch")
+        with self._lock:
+            self.counts += other.counts
+        return self
+
+    def copy(self) -> "QuantileSketch":
+        with self._lock:
+            return QuantileSketch(self.bins, self.counts.copy())
+
+    def quantiles(self, ps: Sequence[float]) -> np.ndarray:
+        """與 np.quantile(格點值, ps, method="linear") 相同：第 h=(n-1)p 個順序統計量之間線性內插。"""
+        n = self.n
+        if n == 0:
+            raise ValueError("sketch 是空的")
+        cdf = np.cumsum(self.counts)
+        h = (n - 1) * np.clip(np.asarray(ps, dtype=float), 0, 1)
+        lo = np.floor(h)
+        v_lo = np.searchsorted(cdf, lo, side="right") / self._scale
+        v_hi = np.searchsorted(cdf, np.minimum(lo + 1, n - 1), side="right") / self._scale
+        return v_lo + (h - lo) * (v_hi - v_lo)
+
+    def save(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        snap = self.copy()
+        np.savez(tmp, counts=snap.counts, bins=snap.bins, saved_at=time.time())
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "QuantileSketch":
+        z = np.load(path)
+        return cls(int(z["bins"]), z["counts"])
+
+
+def worker_snapshot_path(sketch_dir: Path = SKETCH_DIR) -> Path:
+    """每個行程一個檔：<host>-<pid>-<啟動時間>.npz，重啟後舊檔保留、合併時一起算。"""
+    return sketch_dir / f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}.npz"
+
+
+def load_merged(paths: Iterable[Path], since_s: float = 0.0) -> QuantileSketch:
+    """合併多個快照（檔案或資料夾）；since_s > 0 時只取該秒數內更新過的快照。"""
+    files = []
+    for p in map(Path, paths):
+        files += sorted(p.glob("*.npz")) if p.is_dir() else [p]
+    files = [f for f in files if not f.name.endswith(".tmp.npz")]
+    if since_s > 0:
+        cutoff = time.time() - since_s
+        files = [f for f in files if f.stat().st_mtime >= cutoff]
+    if not files:
+        raise FileNotFoundError(f"找不到 sketch 快照：{[str(p) for p in paths]}")
+    merged = QuantileSketch.load(files[0])
+    for f in files[1:]:
+        merged.merge(QuantileSketch.load(f))
+    return merged
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sh = sub.add_parser("show", help="列出合併後的樣本數與常用分位數")
+    sh.add_argument("paths", nargs="+")
+    mg = sub.add_parser("merge", help="把多個快照 / 資料夾合併成一個檔（跨機器彙整用）")
+    mg.add_argument("paths", nargs="+")
+    mg.add_argument("-o", "--out", required=True)
+    args = ap.parse_args()
+
+    sk = load_merged(args.paths)
+    if args.cmd == "merge":
+        print(f"[OK] n={sk.n} -> {sk.save(Path(args.out))}")
+        return
+    ps = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+    print(f"n={sk.n}")
+    for p, q in zip(ps, sk.quantiles(ps)):
+        print(f"  p{int(p*100):02d} = {q:.4f}")
+
+
+if __name__ == "__main__":
+    main()
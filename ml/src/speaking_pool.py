@@ -0,0 +1,105 @@
+# src/speaking_pool.py
+"""
+口說特徵抽取：單筆（API 執行緒內）與多筆平行（worker 行程池）共用同一個入口。
+
+- extract_part(audio, transcript)：IngestedAudio 解碼（raw / 串流 / librosa 退路）+ extract_features_from_signal。
+  解碼失敗 → y=None（NaN 特徵，和 extract_features 讀不到檔一樣），錯誤字串另外回傳給呼叫端記錄。
+- SpeakingPool：模擬考一次上傳多個 part 時，各 part 丟進 ProcessPoolExecutor 平行抽特徵，
+  牆鐘時間 ≈ 最慢的那一段，而不是總和（yin / bootstrap 是 CPU 密集，執行緒受 GIL 限制）。
+    - 行程用 forkserver 起：API 行程裡有 uvicorn / tokenizers / RSS 取樣等執行緒，直接 fork 可能帶著別人持有的鎖。
+    - initializer 先跑一次 1 秒的合成音檔，把 librosa / numba 的 JIT 暖好，第一個真的請求不必付。
+    - 第一次用到才建池；max_workers 預設 min(4, CPU 數)。worker 掛掉（BrokenProcessPool）時 submit 只關掉
+      自己用的那個池，下一次 submit 重建；同時失敗的其他 part 不會把別人剛重建的新池一起關掉。
+    - 每個 part 在 worker 內開自己的 timing_scope 與 RssWatcher，回傳階段耗時與該 worker 的 RSS 峰值增量。
+    - submit 被取消時（例如同批另一個 part 被預算擋下）：還沒開始的 part 直接撤掉；已在 worker 裡跑的
+      會等它跑完才把取消往上丟，呼叫端的預算額度與暫存檔因此不會在 worker 還在讀檔時就被釋放 / 刪掉。
+
+用法：
+  pool = SpeakingPool(workers=4)
+  results = await pool.map([(audio1, "tx1"), (audio2, None)])   # [(res, err, ms, rss_delta), ...]
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from audio_ingest import TARGET_SR, IngestedAudio
+from mem_budget import RssWatcher
+from stage_timer import stage, timing_scope
+
+PartResult = Tuple[Any, Optional[str], Dict[str, float], Optional[int]]
+
+_rss: Optional[RssWatcher] = None
+
+
+def extract_part(audio: IngestedAudio, transcript: Optional[str]) -> Tuple[Any, Optional[str]]:
+    from speech_features import extract_features_from_signal
+    y: Optional[np.ndarray] = None
+    sr, err = TARGET_SR, None
+    try:
+        with stage("decode"):
+            y, sr = audio.load(TARGET_SR)
+    except Exception as exc:
+        err = f"{audio.method} decode failed: {exc}"
+    return extract_features_from_signal(y, sr, transcript=transcript), err
+
+
+def _warm_worker() -> None:
+    global _rss
+    _rss = RssWatcher()
+    from speech_features import extract_features_from_signal
+    t = np.arange(TARGET_SR) / TARGET_SR
+    extract_features_from_signal((0.1 * np.sin(2 * np.pi * 150 * t)).astype(np.float32), TARGET_SR, "warm up")
+
+
+def _pool_task(audio: IngestedAudio, transcript: Optional[str]) -> PartResult:
+    rss = _rss or RssWatcher()
+    with timing_scope() as timer, rss.track() as track:
+        res, err = extract_part(audio, transcript)
+    return res, err, timer.snapshot(), track.peak_delta if track is not None else None
+
+
+class SpeakingPool:
+    def __init__(self, workers: int = 0):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_warm_worker)
+        return self._pool
+
+    async def submit(self, audio: IngestedAudio, transcript: Optional[str]) -> PartResult:
+        pool = self._executor()
+        try:
+            cf = pool.submit(_pool_task, audio, transcript)
+            fut = asyncio.wrap_future(cf)
+            return await asyncio.shield(fut)
+        except BrokenProcessPool:
+            self.shutdown(if_pool=pool)  # 下一次 submit 重建
+            raise
+        except asyncio.CancelledError:
+            if not cf.cancel():
+                await asyncio.wait([fut])
+                if not fut.cancelled():
+                    fut.exception()  # 結果不要了，但別留下 "exception was never retrieved"
+            raise
+
+    async def map(self, parts: Sequence[Tuple[IngestedAudio, Optional[str]]]) -> List[PartResult]:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self.submit(a, t)) for a, t in parts]
+        return [t.result() for t in tasks]
+
+    def shutdown(self, if_pool: Optional[ProcessPoolExecutor] = None) -> None:
+        """關掉目前的池；給 if_pool 時只有目前的池就是它才關（已經被換成新池就不動）。"""
+        if self._pool is None or (if_pool is not None and self._pool is not if_pool):
+            return
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
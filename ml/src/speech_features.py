@@ -1,51 +1,24 @@
 # src/speech_features.py
 from __future__ import annotations
-import re
 from typing import Dict, Tuple, Optional
 import numpy as np
 import librosa
 
+from audio_source import load_audio
+from disfluency import scan
+from stage_timer import stage
+
 def _clip01(x, lo, hi):
     if lo == hi: return 0.0
     return float(np.clip((x - lo) / (hi - lo), 0.0, 1.0))
 
-# --- (A) 文字端：filler / self-repair ---
-_FILLERS = [
-    r"\bum\b", r"\buh\b", r"\ber\b", r"\bah\b", r"\bhmm\b",
-    r"\byou know\b", r"\bkinda\b", r"\bkind of\b", r"\bsorta\b",
-    r"\blik[e]?\b", r"\bi mean\b", r"\bwell\b"
-]
-_FILLER_RE = re.compile("|".join(_FILLERS), flags=re.I)
-
+# --- (A) 文字端：filler / self-repair（見 disfluency.py；每次請求只掃描一次，結果以 dis 往下傳） ---
 def _disfluency_stats(transcript: Optional[str]) -> Dict[str, float]:
-    if not transcript:
-        return {"filler_count": 0, "self_repair_count": 0, "words": 0,
-                "filler_per_100w": 0.0, "self_repair_per_100w": 0.0}
-    t = transcript.strip()
-    words = re.findall(r"[A-Za-z']+", t)
-    n_words = len(words)
-
-    # fillers
-    filler_count = len(_FILLER_RE.findall(t))
-
-    # self-repair: 重複詞、I-I / and-and；簡單偵測
-    toks = [w.lower() for w in words]
-    rep = sum(1 for i in range(1, len(toks)) if toks[i] == toks[i-1])
-    # 編輯語：sorry / I mean / no, I mean / let me / rather / I mean
-    edit_phrases = re.findall(r"\b(sorry|i mean|no[, ]+i mean|let me|i mean|actually)\b", t, flags=re.I)
-    self_repair = rep + len(edit_phrases)
-
-    per100 = lambda c: (c * 100.0 / max(1, n_words))
-    return {
-        "filler_count": float(filler_count),
-        "self_repair_count": float(self_repair),
-        "words": float(n_words),
-        "filler_per_100w": per100(filler_count),
-        "self_repair_per_100w": per100(self_repair),
-    }
+    return scan(transcript).stats()
 
 # --- (B) 語音端：核心特徵 + bootstrap 不確定度 ---
-def _compute_base_features(y: np.ndarray, sr: int, transcript: Optional[str], top_db: int):
+def _compute_base_features(y: np.ndarray, sr: int, transcript: Optional[str], top_db: int,
+                           dis: Optional[Dict[str, float]] = None):
     dur = len(y) / sr if len(y) else 1e-4
 
     # voiced / silence
@@ -65,7 +38,8 @@ def _compute_base_features(y: np.ndarray, sr: int, transcript: Optional[str], to
     avg_pause = (np.mean(long_gaps) if long_gaps else 0.0)
 
     # 文字統計 + disfluency
-    dis = _disfluency_stats(transcript)
+    if dis is None:
+        dis = _disfluency_stats(transcript)
     n_words = int(dis["words"])
     wpm = 60.0 * n_words / dur
     art_rate = 60.0 * n_words / max(voiced_dur, 1e-6)
@@ -113,8 +87,10 @@ def _scores_from_feats(feats: Dict[str, float]) -> Dict[str, float]:
     return {"fluency_score": fluency, "pronunciation_score": pronunciation}
 
 def _bootstrap_uncert(y: np.ndarray, sr: int, transcript: Optional[str], base_top_db: int,
-                      n: int = 8, seed: int = 7) -> Dict[str, float]:
-    """重複計算（微擾參數、子採樣）估計分數標準差。"""
+                      n: int = 8, seed: int = 7, dis: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """重複計算（微擾參數、子採樣）估計分數標準差；逐字稿不變，disfluency 只算一次。"""
+    if dis is None:
+        dis = _disfluency_stats(transcript)
     rng = np.random.default_rng(seed)
     flu, pro = [], []
     for _ in range(n):
@@ -125,7 +101,7 @@ def _bootstrap_uncert(y: np.ndarray, sr: int, transcript: Optional[str], base_to
         mask[drop] = False
         y2 = y[mask] if y.size > 0 else y
 
-        feats = _compute_base_features(y2, sr, transcript, top_db)
+        feats = _compute_base_features(y2, sr, transcript, top_db, dis)
         sc = _scores_from_feats(feats)
         flu.append(sc["fluency_score"])
         pro.append(sc["pronunciation_score"])
@@ -138,22 +114,36 @@ def extract_features(audio_path: str, transcript: str | None = None,
                      sr: int = 16000, top_db: int = 35) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
     """
     回傳 (features_dict, scores_dict, uncertainty_dict)
+    audio_path 可以是一般路徑或 zip://<archive>.zip!<member>（見 audio_source.py，不必解壓）
     讀不到音檔 → 回 NaN 特徵 + NaN 分數 + 0 不確定度（讓上游不中斷）
     """
     try:
-        y, sr = librosa.load(audio_path, sr=sr, mono=True)
+        with stage("decode"):
+            y, sr = load_audio(audio_path, sr=sr, mono=True)
     except Exception:
-        feats = {
-            "duration_s": np.nan, "voiced_duration_s": np.nan, "silent_duration_s": np.nan,
-            "pause_count_ge300ms": np.nan, "avg_pause_s": np.nan, "pause_ratio": np.nan,
-            "wpm": np.nan, "articulation_wpm": np.nan, "f0_std_hz": np.nan, "energy_std": np.nan,
-            "word_count": len(transcript.split()) if transcript else 0,
-            "filler_count": 0, "self_repair_count": 0,
-            "filler_per_100w": 0.0, "self_repair_per_100w": 0.0,
-        }
-        return feats, {"fluency_score": np.nan, "pronunciation_score": np.nan}, {"fluency_std": 0.0, "pronunciation_std": 0.0}
-
-    feats = _compute_base_features(y, sr, transcript, top_db)
-    scores = _scores_from_feats(feats)
-    unc = _bootstrap_uncert(y, sr, transcript, top_db, n=8, seed=7)
+        return _missing_audio(transcript)
+    return extract_features_from_signal(y, sr, transcript, top_db)
+
+def _missing_audio(transcript: str | None):
+    feats = {
+        "duration_s": np.nan, "voiced_duration_s": np.nan, "silent_duration_s": np.nan,
+        "pause_count_ge300ms": np.nan, "avg_pause_s": np.nan, "pause_ratio": np.nan,
+        "wpm": np.nan, "articulation_wpm": np.nan, "f0_std_hz": np.nan, "energy_std": np.nan,
+        "word_count": len(transcript.split()) if transcript else 0,
+        "filler_count": 0, "self_repair_count": 0,
+        "filler_per_100w": 0.0, "self_repair_per_100w": 0.0,
+    }
+    return feats, {"fluency_score": np.nan, "pronunciation_score": np.nan}, {"fluency_std": 0.0, "pronunciation_std": 0.0}
+
+def extract_features_from_signal(y: Optional[np.ndarray], sr: int, transcript: str | None = None,
+                                 top_db: int = 35) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+    """同 extract_features，但輸入是已解碼的單聲道訊號（例如 pcm_shards 讀出的 PCM）；y=None 視為讀不到音檔。"""
+    if y is None:
+        return _missing_audio(transcript)
+    with stage("features"):
+        dis = _disfluency_stats(transcript)
+        feats = _compute_base_features(y, sr, transcript, top_db, dis)
+        scores = _scores_from_feats(feats)
+    with stage("bootstrap"):
+        unc = _bootstrap_uncert(y, sr, transcript, top_db, n=8, seed=7, dis=dis)
     return feats, scores, unc
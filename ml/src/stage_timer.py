@@ -0,0 +1,78 @@
+# src/stage_timer.py
+"""
+每個請求的階段計時（decode / features / bootstrap / encode / text_features / predict / fusion / serialization …）。
+
+- 以 ContextVar 傳遞目前請求的 StageTimer：API handler 用 `with timing_scope() as t:` 開一個，
+  下游（speech_features、app 的 helper）只要 `with stage("decode"):`，不必把 timer 一路當參數傳下去。
+- 沒有作用中的 timer 時（CLI、batch、訓練），stage() 只多一次 ContextVar.get，幾乎零成本。
+- 同名階段重複進入時累加；所以不同來源的工作要取不同名稱（文字 text_features、語音 features），否則會併成一個數字，看不出是哪邊慢。
+- asyncio.to_thread / run_in_executor(copy_context) 會複製 context，執行緒裡的 stage() 也記在同一個 timer。
+
+用法：
+  from stage_timer import stage, timing_scope, server_timing
+  with timing_scope() as t:
+      with stage("decode"):
+          y, sr = load_audio(path)
+  response.headers["Server-Timing"] = server_timing(t.ms)   # → decode;dur=12.3, total;dur=12.4
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class StageTimer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.ms: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = self.ms.get(name, 0.0) + (time.perf_counter() - t) * 1000.0
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    def snapshot(self, total: bool = True) -> Dict[str, float]:
+        out = {k: round(v, 3) for k, v in self.ms.items()}
+        if total:
+            out["total"] = round(self.total_ms(), 3)
+        return out
+
+
+_current: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+
+def current() -> Optional[StageTimer]:
+    return _current.get()
+
+
+@contextmanager
+def timing_scope() -> Iterator[StageTimer]:
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def server_timing(ms: Dict[str, float]) -> str:
+    """{name: ms} → Server-Timing 標頭值（W3C 格式，dur 單位為毫秒）。"""
+    return ", ".join(f"{name};dur={dur:.2f}" for name, dur in ms.items())
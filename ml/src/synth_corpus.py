@@ -0,0 +1,264 @@
+# src/synth_corpus.py
+"""
+可重現的合成語料：不需要 ASAP / L2-ARCTIC 授權資料，就能在 CI 與任何機器上跑效能測試。
+
+- 作文：ASAP 形狀的表格（essay_id, essay_set, essay, domain1_score），8 個 essay_set 的分數範圍與篇幅
+  仿照原始資料；每篇有一個潛在「品質」q，分數、篇幅、句長與進階詞比例都跟著 q 走，模型學得到訊號。
+  輸出成 TSV（training_set_rel3 的格式，writing_dataset.py 可直接讀）或 CSV。
+- 語音：可控制長度、語速、短語/停頓結構、音高曲線（每個短語由高往低的 declination + 詞重音），
+  逐字稿與音訊一一對應，並依機率插入 filler（um / uh / you know …）與 self-repair（重複詞、I mean）。
+  輸出 16 kHz PCM16 wav + batch_score.py 用的 manifest（audio_path,transcript）。
+
+同一個 (seed, 第 i 筆) 永遠產生相同內容（每筆各自以 default_rng([seed, i, ...]) 取亂數），
+與總筆數、產生順序無關。
+
+用法（在 ml/ 底下）：
+  python src/synth_corpus.py essays --n 2000 --out data/synth/training_set_rel3.tsv
+  python src/synth_corpus.py speech --n 50 --duration 10-40 --out data/synth/speaking
+  python src/batch_score.py --manifest data/synth/speaking/manifest.csv --out data/synth/scores.csv
+
+  from synth_corpus import SpeechSpec, synth_essay, synth_speech
+  y, transcript = synth_speech(SpeechSpec(duration_s=30, filler_rate=0.1), seed=3)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SR = 16000
+
+# essay_set -> (最低分, 最高分, 平均字數)；仿 ASAP training_set_rel3 的 domain1_score 範圍
+ASAP_SETS = {
+    1: (2, 12, 350), 2: (1, 6, 380), 3: (0, 3, 110), 4: (0, 3, 95),
+    5: (0, 4, 125), 6: (0, 4, 155), 7: (0, 30, 170), 8: (0, 60, 600),
+}
+
+_BASIC = ("the a to and of in is it that for people they we this can be have more not with "
+          "do are on because think good very many also some time school students life things "
+          "make would like get go help want need use know should other way one all there").split()
+_ADVANCED = ("consequently significant perspective government technology environment essential "
+             "individuals opportunity contribute development responsibility communication "
+             "education particularly beneficial demonstrate considerable fundamental approach "
+             "circumstances increasingly sustainable community knowledge experience influence "
+             "alternatively nevertheless furthermore acknowledge undoubtedly").split()
+_CONNECTIVES = ("However,", "Moreover,", "Therefore,", "For example,", "In addition,",
+                "On the other hand,", "Firstly,", "In conclusion,")
+_ANON = ("@PERSON1", "@CAPS1", "@LOCATION1", "@ORGANIZATION1", "@NUM1", "@DATE1")
+
+# 都在 disfluency.FILLER_PHRASES 裡；與 disfluency.py 解耦，避免那邊改清單時這裡的輸出跟著變
+FILLERS = ("um", "uh", "er", "hmm", "you know")
+REPAIR_EDIT = "i mean"
+
+
+def _rng(seed: int, i: int = 0, stream: int = 0) -> np.random.Generator:
+    return np.random.default_rng([seed, i, stream])
+
+
+# -----------------------------
+# 作文
+# -----------------------------
+def synth_essay(rng: np.random.Generator, words: int, quality: float = 0.5) -> str:
+    """約 words 個詞（最後一句寫完為止）；quality 越高句子越長、進階詞與連接詞越多。"""
+    sents: List[str] = []
+    n = 0
+    while n < max(1, words):
+        toks: List[str] = []
+        if rng.random() < 0.35 * quality:
+            toks.append(str(rng.choice(_CONNECTIVES)))
+        for _ in range(int(rng.integers(6, 12 + int(14 * quality)))):
+            r = rng.random()
+            if r < 0.02:
+                toks.append(str(rng.choice(_ANON)))
+            elif r < 0.08 + 0.35 * quality:
+                toks.append(str(rng.choice(_ADVANCED)))
+            else:
+                toks.append(str(rng.choice(_BASIC)))
+        toks[0] = toks[0][:1].upper() + toks[0][1:]
+        end = "." if rng.random() < 0.9 else str(rng.choice(["!", "?"]))
+        sents.append(" ".join(toks) + end)
+        n += len(toks)
+    return " ".join(sents)
+
+
+def synth_essay_row(seed: int, i: int, essay_set: Optional[int] = None) -> dict:
+    rng = _rng(seed, i)
+    s = int(essay_set if essay_set is not None else rng.integers(1, 9))
+    lo, hi, mean_words = ASAP_SETS[s]
+    q = float(rng.beta(2.0, 2.0))
+    words = int(mean_words * (0.5 + q) * rng.uniform(0.85, 1.15))
+    score = int(np.clip(round(lo + q * (hi - lo) + rng.normal(0, 0.04 * (hi - lo))), lo, hi))
+    return {"essay_id": i + 1, "essay_set": s, "essay": synth_essay(rng, words, q), "domain1_score": score}
+
+
+def synth_essays(n: int, seed: int = 0, sets: Optional[Sequence[int]] = None):
+    """ASAP 形狀的 DataFrame；給 sets 時依序輪流分配 essay_set。"""
+    import pandas as pd
+    rows = [synth_essay_row(seed, i, sets[i % len(sets)] if sets else None) for i in range(n)]
+    return pd.DataFrame(rows, columns=["essay_id", "essay_set", "essay", "domain1_score"])
+
+
+# -----------------------------
+# 語音
+# -----------------------------
+@dataclass(frozen=True)
+class SpeechSpec:
+    duration_s: float = 20.0
+    sr: int = SR
+    words_per_s: float = 2.5                      # 有聲段內的語速
+    phrase_words: Tuple[int, int] = (3, 9)        # 每個短語的詞數範圍；短語之間是停頓
+    pause_s: Tuple[float, float] = (0.3, 0.9)     # 短語間停頓長度（≥0.3 s 會被算成 pause）
+    word_gap_s: float = 0.04                      # 詞與詞之間的短間隙（遠小於 pause 門檻）
+    f0_hz: float = 140.0                          # 基準音高
+    f0_span_st: float = 4.0                       # 每個短語由高到低的 declination（半音）
+    f0_jitter_st: float = 1.0                     # 詞重音造成的隨機音高偏移（半音）
+    filler_rate: float = 0.05                     # 每個詞之前插入 filler 的機率
+    repair_rate: float = 0.02                     # 每個詞發生 self-repair 的機率（重複詞或 "i mean"）
+    noise_dbfs: float = -50.0                     # 背景白噪音
+
+
+def _voiced(rng: np.random.Generator, n: int, sr: int, f0_start: float, f0_end: float) -> np.ndarray:
+    """四個諧波的有聲段，f0 在段內線性滑動，漢寧包絡。"""
+    f0 = np.linspace(f0_start, f0_end, n)
+    phase = 2 * np.pi * np.cumsum(f0) / sr + rng.uniform(0, 2 * np.pi)
+    y = sum(np.sin(k * phase) / k for k in (1, 2, 3, 4))
+    return (0.25 * np.hanning(n) * y).astype(np.float32)
+
+
+def synth_speech(spec: SpeechSpec = SpeechSpec(), seed: int = 0, index: int = 0) -> Tuple[np.ndarray, str]:
+    """→ (float32 單聲道訊號，長度恰為 duration_s·sr, 逐字稿)。逐字稿只含實際唸到的詞。"""
+    rng = _rng(seed, index)
+    sr = spec.sr
+    n_total = int(round(spec.duration_s * sr))
+    y = np.zeros(n_total, dtype=np.float32)
+    words: List[str] = []
+    t = int(rng.uniform(0.1, 0.4) * sr)  # 開頭靜音
+    st = 2.0 ** (1.0 / 12.0)
+
+    while t < n_total:
+        k = int(rng.integers(spec.phrase_words[0], spec.phrase_words[1] + 1))
+        for j in range(k):
+            tokens: List[Tuple[str, bool]] = []  # (詞, 是否為 filler)
+            if rng.random() < spec.filler_rate:
+                tokens += [(w, True) for w in str(rng.choice(FILLERS)).split()]
+            word = str(rng.choice(_BASIC if rng.random() < 0.75 else _ADVANCED))
+            if rng.random() < spec.repair_rate:
+                tokens += [(word, False)] + [(w, False) for w in (REPAIR_EDIT.split() if rng.random() < 0.5 else [])]
+            tokens.append((word, False))
+            for w, is_filler in tokens:
+                # declination：短語開頭 +span/2 半音，結尾 -span/2；filler 平調、偏低、拉長
+                pos = j / max(1, k - 1)
+                semis = spec.f0_span_st * (0.5 - pos)
+                if is_filler:
+                    dur = rng.uniform(0.3, 0.55) if len(w) <= 3 else rng.uniform(0.15, 0.3)
+                    f0a = f0b = spec.f0_hz * st ** (semis - 2)
+                else:
+                    dur = max(0.08, rng.normal(1.0 / spec.words_per_s, 0.25 / spec.words_per_s)) - spec.word_gap_s
+                    f0a = spec.f0_hz * st ** (semis + rng.normal(0, spec.f0_jitter_st))
+                    f0b = f0a * st ** rng.uniform(-1.5, 0.5)
+                n = int(dur * sr)
+                if t + n > n_total:
+                    t = n_total
+                    break
+                y[t:t + n] = _voiced(rng, n, sr, f0a, f0b)
+                words.append(w)
+                t += n + int(spec.word_gap_s * sr)
+            if t >= n_total:
+                break
+        t += int(rng.uniform(*spec.pause_s) * sr)
+
+    if spec.noise_dbfs > -120:
+        y += (10 ** (spec.noise_dbfs / 20) * rng.standard_normal(n_total)).astype(np.float32)
+    return np.clip(y, -1.0, 1.0), " ".join(words)
+
+
+def wav_bytes(y: np.ndarray, sr: int = SR) -> bytes:
+    """PCM16 wav（記憶體內），給 HTTP 壓測之類不落地的用途。"""
+    import soundfile as sf
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def write_speech_corpus(out_dir: Path, n: int, spec: SpeechSpec = SpeechSpec(), seed: int = 0,
+                        duration_range: Optional[Tuple[float, float]] = None) -> Path:
+    """out_dir/wav/synth_00000.wav … + out_dir/manifest.csv（audio_path,transcript）；回傳 manifest 路徑。"""
+    import soundfile as sf
+    out_dir = Path(out_dir)
+    (out_dir / "wav").mkdir(parents=True, exist_ok=True)
+    rows = []
+    for i in range(n):
+        s = spec
+        if duration_range is not None:
+            s = replace(spec, duration_s=float(_rng(seed, i, stream=1).uniform(*duration_range)))
+        y, text = synth_speech(s, seed, i)
+        path = out_dir / "wav" / f"synth_{i:05d}.wav"
+        sf.write(str(path), y, s.sr, subtype="PCM_16")
+        rows.append((str(path), text))
+    manifest = out_dir / "manifest.csv"
+    with open(manifest, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["audio_path", "transcript"])
+        w.writerows(rows)
+    return manifest
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _range(s: str) -> Tuple[float, float]:
+    lo, _, hi = s.partition("-")
+    return float(lo), float(hi or lo)
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    ap = argparse.ArgumentParser(description="可重現的合成作文 / 語音語料")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    e = sub.add_parser("essays", help="ASAP 形狀的作文表")
+    e.add_argument("--n", type=int, default=2000)
+    e.add_argument("--sets", default="", help="逗號分隔的 essay_set（預設 1..8 隨機）")
+    e.add_argument("--out", required=True, help=".tsv（training_set_rel3 格式）或 .csv")
+
+    s = sub.add_parser("speech", help="合成語音 + manifest")
+    s.add_argument("--n", type=int, default=50)
+    s.add_argument("--duration", default="20", help="秒數，或範圍 10-40（每筆均勻抽）")
+    s.add_argument("--wps", type=float, default=SpeechSpec.words_per_s, help="語速（詞/秒）")
+    s.add_argument("--pause", default="0.3-0.9", help="短語間停頓秒數範圍")
+    s.add_argument("--phrase-words", default="3-9", help="每個短語的詞數範圍")
+    s.add_argument("--f0", type=float, default=SpeechSpec.f0_hz, help="基準音高 Hz")
+    s.add_argument("--f0-span", type=float, default=SpeechSpec.f0_span_st, help="短語內 declination（半音）")
+    s.add_argument("--filler-rate", type=float, default=SpeechSpec.filler_rate)
+    s.add_argument("--repair-rate", type=float, default=SpeechSpec.repair_rate)
+    s.add_argument("--out", required=True, help="輸出資料夾（wav/ + manifest.csv）")
+
+    for p in (e, s):
+        p.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "essays":
+        sets = [int(x) for x in args.sets.split(",") if x.strip()] or None
+        df = synth_essays(args.n, args.seed, sets)
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(out, sep="\t" if out.suffix == ".tsv" else ",", index=False)
+        print(f"[OK] {len(df)} essays → {out}")
+        return
+
+    pw = _range(args.phrase_words)
+    spec = SpeechSpec(words_per_s=args.wps, pause_s=_range(args.pause), phrase_words=(int(pw[0]), int(pw[1])),
+                      f0_hz=args.f0, f0_span_st=args.f0_span, filler_rate=args.filler_rate,
+                      repair_rate=args.repair_rate)
+    lo, hi = _range(args.duration)
+    spec = replace(spec, duration_s=lo)
+    manifest = write_speech_corpus(Path(args.out), args.n, spec, args.seed, (lo, hi) if hi != lo else None)
+    print(f"[OK] {args.n} utterances → {manifest}")
+
+
+if __name__ == "__main__":
+    main()
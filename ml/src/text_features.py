@@ -0,0 +1,68 @@
+# src/text_features.py
+"""
+寫作手工特徵（API / CLI / batch / 訓練共用的唯一實作）。
+
+欄位順序固定為 FEATURE_NAMES；模型（xgb.json）只吃前 MODEL_FEATURES 個，
+stop_ratio 只有在明確要求 7 欄時才計算（順便省下載入 sklearn 停用詞表的時間）。
+
+數值與舊版逐字迴圈完全一致：
+  - 分詞：str.split()；小寫後再 split 與逐字 lower() 的結果相同
+  - 句數：re.split(r"[.!?]+") 後非空白段落的數量 == _SENT_RE 的比對次數
+  - 所有計數都在 C 層（map / set / findall）完成，不再有逐字的 Python 迴圈
+"""
+from __future__ import annotations
+
+import re
+from typing import FrozenSet, Optional, Sequence
+
+import numpy as np
+
+FEATURE_NAMES = ("n_words", "n_chars", "avg_wlen", "uniq_ratio", "n_sents", "avg_sent_len", "stop_ratio")
+MODEL_FEATURES = 6
+
+# 以非終止符、非空白字元開頭，延伸到下一個 .!? 之前：每個非空白句段恰好一次
+_SENT_RE = re.compile(r"[^.!?\s][^.!?]*")
+
+_STOP_WORDS: Optional[FrozenSet[str]] = None
+
+
+def _stop_words() -> FrozenSet[str]:
+    global _STOP_WORDS
+    if _STOP_WORDS is None:
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        _STOP_WORDS = frozenset(ENGLISH_STOP_WORDS)
+    return _STOP_WORDS
+
+
+def text_features(texts: Sequence[str], n_features: int = len(FEATURE_NAMES)) -> np.ndarray:
+    """
+    一次計算整批文字的特徵，回傳 shape = (len(texts), n_features) 的 float64 矩陣。
+    n_features=MODEL_FEATURES 給模型用；預設 7 欄（含 stop_ratio）。
+    """
+    if not 1 <= n_features <= len(FEATURE_NAMES):
+        raise ValueError(f"n_features 需介於 1..{len(FEATURE_NAMES)}")
+    n = len(texts)
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    lowered = [t.lower().split() for t in texts]
+
+    n_words = np.fromiter(map(len, lowered), dtype=np.float64, count=n)
+    n_chars = np.fromiter(map(len, texts), dtype=np.float64, count=n)
+    # 原始（未轉小寫）詞長總和；ASCII 文字 lower() 不改變長度，可直接用已切好的小寫詞
+    w_chars = np.fromiter(
+        (len("".join(ws)) if t.isascii() else sum(map(len, t.split())) for t, ws in zip(texts, lowered)),
+        dtype=np.float64, count=n,
+    )
+    n_uniq = np.fromiter((len(set(ws)) for ws in lowered), dtype=np.float64, count=n)
+    n_sents = np.maximum(np.fromiter((len(_SENT_RE.findall(t)) for t in texts), dtype=np.float64, count=n), 1.0)
+
+    denom = np.maximum(n_words, 1.0)
+    cols = [n_words, n_chars, w_chars / denom, n_uniq / denom, n_sents, n_words / n_sents]
+    if n_features > MODEL_FEATURES:
+        is_stop = _stop_words().__contains__
+        n_stop = np.fromiter((sum(map(is_stop, ws)) for ws in lowered), dtype=np.float64, count=n)
+        cols.append(n_stop / denom)
+
+    out = np.empty((n, n_features), dtype=np.float64)
+    for j in range(n_features):
+        out[:, j] = cols[j]
+    return out
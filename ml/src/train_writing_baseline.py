@@ -1,81 +1,136 @@
-import os, json, time
+import argparse, os, json, time
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics import mean_absolute_error
 from xgboost import XGBRegressor
-from metrics import quadratic_weighted_kappa
+from feature_cache import cache_key, cached_matrix, file_sha256
+from metrics import quadratic_weighted_kappa, qwk_bootstrap
+from text_features import MODEL_FEATURES, text_features
+from writing_dataset import load_split, split_path
 
-DATA_DIR = Path("data")
-TRAIN_CSV = DATA_DIR / "asap_train.csv"
-VALID_CSV = DATA_DIR / "asap_valid.csv"
 ART_DIR   = Path("artifacts") / "writing_baseline"
 ART_DIR.mkdir(parents=True, exist_ok=True)
 
 EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # 384 維，下載快
+SIMPLE_FEATS_VERSION = "simple6-v1"  # 改動 text_features 時請一併改版本，讓快取失效
+FEATURE_NAMES = ["emb_384_dims", "n_words", "n_chars", "avg_wlen", "uniq_ratio", "n_sents", "avg_sent_len"]
+
+# 一般訓練模式的 XGBoost 設定（tree_method / random_state / n_jobs 另外指定）
+DEFAULT_PARAMS = dict(
+    n_estimators=600,
+    max_depth=6,
+    learning_rate=0.05,
+    subsample=0.9,
+    colsample_bytree=0.9,
+    reg_lambda=1.0,
+)
+
+_EMBEDDER = None
 
 def _simple_features(texts: list[str]) -> np.ndarray:
-    import re
-    feats = []
-    for t in texts:
-        words = t.split()
-        n_words = len(words)
-        n_chars = len(t)
-        avg_wlen = (sum(len(w) for w in words) / max(1, n_words))
-        uniq_ratio = len(set(w.lower() for w in words)) / max(1, n_words)
-        # 估句數：用標點切分
-        sents = re.split(r"[.!?]+", t)
-        sents = [s.strip() for s in sents if s.strip()]
-        n_sents = max(1, len(sents))
-        avg_sent_len = n_words / n_sents
-        feats.append([n_words, n_chars, avg_wlen, uniq_ratio, n_sents, avg_sent_len])
-    return np.array(feats, dtype=float)
+    return text_features(texts, MODEL_FEATURES)
+
+def _get_embedder():
+    # 整個行程共用一個 SentenceTransformer；命中快取時完全不載入 torch
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        from sentence_transformers import SentenceTransformer
+        _EMBEDDER = SentenceTransformer(EMB_MODEL)
+    return _EMBEDDER
 
 def _embed(texts: list[str]) -> np.ndarray:
-    model = SentenceTransformer(EMB_MODEL)
+    model = _get_embedder()
     embs = model.encode(texts, batch_size=64, show_progress_bar=True, convert_to_numpy=True, normalize_embeddings=False)
     return embs
 
+def _feature_matrix(split_file: Path, df: pd.DataFrame, rebuild: bool = False) -> np.ndarray:
+    """
+    回傳 [embedding | simple features] 的 float32 唯讀 memmap。
+    embedding、simple features 與合併後的 X 各自依 (切分檔內容 hash, 模型/特徵版本) 快取，
+    只改 XGBoost 超參數時不會重新抽嵌入。
+    """
+    h = file_sha256(split_file)
+    texts = lambda: df["essay"].astype(str).tolist()
+    E = cached_matrix("emb", cache_key(h, EMB_MODEL), lambda: _embed(texts()), rebuild=rebuild)
+    F = cached_matrix("simple", cache_key(h, SIMPLE_FEATS_VERSION),
+                      lambda: _simple_features(texts()), rebuild=rebuild)
+    return cached_matrix("X", cache_key(h, EMB_MODEL, SIMPLE_FEATS_VERSION),
+                         lambda: np.hstack([E, F]), rebuild=rebuild)
+
 def _to_raw_scale(pred_norm01: np.ndarray, score_min: np.ndarray, score_max: np.ndarray) -> np.ndarray:
     pred_norm01 = np.clip(pred_norm01, 0.0, 1.0)
     return score_min + pred_norm01 * (score_max - score_min)
 
-def main():
-    t0 = time.time()
-    assert TRAIN_CSV.exists() and VALID_CSV.exists(), "請先跑 make prep_writing 產生 csv"
+def _write_meta(train_rows: int, valid_rows: int, **extra) -> None:
+    meta = {
+        "embedding_model": EMB_MODEL,
+        "feature_names": FEATURE_NAMES,
+        "train_rows": int(train_rows),
+        "valid_rows": int(valid_rows),
+        **extra,
+    }
+    with open(ART_DIR / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
 
-    train = pd.read_csv(TRAIN_CSV)
-    valid = pd.read_csv(VALID_CSV)
+def _promote_search(which: str, run: str, qwk_tolerance: float, train_rows: int, valid_rows: int) -> None:
+    import writing_search as ws
+    run_dir = Path(run) if run else ws.latest_run()
+    if run_dir is None:
+        raise SystemExit("找不到任何搜尋結果，請先跑 --search N")
+    trials = json.loads((run_dir / "trials.json").read_text(encoding="utf-8"))["trials"]
+    t = ws.select_trial(trials, which, qwk_tolerance)
+    ws.promote(t, ART_DIR / "xgb.json")
+    _write_meta(train_rows, valid_rows, params=t["params"], search_run=str(run_dir), trial=t["trial"],
+                val_mae=t["val_mae"], val_qwk=t["val_qwk"], val_qwk_ci=t.get("val_qwk_ci"), n_trees=t["n_trees"],
+                predict_p50_ms=t["predict_p50_ms"], model_bytes=t["model_bytes"])
+    print(f"[OK] 升級 trial {t['trial']}（QWK={t['val_qwk']:.4f}, trees={t['n_trees']}, "
+          f"{t['model_bytes'] / 1024:.0f}KB）-> {ART_DIR / 'xgb.json'}")
 
-    X_text_train = train["essay"].astype(str).tolist()
-    X_text_valid = valid["essay"].astype(str).tolist()
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rebuild-cache", action="store_true", help="忽略既有特徵快取，重新抽嵌入")
+    ap.add_argument("--n-jobs", type=int, default=4, help="一般訓練模式的 XGBoost 執行緒數")
+    ap.add_argument("--search", type=int, default=0, help="平行隨機搜尋 N 組超參數（0 = 一般訓練）")
+    ap.add_argument("--parallel", type=int, default=0, help="同時進行的 trial 數（0 = 依核心數自動分配）")
+    ap.add_argument("--stop-metric", choices=["mae", "qwk"], default="mae", help="early stopping 指標")
+    ap.add_argument("--early-stopping", type=int, default=50, help="驗證集連續幾輪沒進步就停止")
+    ap.add_argument("--promote", default="", help="把搜尋結果升級為正式模型：trial 編號或 auto")
+    ap.add_argument("--search-run", default="", help="--promote 使用的搜尋資料夾（預設最新一次）")
+    ap.add_argument("--qwk-tolerance", type=float, default=0.005, help="auto 升級時可接受的 QWK 落差")
+    args = ap.parse_args()
 
-    print(f"[INFO] 抽嵌入（{EMB_MODEL}）...")
-    E_tr = _embed(X_text_train)
-    E_va = _embed(X_text_valid)
+    t0 = time.time()
+    train_path, valid_path = split_path("train"), split_path("valid")
+    assert train_path.exists() and valid_path.exists(), "請先跑 make prep_writing 產生訓練/驗證集"
 
-    print("[INFO] 計算簡單特徵...")
-    F_tr = _simple_features(X_text_train)
-    F_va = _simple_features(X_text_valid)
+    train = load_split("train")
+    valid = load_split("valid")
 
-    X_tr = np.hstack([E_tr, F_tr])
-    X_va = np.hstack([E_va, F_va])
+    if args.promote:
+        _promote_search(args.promote, args.search_run, args.qwk_tolerance, len(train), len(valid))
+        return
+
+    print(f"[INFO] 載入/建立特徵矩陣（{EMB_MODEL}）...")
+    X_tr = _feature_matrix(train_path, train, rebuild=args.rebuild_cache)
+    X_va = _feature_matrix(valid_path, valid, rebuild=args.rebuild_cache)
+    print(f"[TIME] features = {time.time()-t0:.1f}s  X_tr={X_tr.shape} X_va={X_va.shape}")
     y_tr = train["score_norm01"].values.astype(float)
     y_va = valid["score_norm01"].values.astype(float)
 
+    if args.search > 0:
+        from writing_search import run_search
+        run_search(X_tr, X_va, y_tr, y_va,
+                   valid["domain1_score"].astype(int).values,
+                   valid["score_min"].values.astype(float), valid["score_max"].values.astype(float),
+                   groups=valid["essay_set"].values, n_trials=args.search, base_params=DEFAULT_PARAMS, parallel=args.parallel,
+                   stop_metric=args.stop_metric, early_stopping=args.early_stopping)
+        print(f"[TIME] total = {time.time()-t0:.1f}s")
+        print("用 --promote auto（或 --promote <trial>）把選定的模型升級為 xgb.json。")
+        return
+
     print("[INFO] 訓練 XGBoost 回歸器...")
-    model = XGBRegressor(
-        n_estimators=600,
-        max_depth=6,
-        learning_rate=0.05,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        reg_lambda=1.0,
-        tree_method="hist",
-        random_state=42,
-        n_jobs=4
-    )
+    model = XGBRegressor(**DEFAULT_PARAMS, tree_method="hist", random_state=42, n_jobs=args.n_jobs)
     model.fit(X_tr, y_tr)
 
     # 預測 & 評估（MAE on norm01 + QWK after mapping back and rounding）
@@ -86,21 +141,19 @@ def main():
 
     mae_norm = mean_absolute_error(y_va, np.clip(pred_va_norm,0,1))
     qwk = quadratic_weighted_kappa(valid["domain1_score"].astype(int).values, raw_pred_round)
+    boot = qwk_bootstrap(valid["domain1_score"].astype(int).values, raw_pred_round,
+                         n_boot=2000, groups=valid["essay_set"].values)
 
     print(f"[RESULT] Val MAE(norm01) = {mae_norm:.4f}")
-    print(f"[RESULT] Val QWK(raw integer) = {qwk:.4f}")
+    print(f"[RESULT] Val QWK(raw integer) = {qwk:.4f}  95% CI [{boot['ci'][0]:.4f}, {boot['ci'][1]:.4f}]")
+    for es, g in boot["by_group"].items():
+        print(f"         essay_set {es}: QWK={g['qwk']:.4f} [{g['ci'][0]:.4f}, {g['ci'][1]:.4f}]  n={g['n']}")
     print(f"[TIME] total = {time.time()-t0:.1f}s")
 
     # 存檔
     model.save_model(str(ART_DIR / "xgb.json"))
-    meta = {
-        "embedding_model": EMB_MODEL,
-        "feature_names": ["emb_384_dims", "n_words", "n_chars", "avg_wlen", "uniq_ratio", "n_sents", "avg_sent_len"],
-        "train_rows": int(len(train)),
-        "valid_rows": int(len(valid))
-    }
-    with open(ART_DIR / "meta.json", "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    _write_meta(len(train), len(valid), val_mae=float(mae_norm), val_qwk=float(qwk), val_qwk_ci=boot["ci"],
+                val_qwk_by_set={str(es): g for es, g in boot["by_group"].items()})
 
     print(f"[OK] 已儲存模型到 {ART_DIR}/")
     print("你可以先用這顆模型當 Writing baseline，之後再做 band 校準。")
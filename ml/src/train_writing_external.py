@@ -0,0 +1,170 @@
+# src/train_writing_external.py
+"""
+寫作模型的 out-of-core 訓練（大型作文語料用）。
+
+流程：
+  1) 串流讀取 CSV（pd.read_csv(chunksize=...)）或 Parquet（逐 batch），每個 chunk 抽嵌入 + 簡單特徵，
+     寫成一個 shard（X_xxxxx.npy / y_xxxxx.npy / lab_xxxxx.npy），記憶體中同時只有一個 shard。
+     shard 依 (CSV 內容 hash, 嵌入模型, 特徵版本, shard 列數) 存放，中斷後重跑只補缺的 shard。
+  2) 以 xgboost.DataIter 逐一 mmap shard 餵給 ExtMemQuantileDMatrix（外部記憶體，
+     量化後的 page 快取在磁碟），RAM 上限約為「一個 shard + 模型」。
+  3) 驗證集同樣逐 shard 預測，計算 MAE / QWK。
+  4) 產出與 train_writing_baseline.py 相同的 artifacts/writing_baseline/xgb.json 與 meta.json。
+
+用法（在 ml/ 底下）：
+  python src/train_writing_external.py --train data/inhouse_train.csv --valid data/inhouse_valid.csv
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from feature_cache import CACHE_DIR, cache_key, file_sha256
+from metrics import quadratic_weighted_kappa
+from train_writing_baseline import (
+    ART_DIR, DEFAULT_PARAMS, EMB_MODEL, SIMPLE_FEATS_VERSION,
+    _embed, _simple_features, _to_raw_scale, _write_meta,
+)
+from writing_dataset import split_path
+
+SHARD_ROOT = CACHE_DIR.parent / "shards"
+_USECOLS = ["essay", "score_norm01", "domain1_score", "score_min", "score_max"]
+
+
+def _iter_chunks(path: Path, rows: int) -> Iterator[pd.DataFrame]:
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=rows, columns=_USECOLS):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=_USECOLS, chunksize=rows)
+
+
+def build_shards(csv_path: Path, shard_rows: int) -> List[Path]:
+    """串流切 shard；回傳依序排列的 X shard 路徑（已存在的 shard 直接沿用）。"""
+    key = cache_key(file_sha256(csv_path), EMB_MODEL, SIMPLE_FEATS_VERSION, str(shard_rows))
+    out = SHARD_ROOT / f"{csv_path.stem}-{key}"
+    done = out / "shards.json"
+    if done.exists():
+        return [out / n for n in json.loads(done.read_text(encoding="utf-8"))["x_shards"]]
+
+    out.mkdir(parents=True, exist_ok=True)
+    names = []
+    for i, chunk in enumerate(_iter_chunks(csv_path, shard_rows)):
+        x_path = out / f"X_{i:05d}.npy"
+        names.append(x_path.name)
+        if x_path.exists():
+            continue
+        texts = chunk["essay"].astype(str).tolist()
+        X = np.hstack([_embed(texts), _simple_features(texts)]).astype(np.float32)
+        np.save(out / f"y_{i:05d}.npy", chunk["score_norm01"].to_numpy(np.float32))
+        np.save(out / f"lab_{i:05d}.npy",
+                chunk[["domain1_score", "score_min", "score_max"]].to_numpy(np.float32))
+        # X 最後寫：X 存在即代表整個 shard 完整
+        tmp = out / f"X_{i:05d}.tmp.npy"
+        np.save(tmp, X)
+        tmp.replace(x_path)
+        print(f"[SHARD] {csv_path.name} #{i} rows={len(chunk)}")
+    done.write_text(json.dumps({"csv": str(csv_path), "x_shards": names}, indent=2), encoding="utf-8")
+    return [out / n for n in names]
+
+
+def _companion(x_path: Path, prefix: str) -> Path:
+    return x_path.with_name(prefix + x_path.name[1:])
+
+
+class ShardIter(xgb.DataIter):
+    """依序 mmap 每個 shard 交給 XGBoost；XGBoost 會自行多次 reset() 重掃。"""
+
+    def __init__(self, x_paths: List[Path], cache_prefix: str):
+        self._paths = x_paths
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._i >= len(self._paths):
+            return False
+        x_path = self._paths[self._i]
+        input_data(data=np.load(x_path, mmap_mode="r"),
+                   label=np.load(_companion(x_path, "y"), mmap_mode="r"))
+        self._i += 1
+        return True
+
+    def reset(self) -> None:
+        self._i = 0
+
+
+def _iter_valid(x_paths: List[Path]) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    for x_path in x_paths:
+        yield (np.load(x_path, mmap_mode="r"),
+               np.load(_companion(x_path, "y")),
+               np.load(_companion(x_path, "lab")))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--train", default=str(split_path("train")), help="訓練 CSV / Parquet（需含 essay, score_norm01, ...）")
+    ap.add_argument("--valid", default=str(split_path("valid")), help="驗證 CSV / Parquet")
+    ap.add_argument("--shard-rows", type=int, default=20000, help="每個 shard 的列數（決定 RAM 上限）")
+    ap.add_argument("--n-jobs", type=int, default=4)
+    args = ap.parse_args()
+
+    if not hasattr(xgb, "ExtMemQuantileDMatrix"):
+        raise SystemExit(f"需要 xgboost>=3.0（ExtMemQuantileDMatrix），目前是 {xgb.__version__}："
+                         "pip install -U 'xgboost>=3.0'")
+
+    t0 = time.time()
+    train_csv, valid_csv = Path(args.train), Path(args.valid)
+    assert train_csv.exists() and valid_csv.exists(), "找不到訓練/驗證集"
+
+    print(f"[INFO] 建立 shard（{EMB_MODEL}, {args.shard_rows} 列/shard）...")
+    tr_shards = build_shards(train_csv, args.shard_rows)
+    va_shards = build_shards(valid_csv, args.shard_rows)
+    print(f"[TIME] shards = {time.time()-t0:.1f}s  train={len(tr_shards)} valid={len(va_shards)}")
+
+    cache_prefix = str(tr_shards[0].parent / "xgb-extmem")
+    dtrain = xgb.ExtMemQuantileDMatrix(ShardIter(tr_shards, cache_prefix), nthread=args.n_jobs)
+    params = {
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "max_depth": DEFAULT_PARAMS["max_depth"],
+        "eta": DEFAULT_PARAMS["learning_rate"],
+        "subsample": DEFAULT_PARAMS["subsample"],
+        "colsample_bytree": DEFAULT_PARAMS["colsample_bytree"],
+        "lambda": DEFAULT_PARAMS["reg_lambda"],
+        "seed": 42,
+        "nthread": args.n_jobs,
+    }
+    print("[INFO] 訓練 XGBoost（external memory）...")
+    booster = xgb.train(params, dtrain, num_boost_round=DEFAULT_PARAMS["n_estimators"])
+
+    abs_err, true_raw, pred_raw, n_valid = [], [], [], 0
+    for X, y, lab in _iter_valid(va_shards):
+        pred = booster.inplace_predict(X)
+        abs_err.append(np.abs(np.clip(pred, 0, 1) - y))
+        true_raw.append(lab[:, 0].astype(int))
+        pred_raw.append(np.rint(_to_raw_scale(pred, lab[:, 1], lab[:, 2])).astype(int))
+        n_valid += len(y)
+    mae_norm = float(np.concatenate(abs_err).mean())
+    qwk = quadratic_weighted_kappa(np.concatenate(true_raw), np.concatenate(pred_raw))
+
+    print(f"[RESULT] Val MAE(norm01) = {mae_norm:.4f}")
+    print(f"[RESULT] Val QWK(raw integer) = {qwk:.4f}")
+    print(f"[TIME] total = {time.time()-t0:.1f}s")
+
+    booster.save_model(str(ART_DIR / "xgb.json"))
+    n_train = sum(np.load(_companion(p, "y"), mmap_mode="r").shape[0] for p in tr_shards)
+    _write_meta(n_train, n_valid, training="external_memory", shard_rows=args.shard_rows,
+                val_mae=mae_norm, val_qwk=float(qwk))
+    print(f"[OK] 已儲存模型到 {ART_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
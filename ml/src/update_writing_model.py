@@ -0,0 +1,201 @@
+# src/update_writing_model.py
+"""
+以每週新增的 gold 作文增量更新寫作模型（格式同 tools/eval_gold.json：id, prompt, essay, gold_band）。
+
+- 只對「沒看過」的作文抽嵌入：特徵以作文內容 hash 為 key 累積在 data/gold_store.npz，
+  每篇作文依 hash 固定分到 train 或 holdout（--holdout-pct），或由 --holdout 檔明確指定為 holdout。
+- 兩種更新方式：
+    continue : 從現有 xgb.json 繼續 boosting，只用本次新增的 train 作文（--rounds 棵新樹）
+    refresh  : 樹結構不變，以 store 中全部 train 作文重估 leaf 值（updater=refresh）
+- 以 holdout 的 quadratic_weighted_kappa（半 band 整數刻度）比較新舊模型，
+  新模型不比舊模型差（容忍 --qwk-tolerance）才升級。
+  預測 → band 與 API 相同：有 artifacts/calibration/band_lut.npy 就查表（load_lut），否則線性 4..9；
+  升級不會重擬合 LUT，所以候選模型也用現行 LUT 評估，等於服務端升級後實際回報的 band。
+  gold 端不經過 LUT：store 的 y 是 gold_band 的線性編碼（訓練目標），反推回去就是原本的 gold band。
+- 每次更新都寫到 artifacts/writing_baseline/versions/<version>/（xgb.json + meta.json），
+  升級時再複製到 artifacts/writing_baseline/。
+
+用法（在 ml/ 底下）：
+  python src/update_writing_model.py --new data/gold_2026w42.json --mode continue
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import xgboost as xgb
+
+from band_lut import BandLUT, load_lut
+from metrics import qwk_bootstrap
+from train_writing_baseline import ART_DIR, DEFAULT_PARAMS, EMB_MODEL, SIMPLE_FEATS_VERSION, _embed, _simple_features
+
+STORE = Path("data") / "gold_store.npz"
+VERSIONS_DIR = ART_DIR / "versions"
+BAND_LO, BAND_HI = 4.0, 9.0  # 訓練目標的線性編碼；沒有 LUT 時也是 API _to_band_0_9 的退路
+
+
+def _essay_key(essay: str) -> str:
+    return hashlib.sha1(f"{EMB_MODEL}|{SIMPLE_FEATS_VERSION}|{essay.strip()}".encode("utf-8")).hexdigest()
+
+
+def band_to_norm01(band: np.ndarray) -> np.ndarray:
+    return np.clip((np.asarray(band, dtype=float) - BAND_LO) / (BAND_HI - BAND_LO), 0.0, 1.0)
+
+
+def norm01_to_band(pred: np.ndarray, lut: BandLUT | None = None) -> np.ndarray:
+    """norm01 → band（0.5 一格）：有 LUT 用 LUT（同 API），否則線性。"""
+    if lut is not None:
+        return lut.map(pred)
+    band = BAND_LO + (BAND_HI - BAND_LO) * np.clip(pred, 0.0, 1.0)
+    return np.rint(band * 2) / 2
+
+
+def norm01_to_half_band_int(pred: np.ndarray, lut: BandLUT | None = None) -> np.ndarray:
+    """norm01 → band → 乘 2 的整數，給 QWK 使用。"""
+    return np.rint(norm01_to_band(pred, lut) * 2).astype(int)
+
+
+def load_store() -> dict:
+    if not STORE.exists():
+        return {"keys": np.array([], dtype="U40"), "X": None, "y": np.array([], dtype=np.float32),
+                "split": np.array([], dtype="U7")}
+    z = np.load(STORE)
+    return {k: z[k] for k in ("keys", "X", "y", "split")}
+
+
+def add_to_store(store: dict, items: list[dict], holdout_ids: set[str], holdout_pct: int) -> np.ndarray:
+    """把尚未出現的作文抽特徵加入 store；回傳本次「新增」的 row index。"""
+    known = set(store["keys"].tolist())
+    fresh = []
+    for it in items:
+        k = _essay_key(it["essay"])
+        if k in known:
+            continue
+        known.add(k)
+        is_holdout = it["id"] in holdout_ids or (not holdout_ids and int(k[:8], 16) % 100 < holdout_pct)
+        fresh.append((k, it, "holdout" if is_holdout else "train"))
+    if not fresh:
+        return np.array([], dtype=int)
+
+    texts = [it["essay"] for _, it, _ in fresh]
+    print(f"[INFO] 抽嵌入：{len(texts)} 篇新作文（已快取 {len(store['keys'])} 篇）")
+    X_new = np.hstack([_embed(texts), _simple_features(texts)]).astype(np.float32)
+    start = len(store["keys"])
+    store["keys"] = np.concatenate([store["keys"], [k for k, _, _ in fresh]])
+    store["y"] = np.concatenate([store["y"], band_to_norm01([it["gold_band"] for _, it, _ in fresh])]).astype(np.float32)
+    store["split"] = np.concatenate([store["split"], [s for _, _, s in fresh]])
+    store["X"] = X_new if store["X"] is None else np.vstack([store["X"], X_new])
+    STORE.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(STORE, **store)
+    return np.arange(start, start + len(fresh))
+
+
+def holdout_qwk(booster: xgb.Booster, X: np.ndarray, y: np.ndarray,
+                lut: BandLUT | None = None) -> tuple[float, float, list[float]]:
+    """回傳 (QWK, MAE(band), QWK 的 95% bootstrap CI)；band 是服務端會回報的值（見 norm01_to_band）。"""
+    pred = booster.inplace_predict(X)
+    gold = norm01_to_half_band_int(y)
+    band = norm01_to_half_band_int(pred, lut)
+    # LUT（例如 quantile / isotonic）可能給出 4..9 以外的 band，等級範圍要涵蓋
+    boot = qwk_bootstrap(gold, band, n_boot=2000,
+                         min_rating=min(int(BAND_LO * 2), int(band.min())),
+                         max_rating=max(int(BAND_HI * 2), int(band.max())))
+    mae_band = float(np.mean(np.abs(band - gold)) / 2)
+    return float(boot["qwk"]), mae_band, boot["ci"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--new", required=True, help="新 gold 作文 JSON（id, prompt, essay, gold_band）")
+    ap.add_argument("--holdout", default="", help="選填：明確指定的 holdout JSON（同格式）")
+    ap.add_argument("--holdout-pct", type=int, default=20, help="未指定 --holdout 時依 hash 分到 holdout 的比例")
+    ap.add_argument("--mode", choices=["continue", "refresh"], default="continue")
+    ap.add_argument("--rounds", type=int, default=50, help="continue 模式新增的樹數")
+    ap.add_argument("--eta", type=float, default=0.02, help="continue 模式的 learning rate")
+    ap.add_argument("--qwk-tolerance", type=float, default=0.0, help="新模型 QWK 可比舊模型低多少仍升級")
+    ap.add_argument("--no-promote", action="store_true", help="只產生版本，不覆蓋正式模型")
+    args = ap.parse_args()
+
+    base_path = ART_DIR / "xgb.json"
+    if not base_path.exists():
+        raise SystemExit(f"找不到 {base_path}，請先執行 make train_writing")
+    base = xgb.Booster(model_file=str(base_path))
+    base_meta = json.loads((ART_DIR / "meta.json").read_text(encoding="utf-8")) if (ART_DIR / "meta.json").exists() else {}
+
+    new_items = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    holdout_items = json.loads(Path(args.holdout).read_text(encoding="utf-8")) if args.holdout else []
+    holdout_ids = {it["id"] for it in holdout_items}
+
+    store = load_store()
+    add_to_store(store, holdout_items, holdout_ids, args.holdout_pct)
+    fresh = add_to_store(store, new_items, holdout_ids, args.holdout_pct)
+
+    is_train = store["split"] == "train"
+    ho = ~is_train
+    if not ho.any():
+        raise SystemExit("holdout 為空：請提供 --holdout 或調高 --holdout-pct")
+
+    if args.mode == "continue":
+        rows = fresh[is_train[fresh]] if fresh.size else fresh
+        if rows.size == 0:
+            raise SystemExit("沒有新的 train 作文可以繼續 boosting")
+        params = {"objective": "reg:squarederror", "tree_method": "hist", "eta": args.eta,
+                  "max_depth": DEFAULT_PARAMS["max_depth"], "subsample": DEFAULT_PARAMS["subsample"],
+                  "lambda": DEFAULT_PARAMS["reg_lambda"], "seed": 42}
+        rounds = args.rounds
+    else:
+        rows = np.flatnonzero(is_train)
+        params = {"process_type": "update", "updater": "refresh", "refresh_leaf": True}
+        rounds = base.num_boosted_rounds()
+    dtrain = xgb.DMatrix(store["X"][rows], label=store["y"][rows])
+
+    t0 = time.time()
+    cand = xgb.train(params, dtrain, num_boost_round=rounds, xgb_model=base)
+    fit_s = time.time() - t0
+
+    lut = load_lut()
+    band_mapping = f"lut:{lut.mode}" if lut is not None else "linear"
+    base_qwk, base_mae, base_ci = holdout_qwk(base, store["X"][ho], store["y"][ho], lut)
+    cand_qwk, cand_mae, cand_ci = holdout_qwk(cand, store["X"][ho], store["y"][ho], lut)
+    print(f"[EVAL] holdout n={int(ho.sum())}  band={band_mapping}  base QWK={base_qwk:.4f} [{base_ci[0]:.3f}, {base_ci[1]:.3f}] "
+          f"MAE={base_mae:.3f}  candidate QWK={cand_qwk:.4f} [{cand_ci[0]:.3f}, {cand_ci[1]:.3f}] MAE={cand_mae:.3f}")
+
+    version = time.strftime("%Y%m%d-%H%M%S")
+    vdir = VERSIONS_DIR / version
+    vdir.mkdir(parents=True, exist_ok=True)
+    cand.save_model(str(vdir / "xgb.json"))
+    promoted = (not args.no_promote) and cand_qwk >= base_qwk - args.qwk_tolerance
+    meta = {
+        **{k: v for k, v in base_meta.items() if k in ("embedding_model", "feature_names", "train_rows", "valid_rows")},
+        "version": version,
+        "parent_version": base_meta.get("version", "initial"),
+        "update_mode": args.mode,
+        "update_rows": int(rows.size),
+        "new_essays": int(fresh.size),
+        "fit_s": round(fit_s, 3),
+        "holdout_rows": int(ho.sum()),
+        "holdout_qwk": cand_qwk,
+        "holdout_qwk_ci": cand_ci,
+        "holdout_mae_band": cand_mae,
+        "holdout_band_mapping": band_mapping,
+        "parent_holdout_qwk": base_qwk,
+        "promoted": promoted,
+    }
+    (vdir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[OK] 新版本 -> {vdir}")
+
+    if promoted:
+        shutil.copyfile(vdir / "xgb.json", ART_DIR / "xgb.json")
+        shutil.copyfile(vdir / "meta.json", ART_DIR / "meta.json")
+        print(f"[OK] 已升級為正式模型（version {version}）")
+    else:
+        print("[SKIP] 未升級：" + ("--no-promote" if args.no_promote else "holdout QWK 低於現行模型"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,29 @@
 import argparse
+import codecs
 import csv
 import glob
+import hashlib
+import json
 import os
+import shutil
 import sys
 import zipfile
 from pathlib import Path
 
 import pandas as pd
 
+from feature_cache import file_sha256
+
 DATA_DIR = Path("data")
 RAW_DIR = DATA_DIR / "raw"
-OUT_TRAIN = DATA_DIR / "asap_train.csv"
-OUT_VALID = DATA_DIR / "asap_valid.csv"
+OUT_TRAIN = DATA_DIR / "asap_train.parquet"
+OUT_VALID = DATA_DIR / "asap_valid.parquet"
+OUT_TRAIN_CSV = DATA_DIR / "asap_train.csv"
+OUT_VALID_CSV = DATA_DIR / "asap_valid.csv"
+SPLIT_META = DATA_DIR / "asap_split.json"
+SPLIT_VERSION = "v2"  # 改動切分 / 標籤邏輯時請一併改版本，讓 prep 不被略過
+
+_COPY_CHUNK = 1 << 20
 
 
 def _ensure_asap_file() -> Path | None:
@@ -45,8 +57,14 @@ def _ensure_asap_file() -> Path | None:
                     out_dir = RAW_DIR / "asap"
                     out_dir.mkdir(parents=True, exist_ok=True)
                     out_path = out_dir / os.path.basename(cand)
-                    with zf.open(cand) as src, open(out_path, "wb") as dst:
-                        dst.write(src.read())
+                    info = zf.getinfo(cand)
+                    if out_path.exists() and out_path.stat().st_size == info.file_size:
+                        return out_path
+                    # 分塊串流解壓，不把整個成員讀進記憶體
+                    tmp = out_path.with_suffix(out_path.suffix + ".part")
+                    with zf.open(cand) as src, open(tmp, "wb") as dst:
+                        shutil.copyfileobj(src, dst, _COPY_CHUNK)
+                    tmp.replace(out_path)
                     print(f"[INFO] 從 zip 解壓：{z} -> {out_path}")
                     return out_path
         except zipfile.BadZipFile:
@@ -54,15 +72,27 @@ def _ensure_asap_file() -> Path | None:
     return None
 
 
-def _read_any(path: Path) -> pd.DataFrame:
+def _detect_encoding(path: Path) -> str:
+    """串流驗證整個檔案是否為合法 UTF-8；否則視為 latin1（ASAP 原檔常見）。"""
+    dec = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_COPY_CHUNK), b""):
+                dec.decode(block)
+            dec.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin1"
+    return "utf-8"
+
+
+def _read_any(path: Path, encoding: str | None = None) -> pd.DataFrame:
     """
-    嘗試用多組設定讀取（ASAP 原檔常見非 UTF-8、引號不規則）
+    編碼只偵測一次，以 C engine 解析；引號不規則時才退回 QUOTE_NONE + 跳過壞行。
     """
+    encoding = encoding or _detect_encoding(path)
     trials = [
-        dict(sep="\t", engine="python", encoding="utf-8"),
-        dict(sep="\t", engine="python", encoding="utf-8", quoting=csv.QUOTE_NONE, on_bad_lines="skip"),
-        dict(sep="\t", engine="python", encoding="latin1"),
-        dict(sep="\t", engine="python", encoding="latin1", quoting=csv.QUOTE_NONE, on_bad_lines="skip"),
+        dict(sep="\t", engine="c", encoding=encoding),
+        dict(sep="\t", engine="c", encoding=encoding, quoting=csv.QUOTE_NONE, on_bad_lines="skip"),
     ]
     last_err = None
     for kw in trials:
@@ -73,6 +103,42 @@ def _read_any(path: Path) -> pd.DataFrame:
     raise RuntimeError(f"讀取 {path} 失敗。最後錯誤：{last_err}")
 
 
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet 欄位型別：分數用小整數、score_norm01 用 float32、文字用 string。"""
+    df = df.copy()
+    for c in ("essay_set", "domain1_score", "score_min", "score_max"):
+        df[c] = df[c].astype("int16")
+    df["score_norm01"] = df["score_norm01"].astype("float32")
+    df["essay"] = df["essay"].astype("string")
+    for c in df.columns:
+        if df[c].dtype == object:
+            df[c] = df[c].astype("string")
+    return df
+
+
+def _content_hash(df: pd.DataFrame) -> str:
+    h = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def split_path(name: str) -> Path:
+    """train / valid 的實際檔案：優先 Parquet，其次舊版 CSV。"""
+    pq_path, csv_path = {"train": (OUT_TRAIN, OUT_TRAIN_CSV), "valid": (OUT_VALID, OUT_VALID_CSV)}[name]
+    return pq_path if pq_path.exists() or not csv_path.exists() else csv_path
+
+
+def load_split(name: str) -> pd.DataFrame:
+    path = split_path(name)
+    return pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+
+
+def _is_up_to_date(source_sha: str) -> bool:
+    if not (SPLIT_META.exists() and OUT_TRAIN.exists() and OUT_VALID.exists()):
+        return False
+    meta = json.loads(SPLIT_META.read_text(encoding="utf-8"))
+    return meta.get("source_sha256") == source_sha and meta.get("version") == SPLIT_VERSION
+
+
 def _add_norm_labels(df: pd.DataFrame) -> pd.DataFrame:
     """
     需要欄位：essay, domain1_score, essay_set
@@ -98,7 +164,7 @@ def _add_norm_labels(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def prepare_asap():
+def prepare_asap(force: bool = False, write_csv: bool = False):
     asap = _ensure_asap_file()
     if not asap or not Path(asap).exists():
         print(
@@ -108,7 +174,13 @@ def prepare_asap():
         sys.exit(1)
     print(f"[INFO] 使用檔案：{asap}")
 
-    df = _read_any(asap)
+    source_sha = file_sha256(asap)
+    if not force and _is_up_to_date(source_sha):
+        print(f"[SKIP] 來源未變更（sha256={source_sha[:12]}），沿用 {OUT_TRAIN} / {OUT_VALID}")
+        return
+
+    encoding = _detect_encoding(asap)
+    df = _read_any(asap, encoding)
     df = _add_norm_labels(df)
 
     # 依 essay_set 分層切分（80/20）
@@ -122,9 +194,24 @@ def prepare_asap():
     train_df = pd.concat(train_parts, axis=0).sample(frac=1, random_state=42).reset_index(drop=True)
     valid_df = pd.concat(valid_parts, axis=0).sample(frac=1, random_state=42).reset_index(drop=True)
 
+    train_df, valid_df = _typed(train_df), _typed(valid_df)
+
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    train_df.to_csv(OUT_TRAIN, index=False)
-    valid_df.to_csv(OUT_VALID, index=False)
+    train_df.to_parquet(OUT_TRAIN, index=False)
+    valid_df.to_parquet(OUT_VALID, index=False)
+    if write_csv:
+        train_df.to_csv(OUT_TRAIN_CSV, index=False)
+        valid_df.to_csv(OUT_VALID_CSV, index=False)
+    SPLIT_META.write_text(json.dumps({
+        "version": SPLIT_VERSION,
+        "source": str(asap),
+        "source_sha256": source_sha,
+        "encoding": encoding,
+        "train_rows": int(len(train_df)),
+        "valid_rows": int(len(valid_df)),
+        "train_content_sha256": _content_hash(train_df),
+        "valid_content_sha256": _content_hash(valid_df),
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"[OK] 訓練集：{OUT_TRAIN}（{len(train_df)}）")
     print(f"[OK] 驗證集：{OUT_VALID}（{len(valid_df)}）")
@@ -133,9 +220,11 @@ def prepare_asap():
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--task", default="prepare_asap")
+    ap.add_argument("--force", action="store_true", help="來源未變更也重新切分")
+    ap.add_argument("--csv", action="store_true", help="同時輸出舊版 CSV（asap_train.csv / asap_valid.csv）")
     args = ap.parse_args()
     if args.task == "prepare_asap":
-        prepare_asap()
+        prepare_asap(force=args.force, write_csv=args.csv)
     else:
         print(f"[ERROR] 未支援任務：{args.task}", file=sys.stderr)
         sys.exit(2)
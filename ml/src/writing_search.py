@@ -0,0 +1,228 @@
+# src/writing_search.py
+"""
+寫作模型（XGBoost）的平行超參數搜尋。
+
+- 所有 trial 共用同一份快取特徵矩陣（feature_cache 的 .npy），每個 worker 以 mmap 開啟，
+  多個行程共享 page cache，不會各自複製一份。
+- 核心分配：同時跑 `parallel` 個 trial，每個 trial 的 XGBoost n_jobs = cpu // parallel。
+  hist 在 ASAP 這種 1e4 列的資料上，單一模型超過 2 執行緒的邊際效益很低，
+  所以預設每個 trial 2 執行緒、其餘核心拿來平行跑 trial。
+- 驗證集 early stopping（MAE 或 1-QWK），模型只保留到 best_iteration。
+- 每個 trial 記錄 fit 時間、單筆預測延遲（p50/p95）、模型檔大小與 MAE/QWK（含依 essay_set 分層的 bootstrap CI），
+  select_trial 可在 QWK 容忍範圍內挑最小、最快的模型升級為正式模型。
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import quadratic_weighted_kappa, qwk_bootstrap
+
+SEARCH_DIR = Path("artifacts") / "writing_baseline" / "search"
+
+# worker 行程內的共用狀態（initializer 設定一次，之後每個 trial 重用）
+_W: Dict[str, Any] = {}
+
+
+def sample_params(rng: np.random.Generator) -> Dict[str, Any]:
+    """隨機搜尋空間；n_estimators 只是上限，實際樹數由 early stopping 決定。"""
+    return {
+        "n_estimators": 2000,
+        "max_depth": int(rng.integers(2, 9)),
+        "learning_rate": float(np.exp(rng.uniform(np.log(0.02), np.log(0.3)))),
+        "subsample": float(rng.uniform(0.6, 1.0)),
+        "colsample_bytree": float(rng.uniform(0.4, 1.0)),
+        "min_child_weight": float(np.exp(rng.uniform(0.0, np.log(10.0)))),
+        "reg_lambda": float(np.exp(rng.uniform(np.log(0.1), np.log(10.0)))),
+        "max_bin": int(rng.choice([64, 128, 256])),
+    }
+
+
+def split_cores(n_trials: int, parallel: int = 0, cpu: Optional[int] = None) -> Tuple[int, int]:
+    """回傳 (同時進行的 trial 數, 每個 trial 的 n_jobs)。"""
+    cpu = cpu or os.cpu_count() or 1
+    if parallel <= 0:
+        threads = 2 if cpu >= 4 else 1
+        parallel = max(1, cpu // threads)
+    parallel = max(1, min(parallel, n_trials, cpu))
+    return parallel, max(1, cpu // parallel)
+
+
+def _init_worker(x_tr_path: str, x_va_path: str, y_tr: np.ndarray, y_va: np.ndarray,
+                 true_raw: np.ndarray, score_min: np.ndarray, score_max: np.ndarray,
+                 groups: Optional[np.ndarray] = None) -> None:
+    _W.update(
+        X_tr=np.load(x_tr_path, mmap_mode="r"),
+        X_va=np.load(x_va_path, mmap_mode="r"),
+        y_tr=y_tr, y_va=y_va, true_raw=true_raw, score_min=score_min, score_max=score_max, groups=groups,
+    )
+
+
+def _val_raw(pred_norm01: np.ndarray) -> np.ndarray:
+    raw = _W["score_min"] + np.clip(pred_norm01, 0.0, 1.0) * (_W["score_max"] - _W["score_min"])
+    return np.rint(raw).astype(int)
+
+
+def _val_qwk(pred_norm01: np.ndarray) -> float:
+    return float(quadratic_weighted_kappa(_W["true_raw"], _val_raw(pred_norm01)))
+
+
+def qwk_loss(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    """early stopping 用：1 - QWK（越小越好；eval_set 只有驗證集，順序與 _W 一致）。"""
+    return 1.0 - _val_qwk(y_pred)
+
+
+def _latency_ms(model, X: np.ndarray, n: int = 50) -> Tuple[float, float]:
+    """模擬 API：每次預測 1 列。"""
+    idx = np.arange(min(n, X.shape[0]))
+    ts = []
+    for i in idx:
+        row = X[i:i + 1]
+        t0 = time.perf_counter()
+        model.predict(row)
+        ts.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(ts, 50)), float(np.percentile(ts, 95))
+
+
+def run_trial(trial_id: int, params: Dict[str, Any], n_jobs: int, stop_metric: str,
+              early_stopping: int, out_dir: str) -> Dict[str, Any]:
+    from xgboost import XGBRegressor
+
+    X_tr, X_va, y_tr, y_va = _W["X_tr"], _W["X_va"], _W["y_tr"], _W["y_va"]
+    eval_metric = "mae" if stop_metric == "mae" else qwk_loss
+    model = XGBRegressor(**params, tree_method="hist", random_state=42, n_jobs=n_jobs,
+                         eval_metric=eval_metric, early_stopping_rounds=early_stopping)
+    t0 = time.perf_counter()
+    model.fit(X_tr, y_tr, eval_set=[(X_va, y_va)], verbose=False)
+    fit_s = time.perf_counter() - t0
+
+    # 只保留到 best_iteration：模型更小、預測更快，且與評估結果一致
+    best_it = int(getattr(model, "best_iteration", params["n_estimators"] - 1))
+    booster = model.get_booster()[: best_it + 1]
+    model_path = Path(out_dir) / f"trial_{trial_id:03d}.json"
+    booster.save_model(str(model_path))
+
+    # 以 API 的方式重新載入，量測的是實際上線的那顆模型
+    served = XGBRegressor()
+    served.load_model(str(model_path))
+    pred = served.predict(X_va)
+    boot = qwk_bootstrap(_W["true_raw"], _val_raw(pred), n_boot=1000, groups=_W["groups"])
+    p50, p95 = _latency_ms(served, X_va)
+    return {
+        "trial": trial_id,
+        "params": params,
+        "n_jobs": n_jobs,
+        "best_iteration": best_it,
+        "n_trees": best_it + 1,
+        "fit_s": round(fit_s, 3),
+        "val_mae": float(np.mean(np.abs(np.clip(pred, 0, 1) - y_va))),
+        "val_qwk": boot["qwk"],
+        "val_qwk_ci": boot["ci"],
+        "predict_p50_ms": round(p50, 4),
+        "predict_p95_ms": round(p95, 4),
+        "model_bytes": model_path.stat().st_size,
+        "model_path": str(model_path),
+    }
+
+
+def _mark_pareto(trials: List[Dict[str, Any]]) -> None:
+    """QWK 越高、延遲越低、檔案越小越好；標記不被其他 trial 全面支配者。"""
+    for t in trials:
+        t["pareto"] = not any(
+            o is not t
+            and o["val_qwk"] >= t["val_qwk"]
+            and o["predict_p50_ms"] <= t["predict_p50_ms"]
+            and o["model_bytes"] <= t["model_bytes"]
+            and (o["val_qwk"], -o["predict_p50_ms"], -o["model_bytes"])
+            != (t["val_qwk"], -t["predict_p50_ms"], -t["model_bytes"])
+            for o in trials
+        )
+
+
+def run_search(X_tr: np.memmap, X_va: np.memmap, y_tr: np.ndarray, y_va: np.ndarray,
+               true_raw: np.ndarray, score_min: np.ndarray, score_max: np.ndarray,
+               n_trials: int, base_params: Dict[str, Any], parallel: int = 0,
+               stop_metric: str = "mae", early_stopping: int = 50, seed: int = 42,
+               groups: Optional[np.ndarray] = None) -> Path:
+    """
+    X_tr / X_va 必須是 feature_cache 產生的 memmap（以 .filename 傳給 worker）。
+    groups（驗證集的 essay_set）用於 QWK bootstrap CI 的分層抽樣。
+    trial 0 固定為 base_params，方便與現行設定比較。回傳本次搜尋的輸出資料夾。
+    """
+    parallel, n_jobs = split_cores(n_trials, parallel)
+    run_dir = SEARCH_DIR / time.strftime("%Y%m%d-%H%M%S")
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    configs = [dict(base_params)] + [sample_params(rng) for _ in range(n_trials - 1)]
+    print(f"[INFO] search: {n_trials} trials, {parallel} 平行 × n_jobs={n_jobs}, early stop on {stop_metric}")
+
+    trials: List[Dict[str, Any]] = []
+    init = (X_tr.filename, X_va.filename, y_tr, y_va, true_raw, score_min, score_max, groups)
+    with ProcessPoolExecutor(max_workers=parallel, initializer=_init_worker, initargs=init) as ex:
+        futs = {ex.submit(run_trial, i, p, n_jobs, stop_metric, early_stopping, str(run_dir)): i
+                for i, p in enumerate(configs)}
+        for fut in as_completed(futs):
+            try:
+                t = fut.result()
+            except Exception as e:
+                print(f"[WARN] trial {futs[fut]} 失敗：{e}")
+                continue
+            trials.append(t)
+            print(f"[TRIAL {t['trial']:03d}] QWK={t['val_qwk']:.4f} "
+                  f"[{t['val_qwk_ci'][0]:.3f}, {t['val_qwk_ci'][1]:.3f}] MAE={t['val_mae']:.4f} "
+                  f"trees={t['n_trees']} fit={t['fit_s']:.1f}s p50={t['predict_p50_ms']:.3f}ms "
+                  f"size={t['model_bytes'] / 1024:.0f}KB")
+
+    trials.sort(key=lambda t: t["val_qwk"], reverse=True)
+    _mark_pareto(trials)
+    (run_dir / "trials.json").write_text(
+        json.dumps({"stop_metric": stop_metric, "parallel": parallel, "n_jobs": n_jobs, "trials": trials},
+                   ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+    print_leaderboard(trials)
+    print(f"[OK] 搜尋結果 -> {run_dir / 'trials.json'}")
+    return run_dir
+
+
+def print_leaderboard(trials: List[Dict[str, Any]], top: int = 15) -> None:
+    print(f"\n{'trial':>5} {'QWK':>7} {'95% CI':>15} {'MAE':>7} {'trees':>6} {'fit_s':>7} {'p50_ms':>8} {'KB':>7}  pareto")
+    for t in trials[:top]:
+        lo, hi = t.get("val_qwk_ci") or (float("nan"), float("nan"))
+        print(f"{t['trial']:>5} {t['val_qwk']:>7.4f} {f'[{lo:.3f},{hi:.3f}]':>15} {t['val_mae']:>7.4f} {t['n_trees']:>6} "
+              f"{t['fit_s']:>7.1f} {t['predict_p50_ms']:>8.3f} {t['model_bytes'] / 1024:>7.0f}  "
+              f"{'*' if t.get('pareto') else ''}")
+
+
+def latest_run() -> Optional[Path]:
+    runs = sorted(p for p in SEARCH_DIR.glob("*") if (p / "trials.json").exists())
+    return runs[-1] if runs else None
+
+
+def select_trial(trials: List[Dict[str, Any]], which: str = "auto",
+                 qwk_tolerance: float = 0.005) -> Dict[str, Any]:
+    """
+    which="auto"：QWK 不低於最佳值 - qwk_tolerance 的 trial 中，挑模型最小、其次延遲最低者。
+    否則 which 為 trial 編號。
+    """
+    if which != "auto":
+        for t in trials:
+            if t["trial"] == int(which):
+                return t
+        raise SystemExit(f"找不到 trial {which}")
+    best = max(t["val_qwk"] for t in trials)
+    ok = [t for t in trials if t["val_qwk"] >= best - qwk_tolerance]
+    return min(ok, key=lambda t: (t["model_bytes"], t["predict_p50_ms"]))
+
+
+def promote(trial: Dict[str, Any], dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(trial["model_path"], dst)
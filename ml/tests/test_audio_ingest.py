@@ -0,0 +1,82 @@
+import asyncio
+
+import numpy as np
+import soundfile as sf
+
+from audio_ingest import HEADER_BYTES, IngestedAudio, UploadLimitMiddleware, load_stream, raw_info, sniff_header
+from audio_source import AudioInfo, load_audio, probe
+
+
+def _stereo(seconds, sr=44100):
+    t = np.arange(int(seconds * sr)) / sr
+    left = 0.3 * np.sin(2 * np.pi * 220 * t)
+    return np.stack([left, 0.5 * left], axis=1).astype(np.float32)
+
+
+def test_sniff_header_reads_duration_from_the_first_bytes_only(tmp_path):
+    y = _stereo(8.0)
+    for fmt in ("WAV", "FLAC"):
+        path = tmp_path / f"a.{fmt.lower()}"
+        sf.write(path, y, 44100, format=fmt)
+        head = path.read_bytes()[:HEADER_BYTES]  # 截斷：只有開頭
+        assert sniff_header(head) == AudioInfo(len(y), 44100, 2, fmt)
+    ogg = tmp_path / "a.ogg"
+    sf.write(ogg, y, 44100, format="OGG")
+    assert sniff_header(ogg.read_bytes()[:HEADER_BYTES]) is None
+    assert sniff_header(b"RIFF\0\0\0\0WAVE") is None
+
+
+def test_sniff_wav_trusts_block_size_only_for_fixed_width_codecs(tmp_path):
+    y = _stereo(3.0, sr=16000)
+    # 6 聲道 → libsndfile 寫 WAVE_FORMAT_EXTENSIBLE，走 SubFormat GUID
+    cases = [(y, "PCM_16"), (y, "PCM_24"), (y, "FLOAT"), (y, "ULAW"), (y, "ALAW"), (np.tile(y, 3), "PCM_16")]
+    for i, (data, subtype) in enumerate(cases):
+        path = tmp_path / f"lin{i}.wav"
+        sf.write(path, data, 16000, subtype=subtype)
+        assert sniff_header(path.read_bytes()[:HEADER_BYTES]) == AudioInfo(len(data), 16000, data.shape[1], "WAV")
+    # ADPCM / GSM：一個 block 含多個樣本，data 大小 ÷ block_align 會嚴重低估長度 → 交給 probe
+    for subtype in ("IMA_ADPCM", "MS_ADPCM", "GSM610"):
+        path = tmp_path / f"{subtype}.wav"
+        sf.write(path, y[:, 0], 16000, subtype=subtype)
+        assert sniff_header(path.read_bytes()[:HEADER_BYTES]) is None
+        assert abs(probe(path).frames - len(y)) < 1024
+
+
+def test_stream_downmix_resample_matches_librosa_load(tmp_path):
+    path = tmp_path / "a.wav"
+    sf.write(path, _stereo(5.0), 44100, subtype="PCM_16")
+    ref, _ = load_audio(path, sr=16000)
+    y, sr = load_stream(path, 16000, block_frames=4096)
+    assert sr == 16000 and y.dtype == np.float32 and len(y) == len(ref)
+    np.testing.assert_allclose(y, ref, atol=1e-5)
+
+
+def test_declared_raw_pcm_skips_decoding(tmp_path):
+    y = (0.25 * np.sin(np.arange(16000) / 5)).astype(np.float32)
+    pcm = tmp_path / "a.pcm"
+    (np.round(y * 32767).astype("<i2")).tofile(pcm)
+    ref = tmp_path / "a.wav"
+    sf.write(ref, np.round(y * 32767).astype(np.int16), 16000, subtype="PCM_16")
+    info = raw_info(pcm.stat().st_size, "pcm_s16le")
+    assert info.duration_s == 1.0
+    a, _ = IngestedAudio(str(pcm), info, "pcm_s16le").load()
+    b, _ = IngestedAudio(str(ref), sniff_header(ref.read_bytes())).load()
+    np.testing.assert_array_equal(a, b)
+
+
+def test_upload_limit_rejects_before_reading_body():
+    async def app(scope, receive, send):
+        raise AssertionError("should not be called")
+
+    sent = []
+
+    async def send(msg):
+        sent.append(msg)
+
+    async def receive():
+        raise AssertionError("body should not be read")
+
+    mw = UploadLimitMiddleware(app, max_bytes=1000, paths=("/score/speaking",))
+    scope = {"type": "http", "path": "/score/speaking", "headers": [(b"content-length", b"5000")]}
+    asyncio.run(mw(scope, receive, send))
+    assert sent[0]["status"] == 413
@@ -0,0 +1,78 @@
+import os
+import zipfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import audio_source
+from audio_source import (
+    close_archives,
+    exists,
+    iter_zip_uris,
+    load_audio,
+    parse_zip_uri,
+    read_bytes,
+    read_text,
+    zip_uri,
+)
+
+
+@pytest.fixture()
+def corpus(tmp_path):
+    rng = np.random.default_rng(0)
+    wav = tmp_path / "a.wav"
+    sf.write(wav, (0.1 * rng.standard_normal(8000)).astype(np.float32), 16000, subtype="PCM_16")
+    z = tmp_path / "ABA.zip"
+    with zipfile.ZipFile(z, "w") as zf:
+        zf.write(wav, "ABA/wav/arctic_a0001.wav", compress_type=zipfile.ZIP_STORED)
+        zf.write(wav, "ABA/wav/arctic_a0002.wav", compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("__MACOSX/ABA/wav/._arctic_a0001.wav", b"junk")
+        zf.writestr("ABA/txt/arctic_a0001.txt", "Author of the danger trail.\n")
+    return wav, z
+
+
+def test_stored_and_deflated_members_read_like_the_extracted_file(corpus):
+    wav, z = corpus
+    raw = wav.read_bytes()
+    for m in ("ABA/wav/arctic_a0001.wav", "ABA/wav/arctic_a0002.wav"):
+        assert read_bytes(zip_uri(z, m)) == raw
+    y_ref, sr_ref = load_audio(str(wav), sr=16000)
+    y, sr = load_audio(zip_uri(z, "ABA/wav/arctic_a0001.wav"), sr=16000)
+    assert sr == sr_ref
+    np.testing.assert_array_equal(y, y_ref)
+
+
+def test_listing_exists_and_text(corpus):
+    _, z = corpus
+    uris = list(iter_zip_uris(z))
+    assert [parse_zip_uri(u)[1] for u in uris] == ["ABA/wav/arctic_a0001.wav", "ABA/wav/arctic_a0002.wav"]
+    assert exists(uris[0]) and not exists(zip_uri(z, "ABA/wav/missing.wav"))
+    assert read_text(zip_uri(z, "ABA/txt/arctic_a0001.txt")).strip() == "Author of the danger trail."
+    with pytest.raises(FileNotFoundError):
+        read_bytes(zip_uri(z, "ABA/wav/missing.wav"))
+
+
+def test_rewritten_zip_replaces_and_closes_the_old_archive(tmp_path):
+    z = tmp_path / "a.zip"
+    with zipfile.ZipFile(z, "w") as zf:
+        zf.writestr("m.txt", "old")
+    uri = zip_uri(z, "m.txt")
+    assert read_text(uri) == "old"
+    key = str(z.resolve())
+    old = audio_source._ARCHIVES[key]
+    old_fd = old._fd
+
+    with zipfile.ZipFile(z, "w") as zf:
+        zf.writestr("m.txt", "newer")
+    os.utime(z, ns=(0, os.stat(z).st_mtime_ns + 1))  # 保證 mtime 不同
+    assert read_text(uri) == "newer"
+    assert old.closed and audio_source._ARCHIVES[key] is not old
+    with pytest.raises(OSError):
+        os.fstat(old_fd)
+
+    new = audio_source._ARCHIVES[key]
+    close_archives()
+    assert new.closed and key not in audio_source._ARCHIVES
+    assert read_text(uri) == "newer"  # 關掉後再用會重新開
+    close_archives()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from band_lut import (
+    BandLUT, compile_lut, isotonic_band, linear_map, load_lut, mapping_from_meta, quantile_band, save_lut,
+)
+from calibrate_band import fit_isotonic, parse_quantile_spec, quantile_map, to_half_band
+
+BINS = 10001
+SPEC = "4.0:0.05,4.5:0.10,5.0:0.20,5.5:0.35,6.0:0.55,6.5:0.70,7.0:0.85,7.5:0.93,8.0:0.97,8.5:0.99,9.0:1.00"
+
+
+def _fitted_metas():
+    rng = np.random.default_rng(0)
+    overall = rng.beta(2, 2, size=2000)
+    _, q = quantile_map(overall, parse_quantile_spec(SPEC))
+    band_true = np.clip(to_half_band(4.0 + 5.0 * overall + rng.normal(0, 0.5, overall.size)), 4.0, 9.0)
+    iso, lo = fit_isotonic(overall, band_true)
+    return [
+        {"mode": "linear", "low": 4.0, "high": 9.0},
+        {"mode": "quantile", "quantiles": q["quantiles"], "bands": q["bands"]},
+        {"mode": "isotonic", "lo": lo, "knots_x": iso.X_thresholds_.tolist(), "knots_y": iso.y_thresholds_.tolist()},
+    ]
+
+
+@pytest.fixture(params=_fitted_metas(), ids=lambda m: m["mode"])
+def meta(request):
+    return request.param
+
+
+def test_lut_equals_exact_mapping_on_grid(meta):
+    exact = mapping_from_meta(meta)
+    table = compile_lut(exact, BINS)
+    grid = np.linspace(0.0, 1.0, BINS)
+    lut = BandLUT(table, meta)
+    np.testing.assert_array_equal(lut.map(grid), exact(grid))
+    assert [lut(x) for x in grid[::97]] == exact(grid[::97]).tolist()
+
+
+def test_lut_off_grid_only_differs_next_to_a_step(meta):
+    exact = mapping_from_meta(meta)
+    lut = BandLUT(compile_lut(exact, BINS), meta)
+    xs = np.random.default_rng(1).random(200_000)
+    got, want = lut.map(xs), exact(xs)
+    assert [lut(x) for x in xs[:2000]] == got[:2000].tolist()
+    bad = got != want
+    assert bad.mean() < 1e-3
+    h = 0.5 / (BINS - 1) + 1e-12
+    np.testing.assert_array_less(0, np.abs(exact(xs[bad] + h) - exact(xs[bad] - h)))
+    np.testing.assert_array_less(np.abs(got - want), 0.5 + 1e-9)
+
+
+def test_out_of_range_and_nan_are_clipped(meta):
+    lut = BandLUT(compile_lut(mapping_from_meta(meta), BINS), meta)
+    assert lut(-3.0) == lut(0.0) == lut(float("nan"))
+    assert lut(7.0) == lut(1.0)
+    np.testing.assert_array_equal(lut.map(np.array([-1.0, np.nan, 2.0])), [lut(0.0), lut(0.0), lut(1.0)])
+
+
+def test_quantile_map_matches_per_sample_loop():
+    xs = np.random.default_rng(2).random(5000)
+    pairs = parse_quantile_spec(SPEC)
+    bands, meta = quantile_map(xs, pairs)
+    qs, bs = meta["quantiles"], meta["bands"]
+    loop = [bs[min(int(np.searchsorted(qs, v, side="right")), len(bs) - 1)] for v in xs]
+    np.testing.assert_array_equal(bands, to_half_band(np.array(loop)))
+
+
+def test_isotonic_band_matches_sklearn_predict():
+    rng = np.random.default_rng(3)
+    overall = rng.random(1000)
+    band_true = np.clip(4.0 + 5.0 * overall + rng.normal(0, 0.7, overall.size), 4.0, 9.0)
+    iso, lo = fit_isotonic(overall, band_true)
+    xs = rng.random(20000) * 1.2 - 0.1
+    want = to_half_band(lo + (9.0 - lo) * np.clip(iso.predict(xs), 0, 1))
+    np.testing.assert_array_equal(isotonic_band(xs, iso.X_thresholds_, iso.y_thresholds_, lo), want)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    meta = {"mode": "linear", "low": 4.0, "high": 9.0}
+    assert load_lut(tmp_path) is None
+    save_lut(compile_lut(lambda xs: linear_map(xs, (4.0, 9.0)), BINS), meta, tmp_path)
+    lut = load_lut(tmp_path)
+    assert lut.bins == BINS and lut.mode == "linear"
+    assert lut(0.0) == 4.0 and lut(1.0) == 9.0 and lut(0.5) == 6.5
+
+    np.save(tmp_path / "band_lut.npy", np.zeros(BINS, dtype=np.float32))
+    with pytest.raises(ValueError):
+        load_lut(tmp_path)
+
+
+def test_quantile_band_last_band_above_top_breakpoint():
+    assert quantile_band(np.array([1.0]), [0.2, 0.5, 0.8], [5.0, 6.0, 7.0]).tolist() == [7.0]
@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+from disfluency import Token, scan
+
+# 舊版 speech_features._disfluency_stats 的 regex（同 tools/bench_disfluency.py），當作計數的對照組
+_LEGACY_FILLER_RE = re.compile(
+    r"\bum\b|\buh\b|\ber\b|\bah\b|\bhmm\b|\byou know\b|\bkinda\b|\bkind of\b|\bsorta\b|\blik[e]?\b|\bi mean\b|\bwell\b",
+    flags=re.I,
+)
+
+
+def _legacy_counts(t):
+    toks = [w.lower() for w in re.findall(r"[A-Za-z']+", t)]
+    rep = sum(1 for a, b in zip(toks, toks[1:]) if a == b)
+    edits = re.findall(r"\b(sorry|i mean|no[, ]+i mean|let me|i mean|actually)\b", t, flags=re.I)
+    return len(_LEGACY_FILLER_RE.findall(t)), rep + len(edits), len(toks)
+
+
+def _counts(t):
+    s = scan(t).stats()
+    return s["filler_count"], s["self_repair_count"], s["words"]
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Um, well I think the the cat sat. You know it was kind of sad.",
+    "I mean, no, I mean the city is, like, kinda big. Sorry, let me say it again, actually.",
+    "Uh hmm er ah sorta likes lik don't it's 'um' ok",
+    "no. I mean it, I-I think, You know you know YOU KNOW",
+])
+def test_counts_match_legacy_regex_on_ordinary_text(text):
+    assert _counts(text) == _legacy_counts(text)
+
+
+@pytest.mark.parametrize("text, filler, repair", [
+    ("you  know", 1, 0),    # 兩個空白
+    ("you, know", 1, 0),    # 逗號
+    ("kind  of", 1, 0),
+    ("i\nmean", 1, 1),      # 換行；filler 與編輯語各算一次
+    ("you. know", 0, 0),    # 句點仍會斷開片語
+])
+def test_phrases_may_span_commas_and_whitespace(text, filler, repair):
+    legacy_filler, legacy_repair, _ = _legacy_counts(text)
+    assert (legacy_filler, legacy_repair) == (0, 0)  # 舊版一律不算：這是刻意的行為改變
+    assert _counts(text)[:2] == (filler, repair)
+
+
+def test_token_and_match_spans_point_into_the_stripped_transcript():
+    raw = "  So, um... you  know, I mean it. "
+    t = raw.strip()
+    res = scan(raw)
+    assert res.tokens[:3] == (Token("So", 0, 2), Token("um", 4, 6), Token("you", 10, 13))
+    assert all(t[tok.char_start:tok.char_end] == tok.text for tok in res.tokens)
+    assert [(m.phrase, m.tok_start, m.tok_end, t[m.char_start:m.char_end]) for m in res.fillers] == [
+        ("um", 1, 2, "um"),
+        ("you know", 2, 4, "you  know"),
+        ("i mean", 4, 6, "I mean"),
+    ]
+    assert [(m.phrase, t[m.char_start:m.char_end]) for m in res.repairs] == [("i mean", "I mean")]
+    assert scan("the The cat").repeats == (1,)
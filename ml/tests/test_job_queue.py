@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def test_submit_dedups_and_moves_upload_into_spool(tmp_path):
+    q = JobQueue(tmp_path / "jobs")
+    up = tmp_path / "up.wav"
+    up.write_bytes(b"RIFF")
+    job, deduped = q.submit("speaking", "k1", {"transcript": "hi"}, str(up))
+    assert not deduped and job.status == QUEUED and not up.exists()
+    assert job.spool_path.endswith(f"{job.id}.wav") and (tmp_path / "jobs" / "spool" / f"{job.id}.wav").exists()
+
+    again = tmp_path / "again.wav"
+    again.write_bytes(b"RIFF")
+    same, deduped = q.submit("speaking", "k1", {"transcript": "hi"}, str(again))
+    assert deduped and same.id == job.id and not again.exists()
+
+    claimed = q.claim("w", lease_s=30)
+    assert q.complete(claimed.id, "w", {"overall_01": 0.5})
+    done = q.get(job.id)
+    assert done.status == DONE and done.result == {"overall_01": 0.5} and not (tmp_path / "jobs" / "spool" / f"{job.id}.wav").exists()
+    assert q.submit("speaking", "k1", {}, None)[0].id == job.id  # 完成且未過期：仍去重
+
+
+def test_claim_is_exclusive_across_concurrent_workers(tmp_path):
+    q = JobQueue(tmp_path)
+    for i in range(20):
+        q.submit("writing", f"k{i}", {"text": str(i)})
+
+    def drain(w):
+        got = []
+        while (job := q.claim(w, lease_s=30)) is not None:
+            got.append(job.id)
+            q.complete(job.id, w, {})
+        return got
+
+    with ThreadPoolExecutor(4) as ex:
+        results = list(ex.map(drain, ["a", "b", "c", "d"]))
+    ids = [j for r in results for j in r]
+    assert len(ids) == 20 and len(set(ids)) == 20
+    assert q.stats() == {QUEUED: 0, RUNNING: 0, DONE: 20, FAILED: 0}
+
+
+def test_retry_backoff_lease_expiry_and_final_failure(tmp_path):
+    q = JobQueue(tmp_path, max_attempts=3, backoff_s=0.05)
+    job, _ = q.submit("writing", "k", {"text": "x"})
+
+    first = q.claim("w1", lease_s=30)
+    assert q.fail(first.id, "w1", "boom") == QUEUED
+    assert q.claim("w1", lease_s=30) is None  # 退避中
+    time.sleep(0.06)
+
+    second = q.claim("w2", lease_s=0.01)  # 租約很快過期＝worker 掛了
+    time.sleep(0.02)
+    third = q.claim("w3", lease_s=30)
+    assert second.attempts == 2 and third.id == job.id and third.attempts == 3
+    assert not q.complete(job.id, "w2", {})  # 舊 worker 的結果丟掉
+    assert q.fail(job.id, "w3", "boom again") == FAILED
+    final = q.get(job.id)
+    assert final.status == FAILED and final.error == "boom again"
+    assert not q.submit("writing", "k", {"text": "x"})[1]  # 最終失敗的可以重送
+
+
+def test_client_errors_fail_immediately_and_results_expire(tmp_path):
+    q = JobQueue(tmp_path, result_ttl_s=0.05)
+    job, _ = q.submit("speaking", "k", {})
+    q.claim("w", lease_s=30)
+    assert q.fail(job.id, "w", "422: no subscores", retry=False) == FAILED
+    assert q.get(job.id) is not None
+    time.sleep(0.06)
+    assert q.get(job.id) is None and q.purge() == 1
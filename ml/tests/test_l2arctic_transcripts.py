@@ -0,0 +1,51 @@
+import zipfile
+
+from audio_source import zip_uri
+from l2arctic_transcripts import TranscriptResolver, parse_txt_done_data
+
+DONE = '( arctic_a0001 "Author of the danger trail." )\n( arctic_a0002 "From etc only." )\nnot a line\n'
+
+
+def _speaker(root):
+    for d in ("wav", "txt", "etc"):
+        (root / d).mkdir(parents=True)
+    (root / "txt" / "arctic_a0001.txt").write_text("From txt.\n")
+    (root / "etc" / "txt.done.data").write_text(DONE)
+
+
+def test_parse_txt_done_data():
+    assert parse_txt_done_data(DONE) == {"arctic_a0001": "Author of the danger trail.",
+                                         "arctic_a0002": "From etc only."}
+
+
+def test_txt_wins_then_done_data_then_none(tmp_path):
+    root = tmp_path / "ABA" / "ABA"
+    _speaker(root)
+    res = TranscriptResolver()
+    wav = lambda utt: str(root / "wav" / f"{utt}.wav")
+    assert res.lookup(wav("arctic_a0001")) == "From txt."
+    assert res.lookup(wav("arctic_a0002")) == "From etc only."
+    assert res.lookup(wav("arctic_b0999")) is None
+    assert len(res._speakers) == 1
+
+
+def test_disk_cache_is_reused_and_invalidated(tmp_path):
+    root = tmp_path / "ABA" / "ABA"
+    _speaker(root)
+    cache = tmp_path / "cache"
+    wav = str(root / "wav" / "arctic_a0003.wav")
+    assert TranscriptResolver(cache).lookup(wav) is None
+    assert len(list(cache.glob("*.json"))) == 1
+    (root / "etc" / "txt.done.data").write_text(DONE + '( arctic_a0003 "Added later." )\n')
+    assert TranscriptResolver(cache).lookup(wav) == "Added later."
+
+
+def test_zip_members(tmp_path):
+    z = tmp_path / "BWC.zip"
+    with zipfile.ZipFile(z, "w") as zf:
+        zf.writestr("BWC/wav/arctic_a0001.wav", b"")
+        zf.writestr("BWC/txt/arctic_a0001.txt", "Zipped txt.")
+        zf.writestr("BWC/etc/txt.done.data", DONE)
+    res = TranscriptResolver(tmp_path / "cache")
+    assert res.lookup(zip_uri(z, "BWC/wav/arctic_a0001.wav")) == "Zipped txt."
+    assert res.lookup(zip_uri(z, "BWC/wav/arctic_a0002.wav")) == "From etc only."
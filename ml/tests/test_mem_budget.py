@@ -0,0 +1,82 @@
+import asyncio
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_source import AudioInfo, probe
+from mem_budget import (
+    MIB,
+    BudgetBusy,
+    MemoryBudget,
+    RequestTooLarge,
+    RssWatcher,
+    estimate_speaking_bytes,
+    max_duration_s,
+)
+
+
+def test_probe_reads_header_and_estimate_scales_with_duration(tmp_path):
+    path = tmp_path / "a.wav"
+    sf.write(path, np.zeros((44100 * 2, 2), dtype=np.float32), 44100)
+    info = probe(path)
+    assert info == AudioInfo(frames=88200, samplerate=44100, channels=2, format="WAV")
+    assert info.duration_s == pytest.approx(2.0)
+    (tmp_path / "junk.webm").write_bytes(b"\x1aE\xdf\xa3" + b"\0" * 100)
+    assert probe(tmp_path / "junk.webm") is None
+
+    one = estimate_speaking_bytes(AudioInfo(16000 * 60, 16000, 1, "WAV"), 0)
+    two = estimate_speaking_bytes(AudioInfo(16000 * 120, 16000, 1, "WAV"), 0)
+    assert 150 * MIB < one < two < 2 * one
+    # 讀不懂標頭：以檔案大小 ÷ 保守位元率推長度（1 MB @ 32 kbps ≈ 250 s）
+    assert estimate_speaking_bytes(None, 1_000_000) > estimate_speaking_bytes(AudioInfo(16000 * 200, 16000, 1, "WAV"), 0)
+    # 反推：上限內最長的錄音（44.1 kHz 立體聲走 librosa 也一樣）剛好放得下
+    limit = 1024 * MIB
+    longest = max_duration_s(limit)
+    assert 300 < longest < 400
+    assert estimate_speaking_bytes(AudioInfo(int(44100 * longest), 44100, 2, "WAV"), 0) <= limit
+    assert estimate_speaking_bytes(AudioInfo(int(16000 * (longest + 1)), 16000, 1, "WAV"), 0) > limit
+
+
+def test_budget_rejects_oversized_and_queues_until_release():
+    async def main():
+        budget = MemoryBudget(total_bytes=100, per_request_bytes=80, queue_timeout_s=1.0)
+        with pytest.raises(RequestTooLarge):
+            async with budget.reserve(81):
+                pass
+        order = []
+
+        async def job(name, n, hold):
+            async with budget.reserve(n):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(job("a", 60, 0.05), job("b", 60, 0), job("c", 30, 0))
+        # b 放不下 → 排隊；c 雖放得下也排在 b 後面（先來後到）
+        assert order == ["a", "b", "c"]
+        assert budget.in_use == 0 and budget.peak_in_use == 90
+
+        short = MemoryBudget(total_bytes=100, per_request_bytes=0, queue_timeout_s=0.05)
+
+        async def hog():
+            async with short.reserve(90):
+                await asyncio.sleep(0.2)
+
+        task = asyncio.create_task(hog())
+        await asyncio.sleep(0.01)
+        with pytest.raises(BudgetBusy):
+            async with short.reserve(20):
+                pass
+        await task
+        assert short.stats()["timed_out"] == 1 and short.waiting == 0
+
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="讀 /proc/self/statm")
+def test_rss_watcher_sees_transient_peak():
+    with RssWatcher(interval_s=0.002).track() as t:
+        buf = np.ones(64 * MIB // 8)
+        del buf
+    assert t.peak_delta >= 40 * MIB
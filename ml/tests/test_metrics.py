@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from metrics import _qwk_batch, confusion_matrix, quadratic_weighted_kappa, qwk_bootstrap
+
+
+def legacy_qwk(y_true, y_pred, min_rating=None, max_rating=None):
+    """逐筆迴圈的舊版實作（比對用）。"""
+    y_true = np.asarray(y_true, dtype=int)
+    y_pred = np.asarray(y_pred, dtype=int)
+    if min_rating is None:
+        min_rating = int(min(y_true.min(), y_pred.min()))
+    if max_rating is None:
+        max_rating = int(max(y_true.max(), y_pred.max()))
+    n = max_rating - min_rating + 1
+    O = np.zeros((n, n), dtype=float)
+    for a, b in zip(y_true, y_pred):
+        O[a - min_rating, b - min_rating] += 1.0
+    act_hist = O.sum(axis=1)
+    pred_hist = O.sum(axis=0)
+    E = np.outer(act_hist, pred_hist) / max(1.0, O.sum())
+    if n > 1:
+        W = np.fromfunction(lambda i, j: ((i - j) ** 2) / ((n - 1) ** 2), (n, n))
+    else:
+        W = np.zeros((1, 1), dtype=float)
+    num = (W * O).sum()
+    den = (W * E).sum()
+    return 1.0 - num / den if den > 0 else 0.0
+
+
+def _asap_like(seed=0, n=3000):
+    rng = np.random.default_rng(seed)
+    sets = rng.integers(1, 9, size=n)
+    hi = np.where(sets == 8, 60, np.where(sets <= 2, 6, 3))
+    true = rng.integers(0, hi + 1)
+    pred = np.clip(true + rng.integers(-2, 3, size=n), 0, hi)
+    return true, pred, sets
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_point_estimate_matches_legacy_exactly(seed):
+    rng = np.random.default_rng(seed)
+    t = rng.integers(2, 12, size=500)
+    p = np.clip(t + rng.integers(-3, 4, size=500), 0, 14)
+    assert quadratic_weighted_kappa(t, p) == legacy_qwk(t, p)
+    assert quadratic_weighted_kappa(t, p, 0, 20) == legacy_qwk(t, p, 0, 20)
+
+
+def test_degenerate_inputs_match_legacy():
+    assert quadratic_weighted_kappa([3, 3, 3], [3, 3, 3]) == legacy_qwk([3, 3, 3], [3, 3, 3])
+    assert quadratic_weighted_kappa([1, 2], [2, 2]) == legacy_qwk([1, 2], [2, 2])
+    with pytest.raises(ValueError):
+        quadratic_weighted_kappa([1, 5], [1, 5], 1, 4)
+
+
+def test_batch_qwk_matches_single():
+    t, p, _ = _asap_like()
+    idx = np.random.default_rng(1).integers(0, t.size, size=(8, t.size))
+    Os = np.stack([confusion_matrix(t[i], p[i], 0, 60) for i in idx])
+    want = [quadratic_weighted_kappa(t[i], p[i], 0, 60) for i in idx]
+    np.testing.assert_allclose(_qwk_batch(Os), want, rtol=0, atol=1e-12)
+
+
+def test_bootstrap_point_estimates_and_breakdowns():
+    t, p, sets = _asap_like()
+    r = qwk_bootstrap(t, p, n_boot=400, groups=sets, seed=3)
+    assert r["qwk"] == legacy_qwk(t, p)
+    assert r["ci"][0] <= r["qwk"] <= r["ci"][1]
+    assert set(r["by_group"]) == set(np.unique(sets).tolist())
+    for g, entry in r["by_group"].items():
+        m = sets == g
+        assert entry["n"] == int(m.sum())
+        assert entry["qwk"] == legacy_qwk(t[m], p[m])
+        assert entry["ci"][0] <= entry["qwk"] <= entry["ci"][1]
+    for band, entry in r["by_band"].items():
+        m = t == band
+        assert entry["n"] == int(m.sum())
+        assert entry["exact"] == pytest.approx(np.mean(p[m] == band))
+        assert entry["within1"] == pytest.approx(np.mean(np.abs(p[m] - band) <= 1))
+        assert entry["bias"] == pytest.approx(np.mean(p[m] - band))
+
+
+def test_bootstrap_is_seeded_and_batch_size_independent():
+    t, p, sets = _asap_like(seed=2, n=800)
+    a = qwk_bootstrap(t, p, n_boot=300, groups=sets, seed=5, batch=300)
+    b = qwk_bootstrap(t, p, n_boot=300, groups=sets, seed=5, batch=300)
+    assert a == b
+    c = qwk_bootstrap(t, p, n_boot=300, seed=5, batch=64)
+    assert c["qwk"] == a["qwk"] and c["by_group"] == {}
+
+
+def test_multinomial_bootstrap_matches_index_resampling():
+    t, p, _ = _asap_like(seed=4, n=1500)
+    rng = np.random.default_rng(0)
+    idx = rng.integers(0, t.size, size=(2000, t.size))
+    ref = [quadratic_weighted_kappa(t[i], p[i], 0, 60) for i in idx]
+    r = qwk_bootstrap(t, p, n_boot=2000, seed=1, min_rating=0, max_rating=60)
+    assert r["std"] == pytest.approx(np.std(ref), rel=0.15)
+    np.testing.assert_allclose(r["ci"], np.percentile(ref, [2.5, 97.5]), atol=3 * np.std(ref) / 10)
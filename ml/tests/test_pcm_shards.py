@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+import soundfile as sf
+
+from audio_source import load_audio
+from pcm_shards import PcmShards, pack_manifest
+
+
+@pytest.fixture()
+def manifest(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(7):
+        wav = tmp_path / f"u{i}.wav"
+        sf.write(wav, (0.1 * rng.standard_normal(4000 + 1000 * i)).astype(np.float32), 22050, subtype="PCM_16")
+        rows.append({"audio_path": str(wav), "transcript": f"utt {i}" if i % 3 else None})
+    rows.append({"audio_path": str(tmp_path / "missing.wav"), "transcript": "gone"})
+    path = tmp_path / "manifest.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path, rows
+
+
+def test_pack_roundtrip_random_and_sequential(tmp_path, manifest):
+    path, rows = manifest
+    info = pack_manifest(path, tmp_path / "pack", shard_mb=0.02)
+    assert len(info["shards"]) > 2 and info["errors"] == 1
+    ds = PcmShards(tmp_path / "pack")
+    assert len(ds) == len(rows)
+    for i, row in enumerate(rows[:-1]):
+        y, meta = ds[i]
+        np.testing.assert_array_equal(y, load_audio(row["audio_path"], sr=16000)[0])
+        assert meta["transcript"] == (row["transcript"] or "")
+    y, meta = ds[-1]
+    assert y is None and "error" in meta
+    seq = [meta["audio_path"] for _, meta in ds.iter_utterances()]
+    assert seq == [r["audio_path"] for r in rows]
+
+
+def test_parts_split_shards_without_overlap(tmp_path, manifest):
+    path, rows = manifest
+    pack_manifest(path, tmp_path / "pack", shard_mb=0.02, dtype="int16")
+    ds = PcmShards(tmp_path / "pack")
+    parts = [[m["audio_path"] for _, m in ds.iter_utterances(k, 3)] for k in range(3)]
+    assert sorted(sum(parts, [])) == sorted(r["audio_path"] for r in rows)
+    ref = load_audio(rows[0]["audio_path"], sr=16000)[0]
+    assert np.abs(ds[0][0] - ref).max() <= 1 / 32767
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from request_profile import ID_HEADER, ProfileMiddleware, ProfileStore, RequestProfile, follow_thread
+
+
+def _busy_leaf(seconds):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        np.sort(np.random.default_rng(0).random(20000))
+
+
+def _alloc(n):
+    return [bytearray(1024) for _ in range(n)]
+
+
+def test_sample_mode_collapsed_stacks_and_tracemalloc():
+    with RequestProfile("sample", interval_s=0.001) as prof:
+        _busy_leaf(0.15)
+        keep = _alloc(2000)
+    assert prof.meta["samples"] > 20
+    lines = prof.collapsed().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("_busy_leaf (test_request_profile.py" in line for line in lines)
+    mem = prof.meta["tracemalloc"]
+    assert mem["peak_kib"] >= 2000 and mem["retained_kib"] >= 2000
+    assert any("test_request_profile.py" in s["where"] for s in mem["top_retained"])
+    del keep
+
+
+def test_cprofile_mode_top_functions():
+    with RequestProfile("cprofile") as prof:
+        _busy_leaf(0.05)
+    names = [r["function"] for r in prof.meta["top_cumulative"]]
+    assert any(n.startswith("_busy_leaf") for n in names)
+    assert prof.pstats_bytes() and prof.collapsed() == ""
+
+
+def _offloaded(seconds):
+    with follow_thread():
+        _busy_leaf(seconds)
+
+
+def test_follow_thread_covers_to_thread_work():
+    async def handler():
+        await asyncio.to_thread(_offloaded, 0.1)
+
+    for mode in ("sample", "cprofile"):
+        with RequestProfile(mode, interval_s=0.001) as prof:
+            asyncio.run(handler())
+        if mode == "sample":
+            assert "_offloaded (test_request_profile.py" in prof.collapsed()
+        else:
+            # 主執行緒的 profiler 看不到 _busy_leaf，出現就表示工作執行緒的 profile 有合併進來
+            assert any(r["function"].startswith("_busy_leaf") for r in prof.meta["top_cumulative"])
+
+
+async def _app(scope, receive, send):
+    _busy_leaf(0.02)
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _call(mw, path, headers):
+    sent = []
+
+    async def send(msg):
+        sent.append(msg)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    asyncio.run(mw(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+
+def test_middleware_only_profiles_tokened_requests(tmp_path):
+    store = ProfileStore(tmp_path, keep=2)
+    mw = ProfileMiddleware(_app, token="s3cret", store=store, interval_s=0.001)
+
+    assert ID_HEADER not in _call(mw, "/score/writing", [])
+    assert ID_HEADER not in _call(mw, "/score/writing", [(b"x-profile", b"nope")])
+    assert ID_HEADER not in _call(mw, "/health", [(b"x-profile", b"s3cret")])
+    assert not list(tmp_path.iterdir())
+
+    pid = _call(mw, "/score/speaking", [(b"x-profile", b"s3cret")])[ID_HEADER].decode()
+    meta = json.loads(store.path(pid, ".json").read_text())
+    assert meta["path"] == "/score/speaking" and meta["status"] == 200 and meta["mode"] == "sample"
+    assert store.path(pid, ".folded") is not None
+    assert store.path("../" + pid, ".json") is None
+
+    for _ in range(3):
+        _call(mw, "/score/writing", [(b"x-profile", b"s3cret"), (b"x-profile-mode", b"cprofile")])
+        time.sleep(0.01)
+    assert len(list(tmp_path.glob("*.json"))) == 2
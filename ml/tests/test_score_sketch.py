@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from band_lut import lut_index
+from score_sketch import QuantileSketch, load_merged
+
+PS = np.linspace(0, 1, 41)
+
+
+def _scores(seed, n):
+    return np.random.default_rng(seed).beta(2, 3, size=n)
+
+
+def test_quantiles_match_numpy_on_grid_values():
+    xs = _scores(0, 20000)
+    sk = QuantileSketch()
+    sk.add_many(xs)
+    on_grid = lut_index(xs, sk.bins) / (sk.bins - 1)
+    np.testing.assert_allclose(sk.quantiles(PS), np.quantile(on_grid, PS), rtol=0, atol=1e-12)
+    assert np.abs(sk.quantiles(PS) - np.quantile(xs, PS)).max() <= 0.5 / (sk.bins - 1) + 1e-12
+
+
+def test_add_and_add_many_agree_and_skip_nan():
+    xs = np.concatenate([_scores(1, 500), [np.nan, -0.2, 1.7]])
+    a, b = QuantileSketch(), QuantileSketch()
+    a.add_many(xs)
+    for x in xs:
+        b.add(x)
+    np.testing.assert_array_equal(a.counts, b.counts)
+    assert a.n == 502
+
+
+def test_merge_is_order_independent():
+    parts = [_scores(s, 1000 * (s + 1)) for s in range(4)]
+    whole = QuantileSketch()
+    whole.add_many(np.concatenate(parts))
+    sketches = []
+    for p in parts:
+        sk = QuantileSketch()
+        sk.add_many(p)
+        sketches.append(sk)
+    fwd, rev = QuantileSketch(), QuantileSketch()
+    for sk in sketches:
+        fwd.merge(sk)
+    for sk in reversed(sketches):
+        rev.merge(sk)
+    np.testing.assert_array_equal(fwd.counts, whole.counts)
+    np.testing.assert_array_equal(rev.counts, whole.counts)
+
+
+def test_snapshots_merge_from_directory(tmp_path):
+    for s in range(3):
+        sk = QuantileSketch()
+        sk.add_many(_scores(s, 300))
+        sk.save(tmp_path / f"worker-{s}.npz")
+    merged = load_merged([tmp_path])
+    assert merged.n == 900
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(bins=101))
+    (tmp_path / "empty").mkdir()
+    with pytest.raises(FileNotFoundError):
+        load_merged([tmp_path / "empty"])
@@ -0,0 +1,41 @@
+import asyncio
+
+import numpy as np
+import soundfile as sf
+
+from audio_ingest import IngestedAudio, sniff_header
+from speaking_pool import SpeakingPool, extract_part
+
+
+def test_pool_results_match_in_process_extraction(tmp_path):
+    parts = []
+    for i, seconds in enumerate((1.0, 2.0)):
+        t = np.arange(int(seconds * 16000)) / 16000
+        path = tmp_path / f"p{i}.wav"
+        sf.write(path, (0.2 * np.sin(2 * np.pi * (120 + 40 * i) * t)).astype(np.float32), 16000)
+        parts.append((IngestedAudio(str(path), sniff_header(path.read_bytes())), "um so well"))
+    parts.append((IngestedAudio(str(tmp_path / "missing.wav"), None), None))
+
+    pool = SpeakingPool(workers=2)
+    try:
+        results = asyncio.run(pool.map(parts))
+    finally:
+        pool.shutdown()
+
+    for (audio, text), (res, err, ms, _) in zip(parts[:2], results):
+        ref, _ = extract_part(audio, text)
+        assert err is None and "decode" in ms and ms["total"] > 0
+        assert res[0]["duration_s"] == ref[0]["duration_s"]
+        assert res[1] == ref[1]
+    res, err, _, _ = results[2]
+    assert err and np.isnan(res[0]["duration_s"])
+
+
+def test_shutdown_of_a_broken_pool_leaves_a_newer_pool_alone():
+    pool = SpeakingPool(workers=1)
+    old = pool._executor()
+    pool.shutdown(if_pool=old)  # 第一個看到 BrokenProcessPool 的 part
+    new = pool._executor()       # 下一個 submit 重建
+    pool.shutdown(if_pool=old)  # 晚到、還在處理舊錯誤的 part
+    assert new is not old and pool._executor() is new
+    pool.shutdown()
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import numpy as np
+
+from speech_features import extract_features_from_signal
+from stage_timer import current, server_timing, stage, timing_scope
+
+
+def test_stages_accumulate_and_noop_outside_scope():
+    with stage("decode"):  # 沒有作用中的 timer：什麼都不記
+        pass
+    assert current() is None
+    with timing_scope() as t:
+        for _ in range(2):
+            with stage("features"):
+                time.sleep(0.01)
+        with stage("fusion"):
+            pass
+    assert current() is None
+    assert list(t.ms) == ["features", "fusion"] and t.ms["features"] >= 20
+    snap = t.snapshot()
+    assert snap["total"] >= snap["features"]
+    assert server_timing({"decode": 1.234, "total": 5}) == "decode;dur=1.23, total;dur=5.00"
+
+
+def test_concurrent_requests_do_not_share_timers():
+    async def request(name, delay):
+        with timing_scope() as t:
+            with stage(name):
+                await asyncio.sleep(delay)
+            await asyncio.to_thread(_in_thread)
+        return t.ms
+
+    def _in_thread():
+        with stage("thread"):
+            pass
+
+    async def main():
+        return await asyncio.gather(request("a", 0.02), request("b", 0.01))
+
+    a, b = asyncio.run(main())
+    assert set(a) == {"a", "thread"} and set(b) == {"b", "thread"}
+
+
+def test_speech_features_report_their_stages():
+    y = (0.1 * np.sin(2 * np.pi * 150 * np.arange(16000) / 16000)).astype(np.float32)
+    with timing_scope() as t:
+        extract_features_from_signal(y, 16000, "um hello there")
+    assert {"features", "bootstrap"} <= set(t.ms)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import soundfile as sf
+
+from disfluency import scan
+from synth_corpus import ASAP_SETS, SpeechSpec, synth_essays, synth_speech, write_speech_corpus
+
+
+def test_essays_are_reproducible_and_in_asap_ranges():
+    a = synth_essays(120, seed=3)
+    b = synth_essays(40, seed=3)
+    pd.testing.assert_frame_equal(a.iloc[:40], b)  # 與總筆數無關
+    assert list(a.columns) == ["essay_id", "essay_set", "essay", "domain1_score"]
+    for s, g in a.groupby("essay_set"):
+        lo, hi, _ = ASAP_SETS[s]
+        assert g["domain1_score"].between(lo, hi).all()
+    assert not synth_essays(40, seed=4)["essay"].equals(b["essay"])
+
+
+def test_speech_duration_pauses_and_fillers():
+    spec = SpeechSpec(duration_s=6.0, filler_rate=0.3, repair_rate=0.0, pause_s=(0.5, 0.6))
+    y, text = synth_speech(spec, seed=1)
+    assert y.dtype == np.float32 and len(y) == 6 * spec.sr
+    y2, text2 = synth_speech(spec, seed=1)
+    np.testing.assert_array_equal(y, y2)
+    assert text == text2
+    stats = scan(text).stats()
+    assert stats["filler_count"] > 0 and stats["words"] > 5
+    # 短語間至少一段 ≥0.5 s 的安靜區
+    frame = spec.sr // 100
+    quiet = np.abs(y[: len(y) // frame * frame]).reshape(-1, frame).max(axis=1) < 0.03
+    runs = np.diff(np.flatnonzero(np.diff(np.r_[0, quiet.astype(int), 0])))[::2]
+    assert runs.max() >= 50
+
+
+def test_speech_manifest_matches_batch_score_format(tmp_path):
+    manifest = write_speech_corpus(tmp_path, 3, SpeechSpec(duration_s=2.0), seed=0, duration_range=(1.0, 2.0))
+    df = pd.read_csv(manifest)
+    assert list(df.columns) == ["audio_path", "transcript"] and len(df) == 3
+    for path in df["audio_path"]:
+        info = sf.info(path)
+        assert info.samplerate == 16000 and info.channels == 1 and 1.0 <= info.duration <= 2.0
@@ -0,0 +1,121 @@
+# tools/bench_disfluency.py
+"""
+disfluency 掃描：舊版（多次 regex）與 disfluency.scan（單次分詞 + token Aho–Corasick）的比較。
+
+- 先檢查兩者在合成逐字稿上的計數完全相同
+- 再量 1k–10k 字逐字稿的單次掃描時間，以及「一次請求」（extract_features 1 次 + bootstrap 8 次）的總時間
+
+用法（在 ml/ 底下）：
+  python tools/bench_disfluency.py --words 1000,2000,5000,10000
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from disfluency import scan  # noqa: E402
+
+_VOCAB = ("the i think that people should a lot of and so because my city it is was we they "
+          "really very good important when school time work family friends go to in on").split()
+_DISFL = ["um", "uh", "er", "ah", "hmm", "you know", "kinda", "kind of", "sorta", "like", "I mean",
+          "well", "sorry", "no, I mean", "let me", "actually", "Um,", "I I", "the the", "and-and"]
+
+_LEGACY_FILLER_RE = re.compile("|".join([
+    r"\bum\b", r"\buh\b", r"\ber\b", r"\bah\b", r"\bhmm\b",
+    r"\byou know\b", r"\bkinda\b", r"\bkind of\b", r"\bsorta\b",
+    r"\blik[e]?\b", r"\bi mean\b", r"\bwell\b",
+]), flags=re.I)
+
+
+def legacy_disfluency_stats(transcript):
+    """舊版 speech_features._disfluency_stats（原封不動）。"""
+    if not transcript:
+        return {"filler_count": 0, "self_repair_count": 0, "words": 0,
+                "filler_per_100w": 0.0, "self_repair_per_100w": 0.0}
+    t = transcript.strip()
+    words = re.findall(r"[A-Za-z']+", t)
+    n_words = len(words)
+    filler_count = len(_LEGACY_FILLER_RE.findall(t))
+    toks = [w.lower() for w in words]
+    rep = sum(1 for i in range(1, len(toks)) if toks[i] == toks[i-1])
+    edit_phrases = re.findall(r"\b(sorry|i mean|no[, ]+i mean|let me|i mean|actually)\b", t, flags=re.I)
+    self_repair = rep + len(edit_phrases)
+    per100 = lambda c: (c * 100.0 / max(1, n_words))
+    return {
+        "filler_count": float(filler_count),
+        "self_repair_count": float(self_repair),
+        "words": float(n_words),
+        "filler_per_100w": per100(filler_count),
+        "self_repair_per_100w": per100(self_repair),
+    }
+
+
+def synth_transcript(words: int, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    buf = []
+    while len(buf) < words:
+        r = rng.random()
+        if r < 0.08:
+            buf.append(str(rng.choice(_DISFL)))
+        else:
+            buf.append(str(rng.choice(_VOCAB)))
+        if rng.random() < 0.07:
+            buf[-1] += str(rng.choice([".", ",", "?", "..."]))
+    return " ".join(buf)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--words", default="1000,2000,5000,10000", help="逐字稿字數（逗號分隔）")
+    ap.add_argument("--check", type=int, default=300, help="計數一致性檢查的逐字稿數")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--bootstrap", type=int, default=8, help="每次請求的 bootstrap 次數（同 extract_features）")
+    args = ap.parse_args()
+
+    edge = ["", "   ", "Um... well, I mean, no, I mean the the cat.", "no. I mean it", "'um' like's kind, of",
+            "You know you know YOU KNOW", "I-I think, sorry, let me, actually"]
+    samples = edge + [synth_transcript(int(n), seed=i) for i, n in
+                      enumerate(np.random.default_rng(1).integers(5, 400, size=args.check))]
+    diffs = []
+    for t in samples:
+        a, b = legacy_disfluency_stats(t), scan(t).stats()
+        if any(float(a[k]) != b[k] for k in a):
+            diffs.append((t, a, b))
+    print(f"[CHECK] {len(samples)} 份逐字稿，計數不同：{len(diffs)}")
+    for t, a, b in diffs[:5]:
+        print(f"  {t[:60]!r}\n    legacy={a}\n    scan  ={b}")
+
+    print(f"{'words':>7} {'legacy ms':>10} {'scan ms':>9} {'speedup':>8} "
+          f"{'legacy/req ms':>14} {'scan/req ms':>12} {'speedup':>8}")
+    for n in (int(x) for x in args.words.split(",")):
+        t = synth_transcript(n, seed=n)
+        t_legacy = _best_of(lambda: legacy_disfluency_stats(t), args.repeat)
+        t_scan = _best_of(lambda: scan(t).stats(), args.repeat)
+
+        def legacy_request():
+            for _ in range(1 + args.bootstrap):
+                legacy_disfluency_stats(t)
+
+        r_legacy = _best_of(legacy_request, args.repeat)
+        r_scan = t_scan  # extract_features_from_signal 每次請求只掃描一次，bootstrap 共用結果
+        print(f"{n:>7} {t_legacy*1e3:>10.2f} {t_scan*1e3:>9.2f} {t_legacy/t_scan:>7.2f}x "
+              f"{r_legacy*1e3:>14.2f} {r_scan*1e3:>12.2f} {r_legacy/r_scan:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# tools/bench_import_time.py
+"""
+量測 ML CLI 的啟動成本（python -X importtime + 行程牆鐘時間）。
+
+情境：
+  score_cli_help    : src/score_cli.py --help
+  batch_score_help  : src/batch_score.py --help
+  score_cli_audio   : src/score_cli.py --audio <1 秒合成 wav>（純音檔路徑）
+
+每個情境都會檢查「不該被載入」的重量級套件（torch / sentence_transformers / xgboost / sklearn），
+並可存成 baseline（--save）或與 baseline 比較（--check，超過門檻回傳 exit code 1）。
+純音檔路徑的下限是 librosa 本身（librosa.core.audio 會載入 scipy.signal），
+因此牆鐘預算只套用在 *_help 情境，音檔情境只檢查禁止套件與 baseline 退步。
+
+用法（在 ml/ 底下）：
+  python tools/bench_import_time.py
+  python tools/bench_import_time.py --save
+  python tools/bench_import_time.py --check --threshold 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]  # -> ml/
+BASELINE = PROJECT_ROOT / "tools" / "bench_baselines" / "import_time.json"
+
+HEAVY = ("torch", "sentence_transformers", "transformers", "xgboost", "sklearn")
+# librosa.effects 會連帶載入 sklearn，音檔路徑只禁止文字模型相關套件
+AUDIO_HEAVY = ("torch", "sentence_transformers", "transformers", "xgboost")
+
+# 情境名稱 -> (argv, 不可出現的頂層套件)
+def _scenarios(wav_path: Path) -> dict[str, tuple[list[str], tuple[str, ...]]]:
+    return {
+        "score_cli_help": (["src/score_cli.py", "--help"], HEAVY + ("librosa",)),
+        "batch_score_help": (["src/batch_score.py", "--help"], HEAVY + ("librosa", "pandas")),
+        "score_cli_audio": (["src/score_cli.py", "--audio", str(wav_path)], AUDIO_HEAVY),
+    }
+
+def _write_test_wav(path: Path, seconds: float = 1.0, sr: int = 16000) -> None:
+    n = int(seconds * sr)
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * i / sr))) for i in range(n)
+    )
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(frames)
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """回傳 {頂層模組: cumulative_us}（只計 -X importtime 縮排第 0 層）。"""
+    top: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            _, cum, name = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level != 0:
+            continue
+        mod = name.strip()
+        top[mod] = top.get(mod, 0) + int(cum.strip())
+    return top
+
+def run_scenario(argv: list[str], forbidden: tuple[str, ...], repeat: int) -> dict:
+    walls, totals, tops = [], [], {}
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", *argv],
+            capture_output=True, text=True, cwd=str(PROJECT_ROOT),
+        )
+        walls.append(time.perf_counter() - t0)
+        tops = parse_importtime(proc.stderr)
+        totals.append(sum(tops.values()) / 1e6)
+    heavy_loaded = sorted(m for m in tops if m.split(".")[0] in forbidden)
+    heaviest = sorted(tops.items(), key=lambda kv: kv[1], reverse=True)[:8]
+    return {
+        "wall_s": round(min(walls), 4),
+        "import_s": round(min(totals), 4),
+        "forbidden_loaded": heavy_loaded,
+        "top_imports_ms": {k: round(v / 1000, 1) for k, v in heaviest},
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3, help="每個情境跑幾次（取最小值）")
+    ap.add_argument("--save", action="store_true", help=f"寫入 baseline：{BASELINE}")
+    ap.add_argument("--check", action="store_true", help="與 baseline 比較，退步即 exit 1")
+    ap.add_argument("--threshold", type=float, default=0.25, help="允許的相對退步（0.25 = +25%%）")
+    ap.add_argument("--min-delta-s", type=float, default=0.1, help="小於此絕對差距不算退步（避免雜訊）")
+    ap.add_argument("--budget-s", type=float, default=1.0, help="--help 情境的牆鐘上限（秒）")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        wav = Path(td) / "bench_1s.wav"
+        _write_test_wav(wav)
+        results = {name: run_scenario(argv, forbidden, args.repeat)
+                   for name, (argv, forbidden) in _scenarios(wav).items()}
+
+    print(f"{'scenario':<18} {'wall_s':>8} {'import_s':>9}  forbidden")
+    for name, r in results.items():
+        print(f"{name:<18} {r['wall_s']:>8.3f} {r['import_s']:>9.3f}  {','.join(r['forbidden_loaded']) or '-'}")
+
+    if args.save:
+        BASELINE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE.write_text(json.dumps({"python": sys.version.split()[0], "scenarios": results},
+                                       ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[OK] baseline -> {BASELINE}")
+
+    if args.check:
+        failures = []
+        base = {}
+        if BASELINE.exists():
+            base = json.loads(BASELINE.read_text(encoding="utf-8")).get("scenarios", {})
+        for name, r in results.items():
+            if r["forbidden_loaded"]:
+                failures.append(f"{name}: 載入了 {r['forbidden_loaded']}")
+            if name.endswith("_help") and r["wall_s"] > args.budget_s:
+                failures.append(f"{name}: wall {r['wall_s']:.3f}s > budget {args.budget_s:.3f}s")
+            ref = base.get(name)
+            if ref and r["import_s"] > ref["import_s"] * (1 + args.threshold) \
+                    and r["import_s"] - ref["import_s"] > args.min_delta_s:
+                failures.append(f"{name}: import {r['import_s']:.3f}s vs baseline {ref['import_s']:.3f}s")
+        if failures:
+            for f in failures:
+                print(f"[REGRESSION] {f}", file=sys.stderr)
+            sys.exit(1)
+        print("[OK] 無退步")
+
+if __name__ == "__main__":
+    main()
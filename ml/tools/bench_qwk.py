@@ -0,0 +1,92 @@
+# tools/bench_qwk.py
+"""
+QWK：舊版逐筆迴圈 vs bincount 版；以及 2000 次 bootstrap（舊做法 = 逐次抽 index 再算 QWK）。
+
+用法（在 ml/ 底下）：
+  python tools/bench_qwk.py --n 1800 --boot 2000
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from metrics import quadratic_weighted_kappa, qwk_bootstrap  # noqa: E402
+
+
+def legacy_qwk(y_true, y_pred, min_rating=None, max_rating=None):
+    """舊版 metrics.quadratic_weighted_kappa（原封不動）。"""
+    y_true = np.asarray(y_true, dtype=int)
+    y_pred = np.asarray(y_pred, dtype=int)
+    if min_rating is None:
+        min_rating = int(min(y_true.min(), y_pred.min()))
+    if max_rating is None:
+        max_rating = int(max(y_true.max(), y_pred.max()))
+    n = max_rating - min_rating + 1
+    O = np.zeros((n, n), dtype=float)
+    for a, b in zip(y_true, y_pred):
+        O[a - min_rating, b - min_rating] += 1.0
+    act_hist = O.sum(axis=1)
+    pred_hist = O.sum(axis=0)
+    E = np.outer(act_hist, pred_hist) / max(1.0, O.sum())
+    if n > 1:
+        W = np.fromfunction(lambda i, j: ((i - j) ** 2) / ((n - 1) ** 2), (n, n))
+    else:
+        W = np.zeros((1, 1), dtype=float)
+    num = (W * O).sum()
+    den = (W * E).sum()
+    return 1.0 - num / den if den > 0 else 0.0
+
+
+def synth(n: int, seed: int = 0):
+    """ASAP 驗證集的形狀：8 個 essay_set，set 8 的分數範圍 0..60。"""
+    rng = np.random.default_rng(seed)
+    sets = rng.integers(1, 9, size=n)
+    hi = np.where(sets == 8, 60, np.where(sets <= 2, 6, 3))
+    true = rng.integers(0, hi + 1)
+    pred = np.clip(true + rng.integers(-2, 3, size=n), 0, hi)
+    return true, pred, sets
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1800, help="驗證集大小（ASAP 20% ≈ 2600）")
+    ap.add_argument("--boot", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    t, p, sets = synth(args.n)
+    assert quadratic_weighted_kappa(t, p) == legacy_qwk(t, p)
+    print(f"[OK] 點估計與舊版完全相同：QWK={legacy_qwk(t, p):.6f}")
+
+    t_old = _best_of(lambda: legacy_qwk(t, p), args.repeat)
+    t_new = _best_of(lambda: quadratic_weighted_kappa(t, p), args.repeat)
+    print(f"single QWK      legacy {t_old*1e3:8.2f} ms   bincount {t_new*1e3:8.2f} ms   {t_old/t_new:6.1f}x")
+
+    rng = np.random.default_rng(0)
+    n_loop = max(1, args.boot // 20)  # 舊做法太慢，量 1/20 再外推
+    t0 = time.perf_counter()
+    for _ in range(n_loop):
+        i = rng.integers(0, t.size, size=t.size)
+        legacy_qwk(t[i], p[i])
+    t_loop = (time.perf_counter() - t0) * args.boot / n_loop
+    t_boot = _best_of(lambda: qwk_bootstrap(t, p, n_boot=args.boot, groups=sets), args.repeat)
+    print(f"{args.boot} bootstraps legacy {t_loop*1e3:8.0f} ms*  batched  {t_boot*1e3:8.1f} ms   "
+          f"{t_loop/t_boot:6.1f}x   (* 外推；batched 另含 8 個 essay_set 與各 band 的 CI)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+# tools/bench_stages.py
+"""
+評分流程各階段的微基準（src/synth_corpus.py 的合成輸入、多種大小），結果存成 JSON baseline，並可比較兩份結果抓退步。
+
+階段（名稱[大小]）：
+  text_features[w100|w300|w1000]        單篇作文的手工特徵（API 的 _simple_text_feats 已併入 text_features）
+  embed_encode[b1|b8|b64]                SentenceTransformer.encode，批次 1/8/64（模型不在本機快取時略過）
+  xgb_predict[r1|r64|r1024]              XGBRegressor.predict（訓練參數同 train_writing_baseline，384+6 維）
+  librosa_load[5s|30s|120s]              librosa.load 22.05 kHz wav → 16 kHz mono
+  compute_base_features[5s|30s|60s]      speech_features._compute_base_features
+  bootstrap_uncert[5s|30s]               speech_features._bootstrap_uncert（n=8）
+  disfluency_stats[w100|w1000|w10000]    speech_features._disfluency_stats（每次都真的掃描）
+  fuse_scores[all|no_content]            api.app._fuse_scores（api 的依賴不齊時略過）
+  quantile_map[n1k|n10k|n100k]           calibrate_band.quantile_map（預設 quantile spec）
+  qwk[n1800|n10k|n100k]                  metrics.quadratic_weighted_kappa
+
+每個案例先自動決定迴圈次數（單輪 ≥ --min-time 秒），再重複 --repeat 輪，取每次呼叫的最小值與中位數；
+比較時用最小值（受背景雜訊影響最小），相對退步超過 --threshold 且絕對差距超過 --min-delta-us 才算退步。
+
+用法（在 ml/ 底下）：
+  python tools/bench_stages.py run                        # 全部跑一次，印表格
+  python tools/bench_stages.py run -k speech --save       # 只跑名稱含 speech 的，寫入 baseline（合併既有項目）
+  python tools/bench_stages.py run --check                # 與 baseline 比較，退步即 exit 1
+  python tools/bench_stages.py run --out /tmp/new.json
+  python tools/bench_stages.py compare tools/bench_baselines/stages.json /tmp/new.json --threshold 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import functools
+import json
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]  # -> ml/
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+sys.path.insert(0, str(PROJECT_ROOT / "tools"))
+from synth_corpus import SpeechSpec, synth_essay, synth_speech  # noqa: E402
+
+BASELINE = PROJECT_ROOT / "tools" / "bench_baselines" / "stages.json"
+
+SR = 16000
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+QUANTILE_SPEC = "4.0:0.05,4.5:0.10,5.0:0.20,5.5:0.35,6.0:0.55,6.5:0.70,7.0:0.85,7.5:0.93,8.0:0.97,8.5:0.99,9.0:1.00"
+
+
+class Skip(Exception):
+    """案例在這個環境跑不了（缺套件 / 缺模型），記錄原因後略過。"""
+
+
+# 名稱 -> (大小清單, setup(size) -> 無參數的待測函式)
+CASES: Dict[str, Tuple[Tuple[str, ...], Callable[[str], Callable[[], object]]]] = {}
+
+
+def case(name: str, sizes: Tuple[str, ...]):
+    def deco(setup):
+        CASES[name] = (sizes, setup)
+        return setup
+    return deco
+
+
+def _num(size: str) -> int:
+    """'w300' → 300、'n10k' → 10000、'30s' → 30。"""
+    m = re.fullmatch(r"[a-z]*(\d+)(k?)s?", size)
+    return int(m.group(1)) * (1000 if m.group(2) else 1)
+
+
+# -----------------------------
+# 合成輸入
+# -----------------------------
+def _essay(words: int, seed: int = 0) -> str:
+    """恰好 words 個詞的合成作文。"""
+    toks = synth_essay(np.random.default_rng([seed, words]), words).split()
+    return " ".join(toks[:words])
+
+
+@functools.lru_cache(maxsize=None)
+def _speech(seconds: int, sr: int = SR) -> Tuple[np.ndarray, str]:
+    """(訊號, 逐字稿)：synth_corpus 的預設語速 / 停頓 / 音高曲線 / filler。"""
+    return synth_speech(SpeechSpec(duration_s=seconds, sr=sr), seed=0, index=seconds)
+
+
+@functools.lru_cache(maxsize=None)
+def _tmpdir() -> Path:
+    d = Path(tempfile.mkdtemp(prefix="bench_stages_"))
+    atexit.register(shutil.rmtree, d, True)
+    return d
+
+
+# -----------------------------
+# 案例
+# -----------------------------
+@case("text_features", ("w100", "w300", "w1000"))
+def _text_features(size):
+    from text_features import MODEL_FEATURES, text_features
+    texts = [_essay(_num(size))]
+    return lambda: text_features(texts, MODEL_FEATURES)
+
+
+@functools.lru_cache(maxsize=None)
+def _embedder():
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise Skip(f"sentence_transformers 未安裝（{e}）")
+    try:
+        return SentenceTransformer(EMBED_MODEL, local_files_only=True)
+    except Exception as e:
+        raise Skip(f"{EMBED_MODEL} 不在本機快取（{type(e).__name__}）")
+
+
+@case("embed_encode", ("b1", "b8", "b64"))
+def _embed_encode(size):
+    model = _embedder()
+    texts = [_essay(300, seed=i) for i in range(_num(size))]
+    return lambda: model.encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _xgb_model():
+    from xgboost import XGBRegressor
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((1000, 390)).astype(np.float32)
+    y = np.clip(0.5 + 0.1 * X[:, :8].sum(axis=1), 0, 1)
+    # 同 train_writing_baseline.DEFAULT_PARAMS（直接 import 會在 cwd 建 artifacts/）
+    m = XGBRegressor(n_estimators=600, max_depth=6, learning_rate=0.05, subsample=0.9, colsample_bytree=0.9,
+                     reg_lambda=1.0, tree_method="hist", random_state=42)
+    m.fit(X, y)
+    return m
+
+
+@case("xgb_predict", ("r1", "r64", "r1024"))
+def _xgb_predict(size):
+    m = _xgb_model()
+    X = np.random.default_rng(1).standard_normal((_num(size), 390)).astype(np.float32)
+    return lambda: m.predict(X)
+
+
+@case("librosa_load", ("5s", "30s", "120s"))
+def _librosa_load(size):
+    import librosa
+    import soundfile as sf
+    path = _tmpdir() / f"speech_{size}.wav"
+    if not path.exists():
+        src, _ = _speech(_num(size), sr=22050)
+        sf.write(str(path), src, 22050, subtype="PCM_16")
+    return lambda: librosa.load(str(path), sr=SR, mono=True)
+
+
+@case("compute_base_features", ("5s", "30s", "60s"))
+def _compute_base(size):
+    from speech_features import _compute_base_features, _disfluency_stats
+    y, text = _speech(_num(size))
+    dis = _disfluency_stats(text)
+    return lambda: _compute_base_features(y, SR, text, 35, dis)
+
+
+@case("bootstrap_uncert", ("5s", "30s"))
+def _bootstrap(size):
+    from speech_features import _bootstrap_uncert, _disfluency_stats
+    y, text = _speech(_num(size))
+    dis = _disfluency_stats(text)
+    return lambda: _bootstrap_uncert(y, SR, text, 35, n=8, dis=dis)
+
+
+@case("disfluency_stats", ("w100", "w1000", "w10000"))
+def _disfluency(size):
+    from bench_disfluency import synth_transcript
+    from speech_features import _disfluency_stats
+    text = synth_transcript(_num(size))
+    return lambda: _disfluency_stats(text)
+
+
+@case("fuse_scores", ("all", "no_content"))
+def _fuse(size):
+    try:
+        sys.path.insert(0, str(PROJECT_ROOT))
+        from api.app import _fuse_scores
+    except ImportError as e:
+        raise Skip(f"api.app 無法載入（{e}）")
+    args = (0.62, 0.55, 0.71) if size == "all" else (None, 0.55, 0.71)
+    return lambda: _fuse_scores(*args)
+
+
+@case("quantile_map", ("n1k", "n10k", "n100k"))
+def _quantile(size):
+    from calibrate_band import parse_quantile_spec, quantile_map
+    pairs = parse_quantile_spec(QUANTILE_SPEC)
+    overall = np.random.default_rng(0).beta(5, 3, size=_num(size))
+    return lambda: quantile_map(overall, pairs)
+
+
+@case("qwk", ("n1800", "n10k", "n100k"))
+def _qwk(size):
+    from bench_qwk import synth
+    from metrics import quadratic_weighted_kappa
+    t, p, _ = synth(_num(size))
+    return lambda: quadratic_weighted_kappa(t, p)
+
+
+# -----------------------------
+# 量測
+# -----------------------------
+def measure(fn: Callable[[], object], min_time: float, repeat: int) -> dict:
+    fn()  # 暖機（lazy import、快取、JIT 之類）
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or number >= 1 << 20:
+            break
+        number = max(number * 2, int(number * min_time / max(dt, 1e-9) * 1.1))
+    runs = [dt / number]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - t0) / number)
+    return {"min_us": round(min(runs) * 1e6, 3), "median_us": round(statistics.median(runs) * 1e6, 3),
+            "number": number, "repeat": repeat}
+
+
+def run_cases(pattern: str, min_time: float, repeat: int) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    results, skipped = {}, {}
+    rx = re.compile(pattern) if pattern else None
+    for name, (sizes, setup) in CASES.items():
+        for size in sizes:
+            key = f"{name}[{size}]"
+            if rx and not rx.search(key):
+                continue
+            try:
+                results[key] = measure(setup(size), min_time, repeat)
+            except Skip as e:
+                skipped[key] = str(e)
+                continue
+            r = results[key]
+            print(f"{key:<34} {_fmt(r['min_us']):>10} {_fmt(r['median_us']):>10} {r['number']:>8}x{r['repeat']}",
+                  flush=True)
+    return results, skipped
+
+
+def _fmt(us: float) -> str:
+    if us >= 1e6:
+        return f"{us / 1e6:.2f} s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f} ms"
+    return f"{us:.1f} us"
+
+
+def environment() -> dict:
+    import os
+    return {"python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(base: Dict[str, dict], new: Dict[str, dict], threshold: float, min_delta_us: float) -> List[str]:
+    """印出逐案例比較，回傳退步清單（兩邊都有的案例才比）。"""
+    regressions = []
+    print(f"{'case':<34} {'baseline':>10} {'new':>10} {'ratio':>7}")
+    for key in sorted(set(base) | set(new)):
+        b, n = base.get(key), new.get(key)
+        if b is None or n is None:
+            print(f"{key:<34} {_fmt(b['min_us']) if b else '-':>10} {_fmt(n['min_us']) if n else '-':>10}")
+            continue
+        ratio = n["min_us"] / max(b["min_us"], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold and n["min_us"] - b["min_us"] > min_delta_us:
+            flag = "  REGRESSION"
+            regressions.append(f"{key}: {_fmt(n['min_us'])} vs baseline {_fmt(b['min_us'])} ({ratio:.2f}x)")
+        elif ratio < 1 / (1 + threshold):
+            flag = "  faster"
+        print(f"{key:<34} {_fmt(b['min_us']):>10} {_fmt(n['min_us']):>10} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def _load(path: Path) -> Dict[str, dict]:
+    return json.loads(Path(path).read_text(encoding="utf-8")).get("cases", {})
+
+
+def _report(regressions: List[str]) -> None:
+    if regressions:
+        for r in regressions:
+            print(f"[REGRESSION] {r}", file=sys.stderr)
+        sys.exit(1)
+    print("[OK] 無退步")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="評分流程各階段微基準")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="執行基準")
+    r.add_argument("-k", "--filter", default="", help="只跑名稱符合此 regex 的案例，例如 'speech|bootstrap'")
+    r.add_argument("--min-time", type=float, default=0.2, help="每輪至少跑幾秒（自動決定迴圈次數）")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--out", default="", help="把結果寫到這個 JSON")
+    r.add_argument("--save", action="store_true", help=f"合併寫入 baseline：{BASELINE}")
+    r.add_argument("--check", action="store_true", help="與 baseline 比較，退步即 exit 1")
+    r.add_argument("--baseline", default=str(BASELINE))
+
+    c = sub.add_parser("compare", help="比較兩份結果（old new）")
+    c.add_argument("old")
+    c.add_argument("new")
+
+    for p in (r, c):
+        p.add_argument("--threshold", type=float, default=0.25, help="允許的相對退步（0.25 = +25%%）")
+        p.add_argument("--min-delta-us", type=float, default=5.0, help="小於此絕對差距不算退步（避免雜訊）")
+    args = ap.parse_args()
+
+    if args.cmd == "compare":
+        _report(compare(_load(args.old), _load(args.new), args.threshold, args.min_delta_us))
+        return
+
+    print(f"{'case':<34} {'min':>10} {'median':>10} {'loops':>10}")
+    results, skipped = run_cases(args.filter, args.min_time, args.repeat)
+    for key, why in skipped.items():
+        print(f"{key:<34} skipped: {why}")
+    doc = {"env": environment(), "cases": results, "skipped": skipped}
+
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[OK] 結果 -> {args.out}")
+
+    baseline = Path(args.baseline)
+    if args.save:
+        old = json.loads(baseline.read_text(encoding="utf-8")) if baseline.exists() else {}
+        cases = {**old.get("cases", {}), **results}
+        left = {k: v for k, v in {**old.get("skipped", {}), **skipped}.items() if k not in cases}
+        baseline.parent.mkdir(parents=True, exist_ok=True)
+        baseline.write_text(json.dumps({"env": doc["env"], "cases": dict(sorted(cases.items())), "skipped": left},
+                                       ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[OK] baseline -> {baseline}")
+
+    if args.check:
+        if not baseline.exists():
+            sys.exit(f"[ERROR] 找不到 baseline：{baseline}（先跑 run --save）")
+        print()
+        _report(compare(_load(baseline), results, args.threshold, args.min_delta_us))
+
+
+if __name__ == "__main__":
+    main()
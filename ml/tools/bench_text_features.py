@@ -0,0 +1,100 @@
+# tools/bench_text_features.py
+"""
+text_features（批次版）與舊版逐篇迴圈的吞吐量比較（texts/s），並逐欄檢查數值完全相同。
+
+用法（在 ml/ 底下）：
+  python tools/bench_text_features.py --n 5000 --words 300
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from text_features import FEATURE_NAMES, MODEL_FEATURES, _stop_words, text_features  # noqa: E402
+
+_VOCAB = ("the a an of to and in is it that for on with as was at by this students school "
+          "technology government however therefore important believe people should because "
+          "Moreover Firstly children society environment").split()
+
+
+def synth_texts(n: int, words: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        toks = rng.choice(_VOCAB, size=int(rng.integers(max(1, words // 2), words * 2)))
+        buf = []
+        for i, t in enumerate(toks):
+            buf.append(str(t))
+            r = rng.random()
+            if r < 0.06:
+                buf.append(rng.choice([".", "!", "?", "...", ". ", "\n\n"]))
+            elif r < 0.08:
+                buf.append("  ")
+        out.append(" ".join(buf))
+    # 邊界案例：空字串、只有標點、全形空白、tab、非 ASCII（lower() 會改變長度的 İ）
+    out += ["", "...", "  !? ", "Hello　world.\tBye", "One. Two!! Three?", "İstanbul café. Naïve  résumé!"]
+    return out
+
+
+def legacy_simple_text_feats(text: str) -> np.ndarray:
+    """舊版 api/app.py、score_cli.py 的 _simple_text_feats（7 欄）。"""
+    stop = _stop_words()
+    words = text.split()
+    n_words = len(words)
+    n_chars = len(text)
+    avg_wlen = sum(len(w) for w in words) / max(1, n_words)
+    uniq_ratio = len(set(w.lower() for w in words)) / max(1, n_words)
+    sents = re.split(r"[.!?]+", text)
+    sents = [s.strip() for s in sents if s.strip()]
+    n_sents = max(1, len(sents))
+    avg_sent_len = n_words / n_sents
+    stop_cnt = sum(1 for w in words if w.lower() in stop)
+    stop_ratio = stop_cnt / max(1, n_words)
+    return np.array([n_words, n_chars, avg_wlen, uniq_ratio, n_sents, avg_sent_len, stop_ratio], dtype=float)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5000, help="文章數")
+    ap.add_argument("--words", type=int, default=300, help="平均字數")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = synth_texts(args.n, args.words)
+    _stop_words()  # 停用詞表的載入時間不算在迴圈內
+
+    legacy = np.vstack([legacy_simple_text_feats(t) for t in texts])
+    batch = text_features(texts)
+    for j, name in enumerate(FEATURE_NAMES):
+        if not np.array_equal(legacy[:, j], batch[:, j]):
+            bad = int(np.flatnonzero(legacy[:, j] != batch[:, j])[0])
+            raise SystemExit(f"[FAIL] {name} 不一致：text #{bad} legacy={legacy[bad, j]} batch={batch[bad, j]}")
+    print(f"[OK] {len(texts)} 篇 × {len(FEATURE_NAMES)} 欄與舊版逐位元相同")
+
+    n = len(texts)
+    t_legacy = _best_of(lambda: [legacy_simple_text_feats(t) for t in texts], args.repeat)
+    t_batch7 = _best_of(lambda: text_features(texts), args.repeat)
+    t_batch6 = _best_of(lambda: text_features(texts, MODEL_FEATURES), args.repeat)
+    print(f"{'impl':<24} {'texts/s':>12} {'speedup':>8}")
+    for name, t in (("legacy loop (7 feats)", t_legacy), ("batch (7 feats)", t_batch7),
+                    ("batch (model, 6 feats)", t_batch6)):
+        print(f"{name:<24} {n / t:>12,.0f} {t_legacy / t:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
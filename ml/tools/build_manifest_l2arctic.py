@@ -1,27 +1,38 @@
 # tools/build_manifest_l2arctic.py
+"""
+由 data/raw/l2arctic 建立 data/speaking_manifest.csv（audio_path,transcript）。
+
+- 每位說話者（BASE 底下的一個資料夾；--zip 模式則是一個 ZIP）是一個單位，
+  以 os.scandir 走一次，同時分出 wav 與逐字稿檔（txt/*.txt、txt.done.data、PROMPTS、*.prompts、text）。
+- 逐字稿以執行緒池平行讀取。
+- 每個單位的結果連同「所有子資料夾的 mtime」（ZIP 則是 size + mtime）存進 BASE/manifest_index.json；
+  重跑時先 stat 這些資料夾，沒變的說話者直接沿用，只重掃有變動的。
+  新增 / 刪除 / 改名檔案都會改到所在資料夾的 mtime；就地改寫檔案內容不會，請用 --full。
+- wav_index.txt 每次都依最新結果重寫，不會再有過期的索引。
+
+用法（在 ml/ 底下）：
+  python tools/build_manifest_l2arctic.py            # 增量
+  python tools/build_manifest_l2arctic.py --full     # 忽略 manifest_index.json 全部重掃
+  python tools/build_manifest_l2arctic.py --zip      # 不解壓，audio_path 寫成 zip:// URI
+"""
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import re, sys, zipfile
+import argparse, json, os, re, sys, time, zipfile
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from audio_source import read_text, zip_members, zip_uri  # noqa: E402
+from l2arctic_transcripts import DONE_DATA_RE, parse_txt_done_data  # noqa: E402
+
 BASE = Path("data/raw/l2arctic")
 INDEX = BASE / "wav_index.txt"
+SCAN_INDEX = BASE / "manifest_index.json"
+SCAN_VERSION = 1
+READ_CHUNK = 64
 OUT = Path("data") / "speaking_manifest.csv"
 
-def ensure_wav_index() -> list[Path]:
-    if INDEX.exists():
-        lines = [ln.strip() for ln in INDEX.read_text(encoding="utf-8").splitlines() if ln.strip()]
-        wavs = [Path(p) for p in lines]
-        if wavs:
-            return wavs
-    if not BASE.exists():
-        print(f"[ERROR] {BASE} 不存在。請先解壓 l2arctic_release_v5.0.zip。", file=sys.stderr); sys.exit(1)
-    wavs = sorted(BASE.rglob("*.wav"))
-    if not wavs:
-        print(f"[ERROR] 在 {BASE} 找不到任何 .wav。請先解開各說話者 ZIP（ABA.zip 等）。", file=sys.stderr); sys.exit(1)
-    INDEX.write_text("\n".join(str(p) for p in wavs), encoding="utf-8")
-    print(f"[INFO] 建立索引：{INDEX}（{len(wavs)} 筆）")
-    return wavs
+_PROMPT_RES = (DONE_DATA_RE, re.compile(r'^(\S+)\s+"(.+)"\s*$'), re.compile(r'^(\S+)\s+(.+)$'))
 
 def maybe_unzip_suitcase():
     z = BASE / "suitcase_corpus.zip"
@@ -32,90 +43,235 @@ def maybe_unzip_suitcase():
         with zipfile.ZipFile(z) as zf:
             zf.extractall(out)
 
-def collect_txt_dir_index() -> dict[str, str]:
-    """蒐集所有 txt 目錄中的逐句檔（*.txt）：key=stem 或 spk_stem。"""
-    idx: dict[str, str] = {}
-    txt_dirs = [p for p in BASE.rglob("txt") if p.is_dir()]
-    for td in txt_dirs:
-        # 嘗試猜 speaker 代碼（txt 目錄的上一層或上上層常是 <SPK>）
-        parts = td.parts
-        spk = ""
-        if parts:
-            spk = parts[-2] if len(parts) >= 2 else parts[-1]
-        for f in td.glob("*.txt"):
-            try:
-                text = f.read_text(encoding="utf-8", errors="ignore").strip()
-            except Exception:
-                text = ""
-            stem = f.stem
-            if text:
-                idx.setdefault(stem, text)
-                if spk:
-                    idx.setdefault(f"{spk}_{stem}", text)
-    return idx
-
-def collect_txt_done_and_prompts() -> dict[str, str]:
-    """蒐集 txt.done.data / PROMPTS / *.prompts / Kaldi-style text 檔的 (utt, text)。"""
-    mapping: dict[str, str] = {}
-    # 1) txt.done.data（CMU）：( utt_id "TEXT" )
-    for tdd in BASE.rglob("txt.done.data"):
-        # speaker 嘗試抓最近的資料夾名
-        parts = tdd.parts
+# -----------------------------
+# 檔案分類與逐字稿解析（路徑規則與解壓後的目錄結構相同）
+# -----------------------------
+# 路徑一律以字串處理（os.path），一次建置要碰幾萬個檔，pathlib 物件的成本比 I/O 還高。
+def _stem(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+def _ancestor(path: str, up: int) -> str:
+    """往上第 up 層資料夾的名稱（= Path(path).parts[-1 - up]）；層數不夠時回 ""。"""
+    for _ in range(up):
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+def transcript_kind(name: str, parent: str) -> str | None:
+    if parent == "txt" and name.endswith(".txt"):
+        return "txt"
+    if name == "txt.done.data":
+        return "done"
+    if name in ("PROMPTS", "text") or name.endswith(".prompts"):
+        return "prompts"
+    return None
+
+def parse_transcript(kind: str, path: str, content: str) -> list[tuple[str, str, str]]:
+    """回傳 [(索引, key, text)]；索引 "txt" = 逐句 txt 檔，"meta" = txt.done.data / PROMPTS 類。"""
+    out: list[tuple[str, str, str]] = []
+    if kind == "txt":
+        # speaker 代碼猜 txt 目錄的上一層（常是 <SPK>）
+        spk, stem = _ancestor(path, 2), _stem(path)
+        text = content.strip()
+        if text:
+            out.append(("txt", stem, text))
+            if spk:
+                out.append(("txt", f"{spk}_{stem}", text))
+    elif kind == "done":
+        # txt.done.data（CMU）：( utt_id "TEXT" )
+        parts = Path(path).parts
         spk = parts[-3] if len(parts) >= 3 else (parts[-2] if len(parts) >= 2 else "")
-        pat = re.compile(r'^\(\s*(\S+)\s+"(.+)"\s*\)\s*$')
-        for line in tdd.read_text(encoding="utf-8", errors="ignore").splitlines():
-            m = pat.match(line.strip())
-            if not m: continue
-            utt, text = m.group(1), m.group(2).strip()
+        for utt, text in parse_txt_done_data(content).items():
+            text = text.strip()
             if text:
-                mapping.setdefault(utt, text)
+                out.append(("meta", utt, text))
                 if spk:
-                    mapping.setdefault(f"{spk}_{utt}", text)
-    # 2) PROMPTS / *.prompts / Kaldi text：格式多為「utt<空白>TEXT」
-    for prom in list(BASE.rglob("PROMPTS")) + list(BASE.rglob("*.prompts")) + list(BASE.rglob("text")):
-        try:
-            lines = prom.read_text(encoding="utf-8", errors="ignore").splitlines()
-        except Exception:
-            continue
-        for s in lines:
+                    out.append(("meta", f"{spk}_{utt}", text))
+    else:
+        # PROMPTS / *.prompts / Kaldi text：utt "TEXT"、utt TEXT、(utt "TEXT")
+        for s in content.splitlines():
             s = s.strip()
             if not s or s.startswith("#"):  # 跳過註解
                 continue
-            # 常見三種：utt "TEXT"、utt TEXT、(utt "TEXT")
-            m = re.match(r'^\(\s*(\S+)\s+"(.+)"\s*\)\s*$', s) or \
-                re.match(r'^(\S+)\s+"(.+)"\s*$', s) or \
-                re.match(r'^(\S+)\s+(.+)$', s)
-            if not m: 
+            m = next((m for m in (r.match(s) for r in _PROMPT_RES) if m), None)
+            if not m:
                 continue
             utt, text = m.group(1), m.group(2).strip().strip('"')
             if text:
-                mapping.setdefault(utt, text)
-    return mapping
+                out.append(("meta", utt, text))
+    return out
+
+def _read(src) -> str:
+    try:
+        return read_text(src)
+    except Exception:
+        return ""
+
+def _read_many(srcs: list[str]) -> list[str]:
+    return [_read(s) for s in srcs]
 
-def stem_key_for_wav(w: Path) -> tuple[str, str]:
+# -----------------------------
+# 單位：一個說話者資料夾或一個 ZIP
+# -----------------------------
+def dir_fingerprint(dirs: dict[str, int]) -> bool:
+    """紀錄過的每個資料夾 mtime 都沒變 → True。"""
+    for d, mt in dirs.items():
+        try:
+            if os.stat(d).st_mtime_ns != mt:
+                return False
+        except OSError:
+            return False
+    return True
+
+def walk_dir(root: Path) -> tuple[dict[str, int], list[tuple[str, str]], list[tuple[str, str, str]]]:
+    """os.scandir 走一次：回傳 (各資料夾 mtime, [(wav, src)], [(種類, 逐字稿檔, src)])。"""
+    dirs: dict[str, int] = {str(root): os.stat(root).st_mtime_ns}
+    wavs, texts = [], []
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        parent = os.path.basename(d)
+        with os.scandir(d) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    dirs[e.path] = e.stat(follow_symlinks=False).st_mtime_ns
+                    stack.append(e.path)
+                elif e.is_file():
+                    if e.name.lower().endswith(".wav"):
+                        wavs.append((e.path, e.path))
+                    else:
+                        kind = transcript_kind(e.name, parent)
+                        if kind:
+                            texts.append((kind, e.path, e.path))
+    return dirs, wavs, texts
+
+def walk_zip(z: Path) -> tuple[list[tuple[str, str]], list[tuple[str, str, str]]]:
+    """ZIP 成員 → 用 unzip_l2arctic.py 解壓後會在的路徑（BASE/<zip 名>/<成員>）+ zip URI；只讀 central directory。"""
+    wavs, texts = [], []
+    root = str(z.parent / z.stem)
+    for m in zip_members(z):
+        parts = m.split("/")
+        if m.endswith("/") or parts[0] == "__MACOSX" or parts[-1].startswith("._"):
+            continue
+        p = os.path.join(root, *parts)
+        if parts[-1].lower().endswith(".wav"):
+            wavs.append((p, zip_uri(z, m)))
+        else:
+            kind = transcript_kind(parts[-1], parts[-2] if len(parts) > 1 else z.stem)
+            if kind:
+                texts.append((kind, p, zip_uri(z, m)))
+    return wavs, texts
+
+def scan_unit(kind: str, path: Path, pool: ThreadPoolExecutor) -> dict:
+    if kind == "zip":
+        st = path.stat()
+        fp, (wavs, texts) = {"zip": [st.st_size, st.st_mtime_ns]}, walk_zip(path)
+    else:
+        dirs, wavs, texts = walk_dir(path)
+        fp = {"dirs": dirs}
+    # 逐字稿分塊平行讀（每塊一個 task，避免每個小檔一次 submit 的排程成本）
+    srcs = [src for _, _, src in texts]
+    chunks = [srcs[i:i + READ_CHUNK] for i in range(0, len(srcs), READ_CHUNK)]
+    contents = [c for chunk in pool.map(_read_many, chunks) for c in chunk]
+    entries: list[tuple[str, str, str]] = []
+    for (kind, p, _), content in zip(texts, contents):
+        entries += parse_transcript(kind, p, content)
+    return {**fp, "wavs": sorted([p, src] for p, src in wavs), "entries": entries}
+
+def unit_fresh(kind: str, path: Path, cached: dict | None) -> bool:
+    if not cached:
+        return False
+    if kind == "zip":
+        st = path.stat()
+        return cached.get("zip") == [st.st_size, st.st_mtime_ns]
+    return "dirs" in cached and dir_fingerprint(cached["dirs"])
+
+def list_units(use_zip: bool) -> list[tuple[str, Path]]:
+    if not BASE.exists():
+        print(f"[ERROR] {BASE} 不存在。請先解壓 l2arctic_release_v5.0.zip。", file=sys.stderr); sys.exit(1)
+    if use_zip:
+        units = [("zip", p) for p in sorted(BASE.glob("*.zip"))]
+    else:
+        with os.scandir(BASE) as it:
+            units = sorted(("dir", Path(e.path)) for e in it if e.is_dir())
+    if not units:
+        what = ".zip" if use_zip else "說話者資料夾（請先解開 ABA.zip 等）"
+        print(f"[ERROR] 在 {BASE} 找不到任何 {what}。", file=sys.stderr); sys.exit(1)
+    return units
+
+def load_scan_index() -> dict:
+    try:
+        data = json.loads(SCAN_INDEX.read_text(encoding="utf-8"))
+        return data["units"] if data.get("version") == SCAN_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def save_scan_index(units: dict) -> None:
+    tmp = SCAN_INDEX.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps({"version": SCAN_VERSION, "units": units}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, SCAN_INDEX)
+
+def stem_key_for_wav(w: str) -> tuple[str, str]:
     """回傳 (stem, spk_stem) 兩個 key，供查詢索引。"""
-    stem = w.stem  # arctic_a0001
+    stem = _stem(w)  # arctic_a0001
     # 嘗試 speaker 代碼：通常在 wav 路徑倒數第 3 個
-    spk = w.parts[-3] if len(w.parts) >= 3 else ""
+    spk = _ancestor(w, 2)
     spk_stem = f"{spk}_{stem}" if spk else stem
     return stem, spk_stem
 
 def main():
-    maybe_unzip_suitcase()
-    wavs = ensure_wav_index()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--zip", action="store_true",
+                    help="不解壓：直接列出各說話者 ZIP 內的 wav 與逐字稿，audio_path 寫成 zip:// URI")
+    ap.add_argument("--full", action="store_true", help="忽略 manifest_index.json，全部重掃")
+    ap.add_argument("--workers", type=int, default=16, help="讀逐字稿的執行緒數")
+    ap.add_argument("--out", default=str(OUT))
+    args = ap.parse_args()
 
-    # 建立兩種來源的全域索引
-    idx_txt = collect_txt_dir_index()
-    idx_meta = collect_txt_done_and_prompts()
+    if not args.zip:
+        maybe_unzip_suitcase()
+    t0 = time.perf_counter()
+    cached = {} if args.full else load_scan_index()
+    units: dict[str, dict] = {}
+    rescanned = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for kind, path in list_units(args.zip):
+            key = f"{kind}:{path.name}"
+            if unit_fresh(kind, path, cached.get(key)):
+                units[key] = cached[key]
+            else:
+                units[key] = scan_unit(kind, path, pool)
+                rescanned.append(path.name)
+    # 沒有列在這次的單位（已刪除的說話者 / 另一種模式）也留著，切回來時可沿用
+    if rescanned or not SCAN_INDEX.exists():
+        save_scan_index({**cached, **units})
+    print(f"[SCAN] {len(units)} 個單位，重掃 {len(rescanned)} 個"
+          f"{'：' + ', '.join(rescanned[:8]) + ('…' if len(rescanned) > 8 else '') if rescanned else ''}"
+          f"（{time.perf_counter() - t0:.2f}s）")
+
+    # 建立兩種來源的全域索引（先出現的優先，同舊版 setdefault）
+    idx = {"txt": {}, "meta": {}}
+    wav_src: dict[str, str] = {}
+    for key in sorted(units):
+        for which, k, text in units[key]["entries"]:
+            idx[which].setdefault(k, text)
+        for p, src in units[key]["wavs"]:
+            wav_src[p] = src
+    idx_txt, idx_meta = idx["txt"], idx["meta"]
+    wavs = sorted(wav_src, key=lambda p: p.split(os.sep))  # 與 sorted(Path) 相同的順序
+    if not wavs:
+        print(f"[ERROR] 在 {BASE} 找不到任何 .wav。", file=sys.stderr); sys.exit(1)
+    if not args.zip:
+        INDEX.write_text("\n".join(wavs), encoding="utf-8")
 
     hit_txt = hit_meta = 0
     rows = []
     for w in wavs:
         stem, spk_stem = stem_key_for_wav(w)
-        text = idx_txt.get(stem) or idx_txt.get(spk_stem) or idx_meta.get(spk_stem) or idx_meta.get(stem) or ""
+        # 先查帶 speaker 的 key：各說話者的 stem 相同（arctic_a0001），只查 stem 會拿到別人的逐字稿
+        text = idx_txt.get(spk_stem) or idx_txt.get(stem) or idx_meta.get(spk_stem) or idx_meta.get(stem) or ""
         if text == "":
             # 再試一次：有些資料把 speaker 放在倒數第 4 個
-            spk2 = w.parts[-4] if len(w.parts) >= 4 else ""
+            spk2 = _ancestor(w, 3)
             key2 = f"{spk2}_{stem}" if spk2 else stem
             text = idx_meta.get(key2, "")
         if text:
@@ -123,15 +279,16 @@ def main():
                 hit_txt += 1
             else:
                 hit_meta += 1
-        rows.append({"audio_path": str(w), "transcript": text})
+        rows.append({"audio_path": wav_src[w], "transcript": text})
 
     df = pd.DataFrame(rows)
-    OUT.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(OUT, index=False)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out, index=False)
 
     total = len(df)
     filled = int((df["transcript"].astype(str).str.len() > 0).sum())
-    print(f"[OK] wrote {OUT} （{total} rows）")
+    print(f"[OK] wrote {out} （{total} rows）")
     print(f"[STATS] 來自 txt 目錄命中：{hit_txt}，來自 PROMPTS/txt.done.data 命中：{hit_meta}")
     print(f"[STATS] 有轉錄比例：{filled/total:.1%}")
 
@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 """
 IELTS Writing MAE Evaluation
-Runs gold-labeled essays through /api/writing and computes:
-  - MAE, RMSE
+Runs gold-labeled essays through the scoring API and computes:
+  - MAE, RMSE, bias
   - ±0.5 accuracy (within half a band)
   - ±1.0 accuracy
-  - Latency stats (p50, p95)
-  - LLM-only vs fused comparison (from scoreTrace)
+  - Latency histogram (p50 / p90 / p95 / p99 / max) at the chosen concurrency
+  - LLM-only vs fused comparison (from scoreTrace, web target only)
+
+Targets:
+  web     POST http://localhost:3010/api/writing    {taskId, prompt, essay, seconds}
+  ml-api  POST http://localhost:8100/score/writing  {text, prompt}
+
+Essays are sent concurrently over one pooled httpx.AsyncClient (keep-alive, at most
+--concurrency requests in flight), so latency reflects what clients see under load.
+Each successful response is appended to a JSONL cache keyed by target, essay id,
+model version and payload hash: an interrupted run resumes where it stopped, and a
+rerun against the same model only re-scores essays that changed.
+
+Usage (from ml/):
+  python tools/eval_writing_mae.py                           # web app, concurrency 4
+  python tools/eval_writing_mae.py --target ml-api -c 16     # model version read from /health
+  python tools/eval_writing_mae.py --no-cache                # force fresh calls
 """
 from __future__ import annotations
 
+import argparse
+import asyncio
+import hashlib
 import json
 import statistics
 import sys
@@ -17,38 +35,63 @@ import time
 from pathlib import Path
 
 try:
-    import requests
+    import httpx
 except ImportError:
-    print("[ERROR] 請先安裝 requests: pip install requests", file=sys.stderr)
+    print("[ERROR] 請先安裝 httpx: pip install httpx", file=sys.stderr)
     sys.exit(1)
 
-API_URL = "http://localhost:3010/api/writing"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from latency_hist import LatencyHistogram  # noqa: E402
+
+TARGETS = {
+    "web": "http://localhost:3010/api/writing",
+    "ml-api": "http://localhost:8100/score/writing",
+}
 GOLD_FILE = Path(__file__).parent / "eval_gold.json"
 RESULTS_FILE = Path(__file__).parent / "eval_results.json"
+CACHE_FILE = Path(__file__).resolve().parents[1] / "data" / "cache" / "eval_writing.jsonl"
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+def build_payload(target: str, essay_id: str, prompt: str, essay: str) -> dict:
+    if target == "ml-api":
+        return {"text": essay, "prompt": prompt}
+    return {"taskId": essay_id, "prompt": prompt, "essay": essay, "seconds": 2400}
+
+
+def cache_key(target: str, essay_id: str, model_version: str, payload: dict) -> str:
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return f"{target}|{essay_id}|{model_version}|{hashlib.sha1(body).hexdigest()[:16]}"
+
+
+def load_cache(path: Path) -> dict:
+    """key -> cached record; a truncated last line (run killed mid-write) is ignored."""
+    cache = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            cache[rec["key"]] = rec
+    return cache
 
-def call_api(essay_id: str, prompt: str, essay: str) -> dict:
-    payload = {
-        "taskId": essay_id,
-        "prompt": prompt,
-        "essay": essay,
-        "seconds": 2400,
-    }
-    t0 = time.perf_counter()
-    resp = requests.post(API_URL, json=payload, timeout=60)
-    elapsed_ms = (time.perf_counter() - t0) * 1000
-    resp.raise_for_status()
-    data = resp.json()
-    return {"response": data, "elapsed_ms": elapsed_ms}
 
-def extract_scores(response: dict) -> dict:
+def extract_scores(response: dict, target: str = "web") -> dict:
     """Extract predicted band and LLM-only band from API response."""
+    if target == "ml-api":
+        return {
+            "predicted_band": response.get("band_estimate"),
+            "llm_pre_calibration": None,
+            "score_trace_available": False,
+            "study_plan_reason": None,
+        }
     data = response.get("data", {})
     band_obj = data.get("band", {})
     predicted = band_obj.get("overall")
 
     # Try to get LLM-only score from scoreTrace
     trace = data.get("scoreTrace", {})
-    llm_subs = trace.get("llm_subscores", {})
     llm_pre_cal = trace.get("final_overall_pre_calibration")
     # Approximate LLM-only band: map llm pre-cal back through the fused band
     # We use the fused band as the best estimate; LLM-only is reported if available
@@ -59,52 +102,137 @@ def extract_scores(response: dict) -> dict:
         "study_plan_reason": data.get("studyPlan", {}).get("reason"),
     }
 
-def main():
-    gold_data = json.loads(GOLD_FILE.read_text(encoding="utf-8"))
-    print(f"[INFO] Loaded {len(gold_data)} gold essays")
-    print(f"[INFO] API: {API_URL}\n")
-    print(f"{'ID':<6} {'Gold':>5} {'Pred':>5} {'Error':>7}  Status")
-    print("-" * 45)
 
-    results = []
-    errors = []
+async def detect_model_version(client: httpx.AsyncClient, url: str) -> str | None:
+    """ml-api reports the loaded XGBoost/LUT hashes on /health."""
+    try:
+        resp = await client.get(url.rsplit("/score/", 1)[0] + "/health", timeout=10)
+        resp.raise_for_status()
+        return resp.json().get("model_version")
+    except (httpx.HTTPError, ValueError):
+        return None
 
-    for item in gold_data:
-        eid   = item["id"]
-        gold  = float(item["gold_band"])
-        prompt = item["prompt"]
-        essay  = item["essay"]
 
+async def call_api(client: httpx.AsyncClient, url: str, payload: dict, timeout: float, retries: int) -> dict:
+    """POST with retry on 429/5xx and transport errors; elapsed_ms is the successful attempt only."""
+    for attempt in range(retries + 1):
+        t0 = time.perf_counter()
         try:
-            raw = call_api(eid, prompt, essay)
-            scores = extract_scores(raw["response"])
-            pred = scores["predicted_band"]
+            resp = await client.post(url, json=payload, timeout=timeout)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            if resp.status_code in RETRY_STATUS and attempt < retries:
+                raise httpx.HTTPStatusError(f"HTTP {resp.status_code}", request=resp.request, response=resp)
+            resp.raise_for_status()
+            return {"response": resp.json(), "elapsed_ms": elapsed_ms}
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRY_STATUS
+            if attempt >= retries or not retryable:
+                raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    raise RuntimeError("unreachable")
 
-            if pred is None:
-                print(f"{eid:<6} {gold:>5.1f}  {'N/A':>5}  {'N/A':>7}  [NO SCORE]")
-                errors.append({"id": eid, "error": "no predicted band"})
-                continue
 
-            pred = float(pred)
-            err  = abs(pred - gold)
-            sign = "+" if pred > gold else ("-" if pred < gold else " ")
-            print(f"{eid:<6} {gold:>5.1f} {pred:>5.1f} {sign}{err:>6.2f}  [{raw['elapsed_ms']:>5.0f}ms]")
+async def evaluate(args, gold_data: list) -> tuple[list, list, LatencyHistogram, int]:
+    url = args.url or TARGETS[args.target]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    cache = {} if args.no_cache else load_cache(args.cache)
+    hist = LatencyHistogram()
+    results, errors = [], []
+    n_cached = 0
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(limits=limits) as client:
+        version = args.model_version
+        if version is None and args.target == "ml-api":
+            version = await detect_model_version(client, url)
+        version = version or "unversioned"
+        print(f"[INFO] API: {url}  (concurrency {args.concurrency}, model version {version})\n")
+        print(f"{'ID':<6} {'Gold':>5} {'Pred':>5} {'Error':>7}  Status")
+        print("-" * 45)
 
-            results.append({
-                "id": eid,
-                "gold": gold,
-                "predicted": pred,
-                "abs_error": round(err, 3),
-                "signed_error": round(pred - gold, 3),
-                "elapsed_ms": round(raw["elapsed_ms"], 1),
-                **scores,
-            })
+        cache_fh = None
+        if not args.no_cache:
+            args.cache.parent.mkdir(parents=True, exist_ok=True)
+            cache_fh = args.cache.open("a", encoding="utf-8")
 
-        except Exception as e:
-            print(f"{eid:<6} {gold:>5.1f}   ERR        [ERROR: {e}]")
-            errors.append({"id": eid, "error": str(e)})
+        async def one(item: dict) -> None:
+            nonlocal n_cached
+            eid = item["id"]
+            gold = float(item["gold_band"])
+            payload = build_payload(args.target, eid, item["prompt"], item["essay"])
+            key = cache_key(args.target, eid, version, payload)
+            try:
+                rec = cache.get(key)
+                if rec is not None:
+                    n_cached += 1
+                    tag = "cached"
+                else:
+                    async with sem:
+                        raw = await call_api(client, url, payload, args.timeout, args.retries)
+                    rec = {"key": key, "id": eid, "model_version": version, **raw, "at": time.time()}
+                    hist.record(raw["elapsed_ms"])
+                    if cache_fh is not None:
+                        cache_fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                        cache_fh.flush()
+                    tag = f"{raw['elapsed_ms']:>5.0f}ms"
+
+                scores = extract_scores(rec["response"], args.target)
+                pred = scores["predicted_band"]
+                if pred is None:
+                    print(f"{eid:<6} {gold:>5.1f}  {'N/A':>5}  {'N/A':>7}  [NO SCORE]")
+                    errors.append({"id": eid, "error": "no predicted band"})
+                    return
+                pred = float(pred)
+                err = abs(pred - gold)
+                sign = "+" if pred > gold else ("-" if pred < gold else " ")
+                print(f"{eid:<6} {gold:>5.1f} {pred:>5.1f} {sign}{err:>6.2f}  [{tag}]")
+                results.append({
+                    "id": eid,
+                    "gold": gold,
+                    "predicted": pred,
+                    "abs_error": round(err, 3),
+                    "signed_error": round(pred - gold, 3),
+                    "elapsed_ms": round(rec["elapsed_ms"], 1),
+                    "cached": tag == "cached",
+                    **scores,
+                })
+            except Exception as e:
+                print(f"{eid:<6} {gold:>5.1f}   ERR        [ERROR: {e}]")
+                errors.append({"id": eid, "error": str(e)})
+
+        try:
+            await asyncio.gather(*(one(item) for item in gold_data))
+        finally:
+            if cache_fh is not None:
+                cache_fh.close()
 
-        time.sleep(0.5)  # rate-limit courtesy
+    order = {item["id"]: i for i, item in enumerate(gold_data)}
+    results.sort(key=lambda r: order[r["id"]])
+    return results, errors, hist, n_cached
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", choices=sorted(TARGETS), default="web")
+    ap.add_argument("--url", default="", help="override the endpoint URL for --target")
+    ap.add_argument("-c", "--concurrency", type=int, default=4, help="max requests in flight")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (s)")
+    ap.add_argument("--retries", type=int, default=2, help="retries on 429/5xx/transport errors")
+    ap.add_argument("--model-version", default=None,
+                    help="cache namespace; ml-api reads it from /health, web defaults to 'unversioned'")
+    ap.add_argument("--gold", type=Path, default=GOLD_FILE)
+    ap.add_argument("--out", type=Path, default=RESULTS_FILE)
+    ap.add_argument("--cache", type=Path, default=CACHE_FILE, help="JSONL response cache")
+    ap.add_argument("--no-cache", action="store_true", help="neither read nor write the response cache")
+    args = ap.parse_args()
+    if args.concurrency < 1:
+        ap.error("--concurrency must be >= 1")
+
+    gold_data = json.loads(args.gold.read_text(encoding="utf-8"))
+    print(f"[INFO] Loaded {len(gold_data)} gold essays")
+    t0 = time.perf_counter()
+    results, errors, hist, n_cached = asyncio.run(evaluate(args, gold_data))
+    wall_s = time.perf_counter() - t0
 
     if not results:
         print("\n[ERROR] No successful results.")
@@ -114,7 +242,6 @@ def main():
     n = len(results)
     abs_errors = [r["abs_error"] for r in results]
     signed_errors = [r["signed_error"] for r in results]
-    latencies = [r["elapsed_ms"] for r in results]
 
     mae  = statistics.mean(abs_errors)
     rmse = (statistics.mean(e**2 for e in abs_errors)) ** 0.5
@@ -122,39 +249,50 @@ def main():
     within_05 = sum(1 for e in abs_errors if e <= 0.5) / n * 100
     within_10 = sum(1 for e in abs_errors if e <= 1.0) / n * 100
 
-    lat_sorted = sorted(latencies)
-    p50 = lat_sorted[int(n * 0.5)]
-    p95 = lat_sorted[min(int(n * 0.95), n - 1)]
+    # Latency describes this run's requests; a fully cached rerun falls back to the recorded ones.
+    lat_source = "this run"
+    if not hist.count:
+        hist.record_many(r["elapsed_ms"] for r in results)
+        lat_source = "cached"
+    lat = hist.summary()
 
     print("\n" + "=" * 45)
-    print(f"  N essays evaluated : {n}  ({len(errors)} errors)")
+    print(f"  N essays evaluated : {n}  ({len(errors)} errors, {n_cached} from cache)")
     print(f"  MAE                : {mae:.3f} bands")
     print(f"  RMSE               : {rmse:.3f} bands")
     print(f"  Bias               : {bias:+.3f} bands")
     print(f"  Within ±0.5 band   : {within_05:.1f}%")
     print(f"  Within ±1.0 band   : {within_10:.1f}%")
-    print(f"  Latency p50        : {p50:.0f} ms")
-    print(f"  Latency p95        : {p95:.0f} ms")
+    print(f"  Latency ({lat_source}, n={hist.count}, concurrency {args.concurrency})")
+    for k in ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms"):
+        print(f"    {k[:-3]:<17}: {lat[k]:.0f} ms")
+    print(f"  Wall time          : {wall_s:.1f} s")
     print("=" * 45)
+    print(hist.render())
 
     # ── Save results ─────────────────────────────────────────────────────────
     out = {
         "summary": {
             "n": n,
             "errors": len(errors),
+            "cached": n_cached,
+            "target": args.target,
+            "concurrency": args.concurrency,
             "mae": round(mae, 4),
             "rmse": round(rmse, 4),
             "bias": round(bias, 4),
             "within_0_5_pct": round(within_05, 1),
             "within_1_0_pct": round(within_10, 1),
-            "latency_p50_ms": round(p50, 1),
-            "latency_p95_ms": round(p95, 1),
+            "latency_p50_ms": round(lat["p50_ms"], 1),
+            "latency_p95_ms": round(lat["p95_ms"], 1),
+            "latency": lat,
+            "wall_s": round(wall_s, 2),
         },
         "per_essay": results,
         "failed": errors,
     }
-    RESULTS_FILE.write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding="utf-8")
-    print(f"\n[OK] Full results saved → {RESULTS_FILE}")
+    args.out.write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n[OK] Full results saved → {args.out}")
 
 if __name__ == "__main__":
     main()
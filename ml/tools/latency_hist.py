@@ -0,0 +1,111 @@
+# tools/latency_hist.py
+"""
+HDR 風格的延遲直方圖（對數-線性分桶，固定相對誤差）。
+
+- 每個桶的寬度是下緣的 precision（預設 1%），所以 0.05 ms 與 30 s 的值都只有 ≤1% 的相對誤差，
+  記錄 O(1)、記憶體只跟「出現過的桶數」有關，與樣本數無關。
+- percentile(q) 依 HdrHistogram 慣例回傳「第 ceil(q·N) 個樣本所在桶的上緣」（不超過實際最大值），
+  不會像 sorted(lat)[int(n*0.95)] 那樣在小樣本時低估尾端。
+- 可合併（計數相加）：多個 worker / 多次執行的直方圖可以加總後再算分位數。
+
+用法：
+  from latency_hist import LatencyHistogram
+  h = LatencyHistogram()
+  h.record(12.3)              # 毫秒
+  h.percentile(99), h.summary(), print(h.render())
+"""
+from __future__ import annotations
+
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    def __init__(self, precision: float = 0.01, min_ms: float = 0.001):
+        if not 0 < precision < 1:
+            raise ValueError("precision 必須在 (0, 1)")
+        self.precision = precision
+        self.min_ms = min_ms
+        self._log_base = math.log1p(precision)
+        self.counts: Counter = Counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    # 桶 i 的範圍是 (min_ms·(1+p)^(i-1), min_ms·(1+p)^i]；桶 0 收 ≤ min_ms 的值
+    def _index(self, ms: float) -> int:
+        if ms <= self.min_ms:
+            return 0
+        return max(1, math.ceil(math.log(ms / self.min_ms) / self._log_base - 1e-12))
+
+    def _upper(self, i: int) -> float:
+        return self.min_ms * (1.0 + self.precision) ** i
+
+    def record(self, ms: float, n: int = 1) -> None:
+        if ms != ms or ms < 0:  # NaN / 負值不計
+            return
+        self.counts[self._index(ms)] += n
+        self.count += n
+        self.total_ms += ms * n
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def record_many(self, values: Iterable[float]) -> None:
+        for v in values:
+            self.record(v)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if (other.precision, other.min_ms) != (self.precision, self.min_ms):
+            raise ValueError("只能合併 precision / min_ms 相同的直方圖")
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total_ms / self.count if self.count else math.nan
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= rank:
+                return min(self._upper(i), self.max)
+        return self.max
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {"count": self.count}
+        if not self.count:
+            return out
+        for q in percentiles:
+            out[f"p{q:g}".replace(".", "_") + "_ms"] = round(self.percentile(q), 3)
+        out.update({"min_ms": round(self.min, 3), "mean_ms": round(self.mean, 3), "max_ms": round(self.max, 3)})
+        return out
+
+    def render(self, rows: int = 12, width: int = 40) -> str:
+        """文字長條圖：把出現過的範圍切成 rows 個對數等寬區段。"""
+        if not self.count:
+            return "(no samples)"
+        lo_i, hi_i = min(self.counts), max(self.counts)
+        step = max(1, math.ceil((hi_i - lo_i + 1) / rows))
+        groups: List[tuple] = []
+        for start in range(lo_i, hi_i + 1, step):
+            c = sum(self.counts.get(i, 0) for i in range(start, start + step))
+            groups.append((self._upper(start - 1) if start else 0.0, self._upper(start + step - 1), c))
+        peak = max(c for *_, c in groups) or 1
+        lines, cum = [], 0
+        for lo, hi, c in groups:
+            cum += c
+            bar = "#" * max(1 if c else 0, round(width * c / peak))
+            lines.append(f"{lo:>10.1f} – {min(hi, self.max):>10.1f} ms │{bar:<{width}}│ {c:>6} {100 * cum / self.count:6.1f}%")
+        return "\n".join(lines)
@@ -0,0 +1,370 @@
+# tools/load_test.py
+"""
+ml-api 的開放迴路（open-loop）壓測與容量報告。
+
+- 依固定到達率（poisson 或等間隔）排程送出 /score/writing、/score/speaking 請求，不等前一個回應；
+  延遲從「排定送出時間」起算，伺服器排隊造成的延遲不會因為 client 跟著變慢而被隱藏（coordinated omission）。
+- 每一階段跑 --stage-s 秒，到達率依 --rates 或 --start/--step 逐步提高，
+  直到 p99 超過 --slo-p99-ms 或錯誤率超過 --max-error-rate 為止；容量 = 最後一個守住 SLO 的到達率。
+- 合成作文（--essay-words 字）與合成語音（--audio-s 秒的 16 kHz wav + 含 filler 的逐字稿）
+  都由 src/synth_corpus.py 在開跑前產生好，送出時不花 CPU。
+- --spawn 會在本機 127.0.0.1 啟動 uvicorn api.app:app（不需網路）；伺服器行程（含 --workers 子行程）
+  的 CPU% / RSS 每 --sample-s 秒取樣一次，寫進報告的時間序列。
+  取樣用 psutil（有裝的話），否則讀 Linux 的 /proc；兩者都沒有時略過。
+
+用法（在 ml/ 底下）：
+  python tools/load_test.py --spawn --endpoint writing --rates 1,2,4,8,16
+  python tools/load_test.py --url http://127.0.0.1:8100 --server-pid 1234 --endpoint speaking --audio-s 30
+  python tools/load_test.py --spawn --endpoint mixed --speaking-share 0.3 --start 2 --step 1.5 --out load.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:
+    print("[ERROR] 請先安裝 httpx: pip install httpx", file=sys.stderr)
+    sys.exit(1)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from latency_hist import LatencyHistogram  # noqa: E402
+from synth_corpus import SpeechSpec, synth_essay, synth_speech, wav_bytes  # noqa: E402
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+
+# -----------------------------
+# 伺服器資源取樣
+# -----------------------------
+class ProcSampler:
+    """伺服器行程 + 子行程的 CPU%（可超過 100%）與 RSS（MB）。"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._last: Optional[Tuple[float, float]] = None
+        try:
+            import psutil
+            self._psutil = psutil
+        except ImportError:
+            self._psutil = None
+        self.available = self._psutil is not None or Path(f"/proc/{pid}/stat").exists()
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _proc_tree(self) -> List[int]:
+        pids, stack = [], [self.pid]
+        while stack:
+            p = stack.pop()
+            pids.append(p)
+            for task in Path(f"/proc/{p}/task").glob("*/children"):
+                try:
+                    stack += [int(c) for c in task.read_text().split()]
+                except OSError:
+                    pass
+        return pids
+
+    def _cpu_rss(self) -> Tuple[float, float]:
+        if self._psutil is not None:
+            root = self._psutil.Process(self.pid)
+            procs = [root] + root.children(recursive=True)
+            cpu = rss = 0.0
+            for p in procs:
+                try:
+                    t = p.cpu_times()
+                    cpu += t.user + t.system
+                    rss += p.memory_info().rss
+                except self._psutil.Error:
+                    pass
+            return cpu, rss
+        cpu = rss = 0.0
+        for p in self._proc_tree():
+            try:
+                fields = Path(f"/proc/{p}/stat").read_text().rsplit(")", 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / self._tick  # utime + stime
+                rss += int(Path(f"/proc/{p}/statm").read_text().split()[1]) * self._page
+            except (OSError, IndexError, ValueError):
+                pass
+        return cpu, rss
+
+    def sample(self) -> Optional[Dict[str, float]]:
+        if not self.available:
+            return None
+        now = time.perf_counter()
+        cpu, rss = self._cpu_rss()
+        prev, self._last = self._last, (now, cpu)
+        if prev is None:
+            return None
+        return {"cpu_pct": 100.0 * (cpu - prev[1]) / max(1e-9, now - prev[0]), "rss_mb": rss / 2**20}
+
+
+# -----------------------------
+# 開放迴路產生器
+# -----------------------------
+@dataclass
+class StageResult:
+    rate: float
+    duration_s: float
+    sent: int = 0
+    ok: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    hist: LatencyHistogram = field(default_factory=LatencyHistogram)
+    by_endpoint: Dict[str, LatencyHistogram] = field(default_factory=dict)
+    wall_s: float = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.sent if self.sent else 0.0
+
+    def report(self) -> dict:
+        lat = self.hist.summary()
+        return {
+            "offered_rps": self.rate,
+            "sent": self.sent,
+            "ok": self.ok,
+            "throughput_rps": round(self.ok / self.wall_s, 3) if self.wall_s else 0.0,
+            "error_rate": round(self.error_rate, 4),
+            "errors": self.errors,
+            "latency": lat,
+            "by_endpoint": {k: h.summary() for k, h in self.by_endpoint.items()},
+        }
+
+
+class LoadGen:
+    def __init__(self, args, client: httpx.AsyncClient):
+        self.args = args
+        self.client = client
+        self.inflight = 0
+        self.rng = random.Random(args.seed)
+        self.essays = [synth_essay(np.random.default_rng([args.seed, i]), args.essay_words, quality=(i % 5) / 4)
+                       for i in range(args.pool)]
+        spec = SpeechSpec(duration_s=args.audio_s)
+        self.clips = []
+        for i in range(min(args.pool, 8) if args.endpoint != "writing" else 0):
+            y, transcript = synth_speech(spec, args.seed, i)
+            self.clips.append((wav_bytes(y, spec.sr), transcript))
+
+    def _pick_endpoint(self) -> str:
+        if self.args.endpoint == "mixed":
+            return "speaking" if self.rng.random() < self.args.speaking_share else "writing"
+        return self.args.endpoint
+
+    async def _send(self, stage: StageResult, t_sched: float) -> None:
+        ep = self._pick_endpoint()
+        self.inflight += 1
+        try:
+            if ep == "writing":
+                req = self.client.post(f"{self.args.url}/score/writing",
+                                       json={"text": self.rng.choice(self.essays), "prompt": "Discuss both views."})
+            else:
+                wav, transcript = self.rng.choice(self.clips)
+                req = self.client.post(f"{self.args.url}/score/speaking",
+                                       files={"audio": ("synth.wav", wav, "audio/wav")},
+                                       data={"transcript": transcript})
+            resp = await req
+            kind = None if resp.status_code < 400 else f"http_{resp.status_code}"
+        except httpx.TimeoutException:
+            kind = "timeout"
+        except httpx.HTTPError as e:
+            kind = type(e).__name__
+        finally:
+            self.inflight -= 1
+        ms = (time.perf_counter() - t_sched) * 1000.0  # 從排定時間起算
+        if kind is None:
+            stage.ok += 1
+            stage.hist.record(ms)
+            stage.by_endpoint.setdefault(ep, LatencyHistogram()).record(ms)
+        else:
+            stage.errors[kind] = stage.errors.get(kind, 0) + 1
+
+    async def run_stage(self, rate: float) -> StageResult:
+        a = self.args
+        stage = StageResult(rate=rate, duration_s=a.stage_s)
+        t0 = time.perf_counter()
+        tasks, t_next = [], 0.0
+        while t_next < a.stage_s:
+            delay = t0 + t_next - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            stage.sent += 1
+            if self.inflight >= a.max_inflight:
+                stage.errors["client_overload"] = stage.errors.get("client_overload", 0) + 1
+            else:
+                tasks.append(asyncio.create_task(self._send(stage, t0 + t_next)))
+            t_next += self.rng.expovariate(rate) if a.arrival == "poisson" else 1.0 / rate
+        if tasks:
+            await asyncio.wait(tasks)
+        stage.wall_s = time.perf_counter() - t0
+        return stage
+
+
+# -----------------------------
+# 伺服器
+# -----------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "api.app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=str(ML_ROOT))
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_healthy(client: httpx.AsyncClient, url: str, timeout_s: float, proc=None) -> dict:
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"[ERROR] uvicorn 提早結束（exit {proc.returncode}）")
+        try:
+            r = await client.get(f"{url}/health", timeout=2)
+            if r.status_code == 200:
+                return r.json()
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit(f"[ERROR] {url}/health 在 {timeout_s:.0f}s 內沒有回應")
+
+
+async def sample_loop(sampler: ProcSampler, gen: LoadGen, series: list, t0: float, every: float) -> None:
+    while True:
+        s = await asyncio.to_thread(sampler.sample)
+        if s is not None:
+            series.append({"t": round(time.perf_counter() - t0, 2), **{k: round(v, 1) for k, v in s.items()},
+                           "inflight": gen.inflight})
+        await asyncio.sleep(every)
+
+
+def _rates(a) -> List[float]:
+    if a.rates:
+        return [float(x) for x in a.rates.split(",")]
+    out, r = [], a.start
+    while r <= a.max_rate + 1e-9:
+        out.append(round(r, 3))
+        r *= a.step
+    return out
+
+
+async def main_async(a) -> dict:
+    proc = None
+    if a.spawn:
+        proc, a.url = spawn_server(a.workers)
+    limits = httpx.Limits(max_connections=a.max_inflight, max_keepalive_connections=a.max_inflight)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=a.timeout) as client:
+            health = await wait_healthy(client, a.url, a.startup_timeout, proc)
+            gen = LoadGen(a, client)
+            pid = proc.pid if proc is not None else a.server_pid
+            sampler = ProcSampler(pid) if pid else None
+            if sampler is not None and not sampler.available:
+                print("[WARN] 無法取樣伺服器 CPU/RSS（沒有 psutil 也沒有 /proc）")
+            series: list = []
+            t0 = time.perf_counter()
+            sampler_task = (asyncio.create_task(sample_loop(sampler, gen, series, t0, a.sample_s))
+                            if sampler is not None and sampler.available else None)
+
+            if a.warmup_s > 0:
+                saved, a.stage_s = a.stage_s, a.warmup_s
+                await gen.run_stage(_rates(a)[0])
+                a.stage_s = saved
+
+            stages, capacity = [], None
+            print(f"{'rate':>7} {'sent':>6} {'tput':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}  SLO")
+            for rate in _rates(a):
+                t_stage = time.perf_counter() - t0
+                st = await gen.run_stage(rate)
+                rep = st.report()
+                rep["t_start"] = round(t_stage, 2)
+                lat = rep["latency"]
+                p99 = lat.get("p99_ms", float("inf"))
+                ok = p99 <= a.slo_p99_ms and st.error_rate <= a.max_error_rate and st.ok > 0
+                rep["slo_ok"] = ok
+                stages.append(rep)
+                print(f"{rate:>7.2f} {st.sent:>6} {rep['throughput_rps']:>7.2f} {100 * st.error_rate:>5.1f}% "
+                      f"{lat.get('p50_ms', float('nan')):>8.0f} {lat.get('p95_ms', float('nan')):>8.0f} "
+                      f"{p99:>8.0f}  {'ok' if ok else 'BREACH'}")
+                if not ok:
+                    break
+                capacity = rep
+            if sampler_task is not None:
+                sampler_task.cancel()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    return {
+        "url": a.url,
+        "endpoint": a.endpoint,
+        "health": health,
+        "config": {k: v for k, v in vars(a).items() if k not in ("url",)},
+        "slo": {"p99_ms": a.slo_p99_ms, "max_error_rate": a.max_error_rate},
+        "capacity_rps": capacity["offered_rps"] if capacity else 0.0,
+        "capacity_stage": capacity,
+        "stages": stages,
+        "resources": series,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ml-api open-loop load test")
+    ap.add_argument("--url", default="http://127.0.0.1:8100")
+    ap.add_argument("--spawn", action="store_true", help="在本機啟動 uvicorn api.app:app（忽略 --url）")
+    ap.add_argument("--workers", type=int, default=1, help="--spawn 時的 uvicorn workers")
+    ap.add_argument("--server-pid", type=int, default=0, help="不用 --spawn 時，要取樣 CPU/RSS 的伺服器 pid")
+    ap.add_argument("--endpoint", choices=["writing", "speaking", "mixed"], default="writing")
+    ap.add_argument("--speaking-share", type=float, default=0.3, help="mixed 時 speaking 請求的比例")
+    ap.add_argument("--rates", default="", help="逗號分隔的到達率（req/s）；不給時用 --start/--step/--max-rate")
+    ap.add_argument("--start", type=float, default=1.0)
+    ap.add_argument("--step", type=float, default=2.0, help="每階段到達率乘上的倍數")
+    ap.add_argument("--max-rate", type=float, default=256.0)
+    ap.add_argument("--stage-s", type=float, default=20.0, help="每階段秒數")
+    ap.add_argument("--warmup-s", type=float, default=3.0, help="以第一個到達率暖機（不計入報告）")
+    ap.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    ap.add_argument("--slo-p99-ms", type=float, default=2000.0)
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument("--essay-words", type=int, default=250)
+    ap.add_argument("--audio-s", type=float, default=20.0)
+    ap.add_argument("--pool", type=int, default=32, help="預先產生的合成作文數（音檔最多 8 個）")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--max-inflight", type=int, default=512, help="client 端同時在途上限，超過記為 client_overload")
+    ap.add_argument("--sample-s", type=float, default=0.5)
+    ap.add_argument("--startup-timeout", type=float, default=120.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="輸出 JSON 報告")
+    a = ap.parse_args()
+
+    report = asyncio.run(main_async(a))
+    res = report["resources"]
+    print(f"\n[CAPACITY] {report['capacity_rps']:.2f} req/s（p99 ≤ {a.slo_p99_ms:.0f} ms、"
+          f"錯誤率 ≤ {100 * a.max_error_rate:.1f}%）")
+    if res:
+        print(f"[SERVER] CPU 峰值 {max(r['cpu_pct'] for r in res):.0f}%，RSS 峰值 {max(r['rss_mb'] for r in res):.0f} MB")
+    if a.out:
+        Path(a.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(a.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[OK] 報告 → {a.out}")
+
+
+if __name__ == "__main__":
+    main()